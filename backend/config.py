@@ -1,14 +1,18 @@
+import logging
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
+logger = logging.getLogger(__name__)
+
+# Load environment variables from .env file (absent on serverless deploys,
+# where the platform sets the environment)
 env_path = Path(__file__).parent / ".env"
 if env_path.exists():
     load_dotenv(dotenv_path=env_path)
-    print(f"Loaded .env from {env_path}")
+    logger.debug("Loaded .env from %s", env_path)
 else:
-    print(f"No .env file found at {env_path}")
+    logger.debug("No .env file found at %s", env_path)
 
 class Settings:
     PROJECT_NAME: str = "Ready, Set, Hu!"
@@ -26,12 +30,24 @@ class Settings:
     # Gemini API configuration
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+    # Override the Gemini API endpoint (e.g. a local fake LLM server in tests)
+    GEMINI_BASE_URL: str = os.getenv("GEMINI_BASE_URL", "")
+    # QA upstream limits: concurrent LLM calls and per-call deadline
+    QA_MAX_CONCURRENCY: int = int(os.getenv("QA_MAX_CONCURRENCY", "8"))
+    QA_TIMEOUT_SECONDS: float = float(os.getenv("QA_TIMEOUT_SECONDS", "15"))
+    # QA answer cache (SQLite file; empty path = in-memory only). Serverless
+    # deploys (Vercel) only have a writable /tmp.
+    QA_CACHE_PATH: str = os.getenv(
+        "QA_CACHE_PATH", "/tmp/qa_cache.sqlite3" if os.getenv("VERCEL") else "backend/.qa_cache.sqlite3"
+    )
+    QA_CACHE_TTL_SECONDS: float = float(os.getenv("QA_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    QA_CACHE_MAX_ENTRIES: int = int(os.getenv("QA_CACHE_MAX_ENTRIES", "5000"))
 
 settings = Settings()
 
-# Debug: Print configuration status
+# Configuration status (logged, not printed: import must stay quiet and cheap)
 if settings.GEMINI_API_KEY:
-    print(f"✅ Gemini API Key configured (length: {len(settings.GEMINI_API_KEY)})")
+    logger.debug("Gemini API Key configured (length: %d)", len(settings.GEMINI_API_KEY))
 else:
-    print("⚠️  Gemini API Key NOT configured - Q&A will show setup instructions")
+    logger.info("Gemini API Key NOT configured - Q&A will answer from the rules only")
 
@@ -1,21 +1,36 @@
-from typing import List, Tuple, Dict, Optional
-from collections import Counter
-from .models import CheckHandResponse
+from array import array
+from typing import List, Tuple, Dict, Optional, Sequence
+from functools import lru_cache
+from itertools import product
+from .models import (
+    CheckHandResponse,
+    DiscardAdviceResponse,
+    DiscardOption,
+    ShantenResponse,
+    Suit,
+    WaitTile,
+    WaitsResponse,
+)
+from .ruleset import FactorValue, RulesetError, compute_total_multiplier, get_ruleset_indexed
+from .tiles import (
+    MAX_COPIES,
+    NUM_TILE_KINDS,
+    SUIT_BITS as _BITS,
+    SUIT_DIGIT_MASK as _DIGIT_MASK,
+    TILE_IDS,
+    TILE_INDEX,
+    TileError,
+    decode_counts,
+    encode_tiles,
+    pack_suits,
+)
+
+_INVALID_TILES = "Invalid tiles. Use ids like 1wan / 5tong / 9tiao, at most 4 copies each."
 
 def parse_hand(tiles: List[str]) -> List[str]:
     """Sorts tiles to make checking easier."""
-    # Custom sort order: sort by suit (wan < tong < tiao), then by rank
-    # This ensures consistent ordering for sequences
-    def tile_sort_key(t: str) -> tuple:
-        if t.endswith("wan"):
-            return (0, int(t[:-3]))
-        elif t.endswith("tong"):
-            return (1, int(t[:-4]))
-        elif t.endswith("tiao"):
-            return (2, int(t[:-4]))
-        else:
-            return (3, t)  # Unknown format, sort alphabetically
-    return sorted(tiles, key=tile_sort_key)
+    # Sort by tile index (wan < tong < tiao, then rank); unknown ids go last.
+    return sorted(tiles, key=lambda t: (TILE_INDEX.get(t, NUM_TILE_KINDS), t))
 
 def is_pair(tiles: List[str]) -> bool:
     return len(tiles) == 2 and tiles[0] == tiles[1]
@@ -26,154 +41,613 @@ def is_triplet(tiles: List[str]) -> bool:
 def is_sequence(tiles: List[str]) -> bool:
     if len(tiles) != 3:
         return False
-    
-    # Parse tile format: "{rank}{suit}" where suit is "wan", "tong", or "tiao"
-    # e.g., "1wan", "2tong", "3tiao"
-    try:
-        parsed = []
-        for t in tiles:
-            # Extract suit (last 3-4 characters: "wan", "tong", "tiao")
-            if t.endswith("wan"):
-                rank = int(t[:-3])
-                suit = "wan"
-            elif t.endswith("tong"):
-                rank = int(t[:-4])
-                suit = "tong"
-            elif t.endswith("tiao"):
-                rank = int(t[:-4])
-                suit = "tiao"
-            else:
-                return False  # Unknown format
-            parsed.append((rank, suit))
+    idx = sorted(TILE_INDEX.get(t, -1) for t in tiles)
+    if idx[0] < 0:
+        return False  # Unknown format
+    # Same suit and consecutive ranks
+    return idx[0] // 9 == idx[2] // 9 and idx[0] + 1 == idx[1] and idx[1] + 1 == idx[2]
+
+# --- Suit decomposition tables ---
+#
+# Each suit is encoded as a 9-digit count vector packed into one int
+# (3 bits per rank, rank 1 in the lowest bits). The tables below map every
+# suit vector that can be split into melds (optionally + one pair) to all of
+# its decompositions, so checking a hand is a few dict probes, not a search.
+
+MAX_MELDS = 4
+
+# Meld shapes within one suit: 0..8 = triplet of rank i+1, 9..15 = sequence from rank i-8.
+_MELD_KEYS: List[int] = [3 << (_BITS * r) for r in range(9)] + [
+    (1 << (_BITS * r)) | (1 << (_BITS * (r + 1))) | (1 << (_BITS * (r + 2))) for r in range(7)
+]
+
+# Decomposition = (pair_rank_index or -1, tuple of meld shape indices)
+Decomposition = Tuple[int, Tuple[int, ...]]
 
-        # Check if same suit
-        suits = [s for _, s in parsed]
-        if len(set(suits)) != 1:
+def _fits(key: int) -> bool:
+    for r in range(9):
+        if (key >> (_BITS * r)) & _DIGIT_MASK > MAX_COPIES:
             return False
+    return True
+
+
+def _build_tables() -> Tuple[Dict[int, Tuple[Decomposition, ...]], Dict[int, Tuple[Decomposition, ...]]]:
+    melds_only: Dict[int, List[Decomposition]] = {}
+
+    def walk(key: int, start: int, melds: List[int]) -> None:
+        melds_only.setdefault(key, []).append((-1, tuple(melds)))
+        if len(melds) == MAX_MELDS:
+            return
+        for i in range(start, len(_MELD_KEYS)):
+            nxt = key + _MELD_KEYS[i]
+            if _fits(nxt):
+                melds.append(i)
+                walk(nxt, i, melds)
+                melds.pop()
+
+    walk(0, 0, [])
+
+    with_pair: Dict[int, List[Decomposition]] = {}
+    for key, decomps in melds_only.items():
+        for r in range(9):
+            if (key >> (_BITS * r)) & _DIGIT_MASK <= 2:
+                bucket = with_pair.setdefault(key + (2 << (_BITS * r)), [])
+                bucket.extend((r, melds) for _pair, melds in decomps)
+
+    return (
+        {k: tuple(v) for k, v in melds_only.items()},
+        {k: tuple(v) for k, v in with_pair.items()},
+    )
+
+
+@lru_cache(maxsize=1)
+def meld_tables() -> Tuple[Dict[int, Tuple[Decomposition, ...]], Dict[int, Tuple[Decomposition, ...]]]:
+    """(meld-only, meld+pair) tables: ~3k and ~19k suit vectors, built on first use (not at import)."""
+    return _build_tables()
 
-        # Check if consecutive ranks
-        ranks = [r for r, _ in parsed]
-        ranks.sort()
-        return ranks[0] + 1 == ranks[1] and ranks[1] + 1 == ranks[2]
-    except (ValueError, IndexError):
-        return False  # Honor tiles or invalid format
 
-def check_standard_win(counts: Counter) -> Optional[Dict]:
+def _rank_tile(suit: int, rank: int) -> str:
+    return TILE_IDS[suit * 9 + rank]
+
+
+def _meld_tiles(suit: int, meld: int) -> List[str]:
+    if meld < 9:
+        return [_rank_tile(suit, meld)] * 3
+    start = meld - 9
+    return [_rank_tile(suit, start + i) for i in range(3)]
+
+
+def _suit_decompositions(key: int) -> Tuple[Optional[Tuple[Decomposition, ...]], bool]:
+    """Return (decompositions, has_pair) for one suit vector; decompositions is None if impossible."""
+    meld_table, meld_pair_table = meld_tables()
+    decomps = meld_table.get(key)
+    if decomps is not None:
+        return decomps, False
+    return meld_pair_table.get(key), True
+
+
+def decompose_standard(keys: List[int]) -> Optional[List[Tuple[int, Tuple[Decomposition, ...]]]]:
+    """
+    Probe the tables for a 4-melds-plus-pair shape.
+
+    Returns (suit index, all decompositions of that suit) per non-empty suit, or None.
     """
-    Recursive backtracking to find 4 melds + 1 pair.
+    out: List[Tuple[int, Tuple[Decomposition, ...]]] = []
+    pairs = 0
+    for suit, key in enumerate(keys):
+        if not key:
+            continue
+        decomps, has_pair = _suit_decompositions(key)
+        if decomps is None:
+            return None
+        pairs += has_pair
+        out.append((suit, decomps))
+    return out if pairs == 1 else None
+
+
+def _detail(choice: List[Tuple[int, Decomposition]]) -> Dict:
+    pair: List[str] = []
+    melds: List[List[str]] = []
+    for suit, (pair_rank, meld_ids) in choice:
+        if pair_rank >= 0:
+            pair = [_rank_tile(suit, pair_rank)] * 2
+        melds.extend(_meld_tiles(suit, m) for m in meld_ids)
+    return {"pair": pair, "melds": melds}
+
+
+def expand_decompositions(found: List[Tuple[int, Tuple[Decomposition, ...]]]) -> List[Dict]:
+    """All full-hand decompositions (cross product of the per-suit ones) as tile-id details."""
+    suits = [suit for suit, _ in found]
+    return [
+        _detail(list(zip(suits, combo)))
+        for combo in product(*(decomps for _, decomps in found))
+    ]
+
+
+def check_standard_win(counts: Sequence[int]) -> Optional[Dict]:
+    """
+    Table lookup for 4 melds + 1 pair on a 27-slot count array.
     We assume a standard 14-tile hand (after draw).
     """
-    
-    # find a pair first
-    # Create a list of potential pair candidates to avoid runtime error during iteration
-    candidates = [t for t, c in counts.items() if c >= 2]
-    
-    for tile in candidates:
-        if counts[tile] >= 2:
-            # Remove pair
-            counts[tile] -= 2
-            if counts[tile] == 0:
-                del counts[tile]
-                
-            # Check for remaining 4 melds (12 tiles)
-            melds = []
-            if solve_melds(counts, melds):
-                return {"pair": [tile, tile], "melds": melds}
-            
-            # Backtrack: put pair back
-            counts[tile] += 2
-            
-    return None
-
-def solve_melds(counts: Counter, melds: List[List[str]]) -> bool:
-    if sum(counts.values()) == 0:
-        return True
-    
-    # Pick the first available tile to try and form a meld with
-    first_tile = sorted(counts.keys())[0]
-    
-    # Try Triplet
-    if counts[first_tile] >= 3:
-        counts[first_tile] -= 3
-        if counts[first_tile] == 0:
-            del counts[first_tile]
-        
-        melds.append([first_tile] * 3)
-        if solve_melds(counts, melds):
-            return True
-        
-        # Backtrack
-        melds.pop()
-        counts[first_tile] += 3
-        
-    # Try Sequence
-    # Can only form sequence if it's a number tile
+    found = decompose_standard(pack_suits(counts))
+    if found is None:
+        return None
+    return _detail([(suit, decomps[0]) for suit, decomps in found])
+
+
+def find_waits(tiles: List[str], visible_tiles: Optional[List[str]] = None) -> WaitsResponse:
+    """
+    Ready-hand (听牌) analysis for a 3n+1 hand.
+
+    Every candidate tile only changes one suit vector, so each of the 27
+    candidates costs a single table probe on top of the per-suit lookups
+    done once for the hand.
+    """
+    if len(tiles) % 3 != 1 or len(tiles) > 3 * MAX_MELDS + 1:
+        return WaitsResponse(
+            is_ready=False,
+            message="Invalid tile count. A ready hand has 13 tiles (or 3n+1 with melds exposed).",
+        )
+
     try:
-        # Parse tile format: "{rank}{suit}" where suit is "wan", "tong", or "tiao"
-        if first_tile.endswith("wan"):
-            rank = int(first_tile[:-3])
-            suit = "wan"
-        elif first_tile.endswith("tong"):
-            rank = int(first_tile[:-4])
-            suit = "tong"
-        elif first_tile.endswith("tiao"):
-            rank = int(first_tile[:-4])
-            suit = "tiao"
+        counts = encode_tiles(tiles)
+        seen = encode_tiles(visible_tiles or [])
+    except TileError:
+        return WaitsResponse(is_ready=False, message=_INVALID_TILES)
+    keys = pack_suits(counts)
+
+    base = [_suit_decompositions(key) if key else (meld_tables()[0][0], False) for key in keys]
+
+    waits: List[WaitTile] = []
+    for idx in range(NUM_TILE_KINDS):
+        held = counts[idx]
+        if held >= MAX_COPIES:
+            continue
+        suit, rank = divmod(idx, 9)
+        decomps, has_pair = _suit_decompositions(keys[suit] + (1 << (_BITS * rank)))
+        if decomps is None:
+            continue
+
+        found: List[Tuple[int, Tuple[Decomposition, ...]]] = []
+        pairs = has_pair
+        for other, (other_decomps, other_pair) in enumerate(base):
+            if other == suit:
+                found.append((suit, decomps))
+                continue
+            if other_decomps is None:
+                break
+            pairs += other_pair
+            if keys[other]:
+                found.append((other, other_decomps))
+        else:
+            if pairs == 1:
+                waits.append(
+                    WaitTile(
+                        tile=TILE_IDS[idx],
+                        remaining=max(0, MAX_COPIES - held - seen[idx]),
+                        decompositions=expand_decompositions(found),
+                    )
+                )
+
+    # 七对 wait: six pairs plus one odd tile in a fully concealed hand.
+    if len(tiles) == 3 * MAX_MELDS + 1 and _pair_count(keys) == 6:
+        idx = next(i for i, n in enumerate(counts) if n & 1)
+        drawn = array("B", counts)
+        drawn[idx] += 1
+        detail = _qidui_detail(drawn)
+        wait = next((w for w in waits if w.tile == TILE_IDS[idx]), None)
+        if wait is not None:
+            wait.decompositions.append(detail)
         else:
-            raise ValueError("Not a numbered tile")
-        
-        t1 = first_tile
-        t2 = f"{rank+1}{suit}"
-        t3 = f"{rank+2}{suit}"
-        
-        if counts[t1] >= 1 and counts[t2] >= 1 and counts[t3] >= 1:
-            counts[t1] -= 1
-            counts[t2] -= 1
-            counts[t3] -= 1
-            
-            # Cleanup zeros
-            if counts[t1] == 0: del counts[t1]
-            if counts[t2] == 0: del counts[t2]
-            if counts[t3] == 0: del counts[t3]
-            
-            melds.append([t1, t2, t3])
-            if solve_melds(counts, melds):
-                return True
-                
-            # Backtrack
-            melds.pop()
-            counts[t1] += 1
-            counts[t2] += 1
-            counts[t3] += 1
-            
-    except (ValueError, IndexError):
-        pass # Not a number tile or invalid format
-        
-    return False
-
-def check_hand(tiles: List[str]) -> CheckHandResponse:
+            waits.append(
+                WaitTile(
+                    tile=TILE_IDS[idx],
+                    remaining=max(0, MAX_COPIES - counts[idx] - seen[idx]),
+                    decompositions=[detail],
+                )
+            )
+            waits.sort(key=lambda w: TILE_INDEX[w.tile])
+
+    if not waits:
+        return WaitsResponse(is_ready=False, message="Not ready yet.")
+    remaining_total = sum(w.remaining for w in waits)
+    return WaitsResponse(
+        is_ready=True,
+        message=f"Ready! Waiting on {len(waits)} tile(s), {remaining_total} copies left.",
+        waits=waits,
+        remaining_total=remaining_total,
+    )
+
+
+# --- Shanten (tiles away from ready) ---
+#
+# Convention: -1 = complete hand, 0 = ready (听牌), k = k tiles from ready.
+# Each suit is evaluated independently into its Pareto-best (melds, partials,
+# pair) blocks and memoized on the packed suit vector, so near-identical hands
+# (e.g. one discard apart) only re-evaluate the suit that changed.
+
+SuitBlocks = Tuple[Tuple[int, int, int], ...]  # (melds, partial melds, pair 0/1)
+
+
+def _prune_blocks(found: set) -> SuitBlocks:
+    # (m1, t1) dominates (m2, t2) when m1 >= m2 and m1 + t1 >= m2 + t2 (same pair flag).
+    kept = []
+    for m, t, p in found:
+        if not any(
+            om >= m and om + ot >= m + t and (om, ot) != (m, t)
+            for om, ot, op in found
+            if op == p
+        ):
+            kept.append((m, t, p))
+    return tuple(sorted(kept))
+
+
+@lru_cache(maxsize=1 << 16)
+def suit_blocks(key: int) -> SuitBlocks:
+    """All non-dominated block counts for one packed suit vector."""
+    if not key:
+        return ((0, 0, 0),)
+    r = 0
+    while not (key >> (_BITS * r)) & _DIGIT_MASK:
+        r += 1
+    c = (key >> (_BITS * r)) & _DIGIT_MASK
+    one = 1 << (_BITS * r)
+
+    def digit(rank: int) -> int:
+        return (key >> (_BITS * rank)) & _DIGIT_MASK if rank < 9 else 0
+
+    found = set(suit_blocks(key - one))  # tile left isolated
+    if c >= 3:
+        found.update((m + 1, t, p) for m, t, p in suit_blocks(key - 3 * one))
+    if digit(r + 1) and digit(r + 2):
+        found.update((m + 1, t, p) for m, t, p in suit_blocks(key - one * 0b001001001))
+    if c >= 2:
+        for m, t, p in suit_blocks(key - 2 * one):
+            found.add((m, t + 1, p))
+            if not p:
+                found.add((m, t, 1))
+    if digit(r + 1):
+        found.update((m, t + 1, p) for m, t, p in suit_blocks(key - one * 0b001001))
+    if digit(r + 2):
+        found.update((m, t + 1, p) for m, t, p in suit_blocks(key - one * 0b001000001))
+    return _prune_blocks(found)
+
+
+@lru_cache(maxsize=1 << 14)
+def merge_blocks(a: SuitBlocks, b: SuitBlocks) -> SuitBlocks:
+    """Combine the block options of two suit groups (at most one pair overall)."""
+    return _prune_blocks(
+        {(am + bm, at + bt, ap + bp) for am, at, ap in a for bm, bt, bp in b if ap + bp <= 1}
+    )
+
+
+def shanten_from_blocks(blocks: SuitBlocks, need: int) -> int:
+    return min(2 * need - 2 * m - min(t, need - m) - p for m, t, p in blocks)
+
+
+def standard_shanten(keys: List[int], n_tiles: int) -> int:
+    """Shanten for the 4-melds-plus-pair shape (n_tiles // 3 melds when melds are exposed)."""
+    blocks = merge_blocks(merge_blocks(suit_blocks(keys[0]), suit_blocks(keys[1])), suit_blocks(keys[2]))
+    return shanten_from_blocks(blocks, n_tiles // 3)
+
+
+def _pair_count(keys: List[int]) -> int:
+    pairs = 0
+    for key in keys:
+        while key:
+            pairs += (key & _DIGIT_MASK) // 2
+            key >>= _BITS
+    return pairs
+
+
+def qidui_shanten(keys: List[int]) -> int:
+    """Shanten for seven pairs; four of a kind counts as two pairs (龙七对)."""
+    return 6 - min(_pair_count(keys), 7)
+
+
+def shanten(tiles: List[str]) -> ShantenResponse:
+    """Tiles-away-from-ready for the standard and seven-pairs shapes."""
+    if len(tiles) % 3 == 0 or len(tiles) > 3 * MAX_MELDS + 2:
+        return ShantenResponse(
+            message="Invalid tile count. Use 13 or 14 tiles (or 3n+1 / 3n+2 with melds exposed)."
+        )
+    try:
+        keys = pack_suits(encode_tiles(tiles))
+    except TileError:
+        return ShantenResponse(message=_INVALID_TILES)
+
+    standard = standard_shanten(keys, len(tiles))
+    # Seven pairs needs a fully concealed hand.
+    qidui = qidui_shanten(keys) if len(tiles) >= 13 else None
+    best = standard if qidui is None else min(standard, qidui)
+    if best < 0:
+        message = "Winning hand!"
+    elif best == 0:
+        message = "Ready (听牌)."
+    else:
+        message = f"{best} tile(s) away from ready."
+    return ShantenResponse(shanten=best, standard=standard, qidui=qidui, message=message)
+
+
+def advise_discard(
+    tiles: List[str],
+    visible_tiles: Optional[List[str]] = None,
+    void_suit: Optional[Suit] = None,
+) -> DiscardAdviceResponse:
+    """
+    Rank every discard of a 3n+2 hand by resulting shanten and ukeire (有效进张).
+
+    Discarding or drawing a tile only changes one suit vector, so the untouched
+    suits are merged once and reused; per-suit blocks come from the memoized
+    suit_blocks. Tiles of the void suit (定缺) are always ranked first, never
+    counted as effective draws, and left out of every shanten (they must go,
+    so they never form a meld, pair or partial meld).
+    """
+    if len(tiles) % 3 != 2 or len(tiles) > 3 * MAX_MELDS + 2:
+        return DiscardAdviceResponse(
+            message="Invalid tile count. Discard advice needs 14 tiles (or 3n+2 with melds exposed)."
+        )
+
+    try:
+        counts = encode_tiles(tiles)
+        seen = encode_tiles(visible_tiles or [])
+    except TileError:
+        return DiscardAdviceResponse(message=_INVALID_TILES)
+    keys = pack_suits(counts)
+
+    void = list(Suit).index(void_suit) if void_suit is not None else -1
+    # shanten sees the void suit as empty (same as win_odds._shanten)
+    usable = [0 if s == void else key for s, key in enumerate(keys)]
+    need = len(tiles) // 3
+    with_qidui = len(tiles) - 1 >= 13
+    blocks = [suit_blocks(key) for key in usable]
+    rest = [merge_blocks(blocks[(s + 1) % 3], blocks[(s + 2) % 3]) for s in range(3)]
+    pairs = _pair_count(usable)
+
+    current = shanten_from_blocks(merge_blocks(rest[0], blocks[0]), need)
+    if len(tiles) >= 14:
+        current = min(current, qidui_shanten(usable))
+
+    options: List[DiscardOption] = []
+    for idx in range(NUM_TILE_KINDS):
+        held = counts[idx]
+        if not held:
+            continue
+        suit, rank = divmod(idx, 9)
+        after = list(keys)
+        after[suit] -= 1 << (_BITS * rank)
+        if suit == void:
+            after_blocks, pairs_after = blocks[suit], pairs
+        else:
+            after_blocks = suit_blocks(after[suit])
+            pairs_after = pairs - (1 - held % 2)
+
+        result = shanten_from_blocks(merge_blocks(rest[suit], after_blocks), need)
+        if with_qidui:
+            result = min(result, 6 - min(pairs_after, 7))
+
+        effective: List[str] = []
+        ukeire = 0
+        for draw in range(NUM_TILE_KINDS):
+            d_suit, d_rank = divmod(draw, 9)
+            if d_suit == void:
+                continue
+            key = after[d_suit]
+            near = (key >> (_BITS * max(0, d_rank - 2))) & ((1 << (_BITS * 5)) - 1)
+            if not near:
+                continue  # nothing within two ranks: cannot form a block
+            in_hand = (key >> (_BITS * d_rank)) & _DIGIT_MASK
+            if in_hand >= MAX_COPIES:
+                continue
+            drawn_blocks = suit_blocks(key + (1 << (_BITS * d_rank)))
+            if d_suit == suit:
+                merged = merge_blocks(rest[suit], drawn_blocks)
+            else:
+                third = 3 - suit - d_suit
+                merged = merge_blocks(merge_blocks(after_blocks, blocks[third]), drawn_blocks)
+            drawn = shanten_from_blocks(merged, need)
+            if with_qidui:
+                drawn = min(drawn, 6 - min(pairs_after + in_hand % 2, 7))
+            if drawn < result:
+                effective.append(TILE_IDS[draw])
+                ukeire += max(0, MAX_COPIES - counts[draw] - seen[draw])
+
+        options.append(
+            DiscardOption(
+                tile=TILE_IDS[idx],
+                is_void=suit == void,
+                shanten=result,
+                ukeire=ukeire,
+                effective_tiles=effective,
+            )
+        )
+
+    options.sort(key=lambda o: (not o.is_void, o.shanten, -o.ukeire))
+    best = options[0]
+    if best.is_void:
+        message = f"Discard {best.tile} first (void suit)."
+    else:
+        message = f"Discard {best.tile}: {best.shanten} shanten, {best.ukeire} effective draws."
+    return DiscardAdviceResponse(message=message, shanten=current, options=options)
+
+
+def check_hand(
+    tiles: List[str],
+    melds: Optional[List[List[str]]] = None,
+    kongs: Optional[List[str]] = None,
+) -> CheckHandResponse:
+    """
+    Check a hand given its concealed tiles and, optionally, its exposed
+    pungs (碰, three identical tiles each) and kongs (杠, one tile id each).
+    Exposed sets count towards 清一色 and 根 but are not re-decomposed.
+    """
+    melds = melds or []
+    kongs = kongs or []
+    n_exposed = len(melds) + len(kongs)
     # usually 14 tiles
-    if len(tiles) % 3 != 2:
+    if len(tiles) % 3 != 2 or len(tiles) + 3 * n_exposed > 3 * MAX_MELDS + 2:
          return CheckHandResponse(
             is_win=False,
             message="Invalid tile count. A winning hand usually has 14 tiles (e.g., 13 + 1 drawn)."
         )
-    
-    # Sort for consistency
-    sorted_tiles = parse_hand(tiles)
-    counts = Counter(sorted_tiles)
-    
-    result = check_standard_win(counts)
-    
-    if result:
+    if any(len(m) != 3 or len(set(m)) != 1 for m in melds):
         return CheckHandResponse(
-            is_win=True,
-            message=f"Winning hand! Found pair {result['pair'][0]} and {len(result['melds'])} melds.",
-            detail=result
+            is_win=False,
+            message="Invalid exposed meld. Exposed melds must be pungs (three identical tiles)."
         )
-    else:
-         return CheckHandResponse(
+
+    try:
+        counts = encode_tiles(tiles)
+        exposed = encode_tiles([t for m in melds for t in m] + [t for t in kongs for _ in range(MAX_COPIES)])
+        encode_tiles(list(tiles) + decode_counts(exposed))  # at most 4 copies overall
+    except TileError:
+        return CheckHandResponse(is_win=False, message=_INVALID_TILES)
+
+    return _check_counts(counts, exposed if n_exposed else None, n_exposed)
+
+
+# Hand shapes from rules_winning.json that can be read off the tiles alone.
+HAND_PINGHU = "hand.pinghu"
+HAND_PENGPENGHU = "hand.pengpenghu"
+HAND_QIDUI = "hand.qidui"
+HAND_JINGGOUDIAO = "hand.jinggoudiao"
+FACTOR_QINGYISE = "factor.qingyise"
+FACTOR_GEN = "factor.gen"
+
+
+def _qidui_detail(counts: Sequence[int]) -> Dict:
+    pairs = [[TILE_IDS[i]] * 2 for i, n in enumerate(counts) for _ in range(n // 2)]
+    return {"melds": [], "pair": [], "pairs": pairs}
+
+
+def detect_shapes(
+    counts: Sequence[int],
+    exposed: Optional[Sequence[int]] = None,
+    n_exposed: int = 0,
+) -> Tuple[List[Tuple[str, Dict]], Dict[str, FactorValue]]:
+    """
+    Every winning shape of a 3n+2 count vector plus the factors derivable from tiles.
+
+    `exposed` is the count vector of exposed pungs/kongs (n_exposed sets).
+    Returns ([(hand_id, detail), ...], factor_values); the list is empty if the
+    hand does not win. One pass over the vectors collects suit keys, 根 and
+    pair parity; the standard shape is then a few table probes.
+    """
+    keys = [0, 0, 0]
+    suits = 0
+    gen = 0
+    odd = 0
+    n_tiles = 0
+    for i, n in enumerate(counts):
+        total = n + exposed[i] if exposed is not None else n
+        if not total:
+            continue
+        suit, rank = divmod(i, 9)
+        suits |= 1 << suit
+        gen += total == MAX_COPIES
+        if n:
+            keys[suit] += n << (_BITS * rank)
+            odd += n & 1
+            n_tiles += n
+
+    shapes: List[Tuple[str, Dict]] = []
+    found = decompose_standard(keys)
+    if found is not None:
+        shapes.append((HAND_PINGHU, _detail([(suit, decomps[0]) for suit, decomps in found])))
+        # 碰碰胡: every suit has a decomposition made of triplets only (meld ids 0..8).
+        triplets = []
+        for suit, decomps in found:
+            d = next((d for d in decomps if all(m < 9 for m in d[1])), None)
+            if d is None:
+                break
+            triplets.append((suit, d))
+        else:
+            shapes.append((HAND_PENGPENGHU, _detail(triplets)))
+        if n_tiles == 2:
+            # Only the pair is concealed: every other meld was exposed.
+            shapes.append((HAND_JINGGOUDIAO, shapes[0][1]))
+    if n_tiles == 3 * MAX_MELDS + 2 and not odd:
+        shapes.append((HAND_QIDUI, _qidui_detail(counts)))
+
+    factors: Dict[str, FactorValue] = {}
+    # 清一色 needs the whole hand: concealed tiles plus every exposed set.
+    complete = n_tiles + 3 * n_exposed == 3 * MAX_MELDS + 2
+    if shapes and complete and suits in (1, 2, 4):
+        factors[FACTOR_QINGYISE] = True
+    if shapes and gen:
+        factors[FACTOR_GEN] = gen
+    return shapes, factors
+
+
+def _check_counts(
+    counts: Sequence[int],
+    exposed: Optional[Sequence[int]] = None,
+    n_exposed: int = 0,
+) -> CheckHandResponse:
+    shapes, factors = detect_shapes(counts, exposed, n_exposed)
+    if not shapes:
+        return CheckHandResponse(
             is_win=False,
             message="Not a winning hand yet."
         )
 
+    # Pick the interpretation worth the most under the ruleset.
+    best: Optional[Tuple[int, str, Dict]] = None
+    for hand_id, detail in shapes:
+        try:
+            total = compute_total_multiplier(is_win=True, hand_id=hand_id, factors=factors).total_multiplier
+        except RulesetError:
+            continue
+        if best is None or total > best[0]:
+            best = (total, hand_id, detail)
+
+    if best is None:
+        hand_id, detail = shapes[0]
+        return CheckHandResponse(
+            is_win=True,
+            message="Winning hand!",
+            detail=detail,
+            hand_type_id=hand_id,
+            factor_values=factors,
+        )
+
+    total, hand_id, detail = best
+    name = (get_ruleset_indexed().hands_by_id.get(hand_id) or {}).get("name") or {}
+    return CheckHandResponse(
+        is_win=True,
+        message=f"Winning hand! {name.get('zh', hand_id)} ({name.get('en', hand_id)}), total x{total}.",
+        detail=detail,
+        hand_type_id=hand_id,
+        factor_values=factors,
+        total_multiplier=total,
+    )
+
+
+def check_hands(hands: List[List[str]]) -> List[CheckHandResponse]:
+    """
+    Batch version of check_hand; results are returned in input order.
+
+    Hands are encoded once and deduplicated on their count vector, so each
+    distinct hand costs one set of table probes no matter how often it repeats
+    (replayed games repeat the same hands a lot). Repeats get their own copy
+    of the result, so mutating one entry never changes another.
+    """
+    by_vector: Dict[bytes, CheckHandResponse] = {}
+    results: List[CheckHandResponse] = []
+    for tiles in hands:
+        if len(tiles) % 3 != 2 or len(tiles) > 3 * MAX_MELDS + 2:
+            results.append(check_hand(tiles))
+            continue
+        try:
+            counts = encode_tiles(tiles)
+        except TileError:
+            results.append(CheckHandResponse(is_win=False, message=_INVALID_TILES))
+            continue
+        vector = counts.tobytes()
+        result = by_vector.get(vector)
+        if result is None:
+            result = by_vector[vector] = _check_counts(counts)
+        else:
+            result = result.model_copy(deep=True)
+        results.append(result)
+    return results
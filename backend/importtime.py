@@ -0,0 +1,97 @@
+"""
+Import-time report for the app entry point (cold-start budget check).
+
+Runs `python -X importtime -c "import backend.main"` in a fresh interpreter
+(best of --runs) and reports the total, the app's own modules and the
+slowest imports. Exits non-zero when the total is over --budget-ms or when
+a module that must stay lazy (the LLM SDK) was imported eagerly:
+
+    python -m backend.importtime --budget-ms 800
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+DEFAULT_MODULE = "backend.main"
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "800"))
+# Imported on first use only; an eager import here is a cold-start regression.
+LAZY_MODULES = ("google.genai",)
+
+# (module, self us, cumulative us, depth)
+ImportRow = Tuple[str, int, int, int]
+
+
+def measure(module: str = DEFAULT_MODULE) -> List[ImportRow]:
+    """Import `module` in a fresh interpreter and parse its -X importtime log."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+
+    rows: List[ImportRow] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:") :].split("|"))
+        if not self_us.isdigit():
+            continue  # header line
+        raw = line.rsplit("|", 1)[1]
+        depth = (len(raw) - len(raw.lstrip(" ")) - 1) // 2
+        rows.append((name, int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def report(rows: Sequence[ImportRow], module: str, top: int) -> Tuple[float, List[str]]:
+    """Print the report; returns (total ms, eagerly imported lazy modules)."""
+    end = next(i for i, row in enumerate(rows) if row[0] == module and row[3] == 0)
+    start = max((i for i in range(end) if rows[i][3] == 0), default=-1) + 1
+    subtree = rows[start : end + 1]  # children are logged before their parent
+
+    total = rows[end][2] / 1000
+    package = module.split(".", 1)[0]
+    own = [(name, self_us) for name, self_us, _, _ in subtree if name.split(".", 1)[0] == package]
+    top_level = sorted(((cum, name) for name, _, cum, depth in subtree if depth == 1), reverse=True)
+    eager = [name for name, _, _, _ in rows if name in LAZY_MODULES]
+
+    print(f"import {module}: {total:.1f} ms total")
+    print(f"  {package}.* own code: {sum(s for _, s in own) / 1000:.1f} ms")
+    for name, self_us in sorted(own, key=lambda item: -item[1])[:top]:
+        print(f"    {self_us / 1000:8.1f} ms  {name}")
+    print("  slowest direct imports (cumulative):")
+    for cum, name in top_level[:top]:
+        print(f"    {cum / 1000:8.1f} ms  {name}")
+    return total, eager
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Import-time report / cold-start budget check")
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="report the fastest of N fresh imports")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(max(1, args.runs))]
+    best = min(runs, key=lambda rows: next((cum for name, _, cum, _ in rows if name == args.module), 0))
+    total, eager = report(best, args.module, args.top)
+
+    failures = []
+    if total > args.budget_ms:
+        failures.append(f"{total:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+    failures += [f"{name} is imported eagerly (must stay lazy)" for name in eager]
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"OK: within {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from typing import List
 
 from .config import settings
@@ -9,19 +10,49 @@ from .models import (
     BasicRule,
     CheckHandRequest,
     CheckHandResponse,
+    CheckHandsRequest,
+    CheckHandsResponse,
+    WaitsRequest,
+    WaitsResponse,
+    ShantenRequest,
+    ShantenResponse,
+    DiscardAdviceRequest,
+    DiscardAdviceResponse,
+    WinProbabilityRequest,
+    WinProbabilityResponse,
     QARequest,
     QAResponse,
     RuleBasedScoreRoundRequest,
     RuleBasedScoreRoundResponse,
+    ScoreRoundsRequest,
+    ScoreRoundsResponse,
+    HandScoreRoundRequest,
+    HandScoreRoundResponse,
+    FullHandSettlementRequest,
+    FullHandSettlementResponse,
+    CreateSessionRequest,
+    SessionRoundRequest,
+    SessionRoundResponse,
+    SessionStandingsResponse,
     RuleSearchRequest,
     RuleSearchResponse,
+    RulesetVersionResponse,
 )
 from .tiles import ALL_TILES
-from .rules import get_rules as get_all_rules, search_rules_simple, get_basic_rules
-from .hand_checker import check_hand
-from .scoring import calculate_rule_based_scores
-from .qa import get_answer
-from .ruleset import get_ruleset
+from .rules import get_rules as get_all_rules, search_rules_simple, search_rules_fuzzy, get_basic_rules
+from .hand_checker import check_hand, check_hands, find_waits, shanten, advise_discard
+from .win_odds import estimate_win_probability
+from .scoring import (
+    HandSettlementError,
+    calculate_rule_based_scores,
+    score_round_from_hand,
+    score_rounds,
+    settle_full_hand,
+)
+from .qa import get_answer_async, stream_answer
+from .ruleset import get_ruleset, ruleset_version
+from .snapshot import basics_version, load_snapshot
+from .sessions import SESSIONS, Session, SessionError, SessionNotFoundError
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
@@ -60,7 +91,7 @@ def search_rules_endpoint(request: RuleSearchRequest):
     """
     Search rules by natural language query.
 
-    It returns only rule IDs, ordered by a naive relevance score, so that
+    It returns only rule IDs, ordered by BM25 relevance, so that
     the frontend can sort / highlight matching items.
     """
 
@@ -68,16 +99,83 @@ def search_rules_endpoint(request: RuleSearchRequest):
     return RuleSearchResponse(rule_ids=rule_ids)
 
 
+@app.get(f"{settings.API_V1_STR}/rules/suggest", response_model=RuleSearchResponse)
+def suggest_rules_endpoint(q: str = "", limit: int = 10):
+    """
+    Search-as-you-type: typo-tolerant prefix lookup by rule name, alias or
+    pinyin ("qingyise", "qing yi se", "pengpeng").
+    """
+
+    return RuleSearchResponse(rule_ids=search_rules_fuzzy(q, max(0, limit)))
+
+
 @app.get(f"{settings.API_V1_STR}/ruleset")
 def get_ruleset_endpoint():
     """Returns the full ruleset JSON (single source of truth)."""
     return get_ruleset()
 
+
+@app.get(f"{settings.API_V1_STR}/ruleset/version", response_model=RulesetVersionResponse)
+def get_ruleset_version_endpoint():
+    """Content hashes of the active ruleset and the basic rules."""
+    return RulesetVersionResponse(
+        ruleset=ruleset_version(),
+        basics=basics_version(),
+        snapshot=load_snapshot() is not None,
+    )
+
 @app.post(f"{settings.API_V1_STR}/check_hand", response_model=CheckHandResponse)
 def check_hand_endpoint(request: CheckHandRequest):
     """Checks if the provided tiles form a winning hand."""
-    return check_hand(request.tiles)
+    return check_hand(request.tiles, request.melds, request.kongs)
+
 
+@app.post(f"{settings.API_V1_STR}/check_hands", response_model=CheckHandsResponse)
+def check_hands_endpoint(request: CheckHandsRequest):
+    """Batch hand check for offline replays; results follow the input order."""
+    return CheckHandsResponse(results=check_hands(request.hands))
+
+
+@app.post(f"{settings.API_V1_STR}/waits", response_model=WaitsResponse)
+def waits_endpoint(request: WaitsRequest):
+    """
+    Ready-hand analysis: for a 13-tile (3n+1) hand, returns every tile that
+    completes it, with decompositions and remaining copies given visible tiles.
+    """
+    return find_waits(request.tiles, request.visible_tiles)
+
+
+@app.post(f"{settings.API_V1_STR}/shanten", response_model=ShantenResponse)
+def shanten_endpoint(request: ShantenRequest):
+    """How many tiles the hand is from ready (standard and seven-pairs shapes)."""
+    return shanten(request.tiles)
+
+
+@app.post(f"{settings.API_V1_STR}/discard_advice", response_model=DiscardAdviceResponse)
+def discard_advice_endpoint(request: DiscardAdviceRequest):
+    """
+    Ranks every discard of a 14-tile hand by resulting shanten and effective
+    draws (ukeire). Void-suit (定缺) tiles are always recommended first.
+    """
+    return advise_discard(request.tiles, request.visible_tiles, request.void_suit)
+
+
+@app.post(f"{settings.API_V1_STR}/win_probability", response_model=WinProbabilityResponse)
+def win_probability_endpoint(request: WinProbabilityRequest):
+    """
+    Chance to win by self-draw within the next N own draws, plus the expected
+    payout, from the unseen tile counts. Estimates are cached per hand state.
+    """
+    return estimate_win_probability(
+        request.tiles,
+        request.melds,
+        request.kongs,
+        request.visible_tiles,
+        request.wall_remaining,
+        request.draws,
+        request.players_in_hand,
+        request.void_suit,
+    )
 
 
 @app.post(
@@ -97,10 +195,136 @@ def score_round_rule_based_endpoint(request: RuleBasedScoreRoundRequest):
 
     return calculate_rule_based_scores(request)
 
+
+@app.post(f"{settings.API_V1_STR}/score_rounds", response_model=ScoreRoundsResponse)
+def score_rounds_endpoint(request: ScoreRoundsRequest):
+    """
+    Batch / replay scoring for one table: every round is scored with the
+    same rules as /score_round_rule_based and rolled into final standings.
+    """
+    return score_rounds(request)
+
+
+@app.post(
+    f"{settings.API_V1_STR}/score_round_from_hand",
+    response_model=HandScoreRoundResponse,
+)
+def score_round_from_hand_endpoint(request: HandScoreRoundRequest):
+    """
+    One-call scoring from the winner's tiles: detects the hand type and
+    factors (清一色 / 根 / win context), then settles the round exactly like
+    /score_round_rule_based, kongs included.
+    """
+    return score_round_from_hand(request)
+
+
+@app.post(
+    f"{settings.API_V1_STR}/settle_full_hand",
+    response_model=FullHandSettlementResponse,
+)
+def settle_full_hand_endpoint(request: FullHandSettlementRequest):
+    """
+    血战到底 whole-hand settlement: ordered wins / kongs, then 查花猪 and
+    查大叫 on the hands left when the wall runs out.
+    """
+    try:
+        return settle_full_hand(request)
+    except HandSettlementError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _standings(session: Session) -> SessionStandingsResponse:
+    return SessionStandingsResponse(
+        session_id=session.id, rounds=len(session.rounds), players=session.standings()
+    )
+
+
+def _session_http_error(e: SessionError) -> HTTPException:
+    return HTTPException(status_code=404 if isinstance(e, SessionNotFoundError) else 400, detail=str(e))
+
+
+@app.post(f"{settings.API_V1_STR}/sessions", response_model=SessionStandingsResponse)
+def create_session_endpoint(request: CreateSessionRequest):
+    """
+    Starts a multi-round session; later rounds only send player_rounds.
+
+    Sessions are held in memory by the serving process: they do not survive
+    a restart and are not shared across workers / serverless instances.
+    """
+    try:
+        return _standings(SESSIONS.create(request.players))
+    except SessionError as e:
+        raise _session_http_error(e)
+
+
+@app.get(f"{settings.API_V1_STR}/sessions/{{session_id}}", response_model=SessionStandingsResponse)
+def get_session_endpoint(session_id: str):
+    """Current standings of a session."""
+    try:
+        return _standings(SESSIONS.get(session_id))
+    except SessionError as e:
+        raise _session_http_error(e)
+
+
+@app.post(
+    f"{settings.API_V1_STR}/sessions/{{session_id}}/rounds",
+    response_model=SessionRoundResponse,
+)
+def append_session_round_endpoint(session_id: str, request: SessionRoundRequest):
+    """Scores one round (same rules as /score_round_rule_based) and adds it to the ledger."""
+    try:
+        session, scores = SESSIONS.append_round(
+            session_id, request.player_rounds, request.include_rule_ids
+        )
+    except SessionError as e:
+        raise _session_http_error(e)
+    return SessionRoundResponse(
+        session_id=session.id,
+        rounds=len(session.rounds),
+        players=session.standings(),
+        player_scores=scores,
+    )
+
+
+@app.delete(
+    f"{settings.API_V1_STR}/sessions/{{session_id}}/rounds/last",
+    response_model=SessionStandingsResponse,
+)
+def undo_session_round_endpoint(session_id: str):
+    """Removes the most recent round and rolls the standings back."""
+    try:
+        return _standings(SESSIONS.undo_last_round(session_id))
+    except SessionError as e:
+        raise _session_http_error(e)
+
+
 @app.post(f"{settings.API_V1_STR}/qa", response_model=QAResponse)
-def qa_endpoint(request: QARequest):
-    """Answers a natural language question."""
-    return get_answer(request.question)
+async def qa_endpoint(request: QARequest):
+    """
+    Answers a natural language question. Async so slow LLM calls wait on
+    the event loop instead of holding threadpool workers.
+    """
+    return await get_answer_async(request.question)
+
+
+@app.post(f"{settings.API_V1_STR}/qa/stream")
+async def qa_stream_endpoint(request: QARequest):
+    """
+    Streaming /qa over server-sent events: one `data:` event per answer
+    piece (a QAResponse JSON; cached / rule answers come as a single
+    piece), then `event: done`.
+    """
+
+    async def events():
+        async for chunk in stream_answer(request.question):
+            yield f"data: {chunk.model_dump_json()}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 if __name__ == "__main__":
     import uvicorn
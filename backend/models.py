@@ -15,6 +15,7 @@ class Suit(str, Enum):
 
 class Tile(BaseModel):
     id: str
+    index: int                   # compact encoding 0..26 (see tiles.TILE_INDEX)
     suit: Suit
     rank: int
     name_cn: str
@@ -66,15 +67,97 @@ class Player(BaseModel):
 # Hand Checker
 class CheckHandRequest(BaseModel):
     tiles: List[str]  # List of tile IDs, e.g., ["1wan", "2wan", "3tiao", ...]
+    melds: List[List[str]] = []  # exposed pungs (碰), e.g. [["5tong", "5tong", "5tong"]]
+    kongs: List[str] = []        # exposed / concealed kongs (杠), one tile id each
 
 class HandDetail(BaseModel):
-    melds: List[List[str]]
-    pair: List[str]
+    melds: List[List[str]] = []
+    pair: List[str] = []
+    pairs: List[List[str]] = []  # seven pairs (七对) only
 
 class CheckHandResponse(BaseModel):
     is_win: bool
     message: str
     detail: Optional[HandDetail] = None
+    # Best-scoring interpretation, ready to feed into PlayerRoundInput.
+    hand_type_id: Optional[str] = None
+    factor_values: Dict[str, Union[bool, int]] = {}
+    total_multiplier: Optional[int] = None
+
+class CheckHandsRequest(BaseModel):
+    hands: List[List[str]]  # many hands at once, e.g. from a replayed game log
+
+class CheckHandsResponse(BaseModel):
+    results: List[CheckHandResponse]  # same order as request.hands
+
+# Ready hand / waits
+class WaitsRequest(BaseModel):
+    tiles: List[str]                # 3n+1 concealed tiles, e.g. 13 tiles before the draw
+    visible_tiles: List[str] = []   # tiles already seen on the table (discards, exposed melds)
+
+class WaitTile(BaseModel):
+    tile: str
+    remaining: int                  # copies not in hand and not visible
+    decompositions: List[HandDetail]
+
+class WaitsResponse(BaseModel):
+    is_ready: bool
+    message: str
+    waits: List[WaitTile] = []
+    remaining_total: int = 0
+
+# Shanten (-1 = complete, 0 = ready, k = k tiles from ready)
+class ShantenRequest(BaseModel):
+    tiles: List[str]
+
+class ShantenResponse(BaseModel):
+    message: str
+    shanten: Optional[int] = None   # best of the shapes below
+    standard: Optional[int] = None  # 4 melds + 1 pair
+    qidui: Optional[int] = None     # seven pairs (concealed 13/14-tile hands only)
+
+# Discard advice (ukeire / 有效进张)
+class DiscardAdviceRequest(BaseModel):
+    tiles: List[str]                # 3n+2 tiles, e.g. 14 tiles right after the draw
+    visible_tiles: List[str] = []
+    void_suit: Optional[Suit] = None  # 定缺: tiles of this suit are discarded first
+
+class DiscardOption(BaseModel):
+    tile: str
+    is_void: bool = False
+    shanten: int                    # shanten of the 13 tiles left after this discard
+    ukeire: int                     # remaining copies of all effective draws
+    effective_tiles: List[str] = []
+
+class DiscardAdviceResponse(BaseModel):
+    message: str
+    shanten: Optional[int] = None   # shanten of the hand before discarding
+    options: List[DiscardOption] = []  # best first
+
+# Win probability (自摸 within the player's next N draws)
+class WinProbabilityRequest(BaseModel):
+    tiles: List[str]                # 3n+1 concealed tiles (after discarding)
+    melds: List[List[str]] = []     # exposed pungs (碰)
+    kongs: List[str] = []           # one tile id per kong
+    visible_tiles: List[str] = []   # discards and other players' exposed sets
+    wall_remaining: int
+    draws: Optional[int] = None     # own draws to consider; default: share of the wall
+    players_in_hand: int = 4        # incl. this player; the others pay a 自摸
+    void_suit: Optional[Suit] = None
+
+class WaitOdds(BaseModel):
+    tile: str
+    remaining: int                  # unseen copies
+    total_multiplier: int           # settlement multiplier when self-drawn
+
+class WinProbabilityResponse(BaseModel):
+    message: str
+    shanten: Optional[int] = None
+    draws: int = 0
+    win_probability: float = 0.0
+    expected_score: float = 0.0     # expected 自摸 payout: multiplier x payers x P
+    exact: bool = True              # True only for ready hands (hypergeometric); otherwise an estimate
+    waits: List[WaitOdds] = []      # ready hands only
 
 # --- Rule-based, multi-player / multi-event scoring ---
 
@@ -104,6 +187,25 @@ class KongEventInput(BaseModel):
     payer_names: List[str] = []       # for bu_gang / an_gang (multi-select)
 
 
+class RoundEventInput(BaseModel):
+    """
+    Any fixed-point event declared in the ruleset's events[] (by id). Who pays
+    follows the event's payer_policy:
+    - single_payer: payer_name
+    - listed: payer_names (or payer_name)
+    - all_not_won: payer_names, else everyone who did not win this round
+    - all_others: every other player
+    transfer_fixed events pay amount_per_payer; transfer_hand_multiplier events
+    pay `multiplier`.
+    """
+
+    event_id: str
+    payer_name: Optional[str] = None
+    payer_names: List[str] = []
+    # transfer_hand_multiplier events: the multiplier each payer owes
+    multiplier: Optional[int] = None
+
+
 class PlayerRoundInput(BaseModel):
     """
     Per-player round description.
@@ -131,6 +233,8 @@ class PlayerRoundInput(BaseModel):
     factor_values: Dict[str, Union[bool, int]] = {}
     # Kong events (fixed points, independent from win multipliers)
     kong_events: List[KongEventInput] = []
+    # Other ruleset events (house rules added in JSON), same settlement as kongs
+    events: List[RoundEventInput] = []
     # Manual adjustment
     manual_delta: int = 0
     extra_rule_ids: List[str] = []
@@ -138,16 +242,42 @@ class PlayerRoundInput(BaseModel):
     penalty_rule_ids: List[str] = []
 
 
+class AppliedRuleKind(str, Enum):
+    HAND = "hand"        # 胡牌番型（结算主体）
+    FACTOR = "factor"    # 加番项（自摸 / 根 / 清一色 ...）
+    EVENT = "event"      # 固定分事件（杠）
+    MANUAL = "manual"    # 手动调整
+
+
+class AppliedRule(BaseModel):
+    """
+    One structured entry of a player's round breakdown.
+
+    - hand / event records are transfers: `counterparty` paid (amount > 0) or was
+      paid (amount < 0); hand/event/manual amounts sum to the player's delta.
+    - factor records follow their hand record and carry only `multiplier`.
+    """
+
+    rule_id: str
+    kind: AppliedRuleKind
+    counterparty: Optional[str] = None
+    amount: int = 0
+    multiplier: int = 1
+
+
 class PlayerRoundScore(BaseModel):
     """Scoring breakdown for a single player in one round."""
 
     name: str
     # Breakdown: win_score + kong_score (+ manual) => delta
     win_score: int = 0
-    kong_score: int = 0
+    kong_score: int = 0           # kongs + other fixed-point ruleset events
     manual_score: int = 0
     delta: int = 0                # Total score change this round (can be negative)
-    applied_rule_ids: List[str]   # All rules that contributed
+    applied_rules: List[AppliedRule] = []
+    # Legacy string tags ("payers:A,B", "paid_for:X", ...); only filled when the
+    # request sets include_rule_ids.
+    applied_rule_ids: List[str] = []
 
 
 class RuleBasedScoreRoundRequest(BaseModel):
@@ -166,18 +296,176 @@ class RuleBasedScoreRoundRequest(BaseModel):
 
     players: List[Player]
     player_rounds: List[PlayerRoundInput]
+    include_rule_ids: bool = False  # also render legacy applied_rule_ids tags
 
 
 class RuleBasedScoreRoundResponse(BaseModel):
     players: List[Player]               # Updated scoreboard after this round
     player_scores: List[PlayerRoundScore]
 
+
+class ScoreRoundsRequest(BaseModel):
+    """Whole-game replay: starting scoreboard + ordered rounds (each = player_rounds)."""
+
+    players: List[Player]
+    rounds: List[List[PlayerRoundInput]]
+    include_rule_ids: bool = False
+
+
+class ScoreRoundsResponse(BaseModel):
+    players: List[Player]                       # final standings
+    rounds: List[List[PlayerRoundScore]]        # per-round breakdowns, input order
+
+
+# --- Multi-round sessions (server-side ledger) ---
+
+class CreateSessionRequest(BaseModel):
+    players: List[Player]               # starting scoreboard
+
+
+class SessionRoundRequest(BaseModel):
+    player_rounds: List[PlayerRoundInput]
+    include_rule_ids: bool = False
+
+
+class SessionStandingsResponse(BaseModel):
+    session_id: str
+    rounds: int                         # number of rounds recorded
+    players: List[Player]               # running totals
+
+
+class SessionRoundResponse(SessionStandingsResponse):
+    player_scores: List[PlayerRoundScore]  # breakdown of the round just appended
+
+
+# --- Hand-to-score pipeline (tiles in, settlement out) ---
+
+class WinContext(BaseModel):
+    """Win-time situation flags; each maps to a boolean ruleset factor."""
+
+    zimo: bool = False              # 自摸 -> factor.zimo
+    gangshangkaihua: bool = False   # 杠上开花 -> factor.gangshangkaihua
+    qiangganghu: bool = False       # 抢杠胡 -> factor.qiangganghu
+    haidilaoyue: bool = False       # 海底捞月 -> factor.haidilaoyue
+
+
+class KongInput(BaseModel):
+    """A kong held by the winner: counts as 根 and settles as a kong event."""
+
+    tile: str
+    type: KongEventType
+    payer_name: Optional[str] = None  # only for dian_gang
+    payer_names: List[str] = []       # for bu_gang / an_gang (multi-select)
+
+
+class HandScoreRoundRequest(BaseModel):
+    """
+    One round scored straight from the winner's tiles.
+
+    The engine detects the hand type and tile-derived factors (清一色 / 根),
+    adds the win-context factors, then settles like /score_round_rule_based.
+    - payer_name: the discarder (点炮). For 自摸 leave it empty: payer_names
+      defaults to every other player.
+    - other_rounds: kongs / manual adjustments of the other players.
+    """
+
+    players: List[Player]
+    winner_name: str
+    tiles: List[str]                 # concealed tiles including the winning tile
+    melds: List[List[str]] = []      # exposed pungs (碰)
+    kongs: List[KongInput] = []
+    context: WinContext = WinContext()
+    payer_name: Optional[str] = None
+    payer_names: List[str] = []
+    other_rounds: List[PlayerRoundInput] = []
+    include_rule_ids: bool = False
+
+
+class HandScoreRoundResponse(RuleBasedScoreRoundResponse):
+    hand: CheckHandResponse          # detected hand; is_win=false means no win was scored
+
+
+# --- 血战到底: whole-hand settlement ---
+
+
+class HandActionType(str, Enum):
+    WIN = "win"      # 胡牌（胡了的人退出本局，其余继续）
+    KONG = "kong"    # 杠
+
+
+class HandAction(BaseModel):
+    """
+    One step of a 血战到底 hand, in play order.
+
+    - win: `tiles` = concealed tiles incl. the winning tile, `melds` = exposed
+      pungs; the player's earlier kong actions count as kongs (根).
+      payer_name = discarder (点炮); 自摸 => every player still in the hand pays.
+    - kong: `kong` describes it; 补杠/暗杠 default to every player still in the hand.
+    """
+
+    type: HandActionType
+    player_name: str
+    tiles: List[str] = []
+    melds: List[List[str]] = []
+    context: WinContext = WinContext()
+    payer_name: Optional[str] = None
+    kong: Optional[KongInput] = None
+
+
+class EndOfWallHand(BaseModel):
+    """A player still in the hand when the wall runs out (流局): concealed tiles + exposed pungs."""
+
+    name: str
+    tiles: List[str]
+    melds: List[List[str]] = []
+    void_suit: Optional[Suit] = None  # 定缺; holding any tile of it makes the hand 花猪
+
+
+class FullHandSettlementRequest(BaseModel):
+    """
+    Whole-hand settlement for 血战到底.
+
+    Wins and kongs are settled in order (players who have won no longer pay
+    later kongs / 自摸). If the wall runs out, `end_hands` of the remaining
+    players drive 查花猪 (a hand still holding three suits, or a tile of its
+    void_suit, pays every non-花猪 player) and 查大叫 (every hand that is not ready pays each ready
+    hand its best possible multiplier). Remaining players without an
+    end_hands entry are left out of both checks.
+    """
+
+    players: List[Player]
+    actions: List[HandAction]
+    end_hands: List[EndOfWallHand] = []
+    include_rule_ids: bool = False
+
+
+class EndOfWallState(BaseModel):
+    name: str
+    is_huazhu: bool               # 花猪：三门都有
+    is_ready: bool                # 听牌
+    best_multiplier: int = 0      # best hand over the waits (查大叫 amount)
+
+
+class FullHandSettlementResponse(RuleBasedScoreRoundResponse):
+    wins: List[CheckHandResponse]         # detected hand of each win action, in order
+    end_states: List[EndOfWallState] = []
+
 # QA
 class QARequest(BaseModel):
     question: str
 
+class QAAnswerSource(str, Enum):
+    """Where an answer came from: the LLM, the answer cache, or the ruleset itself."""
+
+    LLM = "llm"
+    CACHE = "cache"
+    RULES = "rules"
+
+
 class QAResponse(BaseModel):
     answer: str
+    # None: no answer (LLM not configured or failed; `answer` explains why)
+    source: Optional[QAAnswerSource] = None
 
 
 # --- Rules search (for Learn / Basic Rules tab) ---
@@ -195,3 +483,12 @@ class RuleSearchResponse(BaseModel):
     rule_ids: List[str]
 
 
+class RulesetVersionResponse(BaseModel):
+    """Content hashes of the rule files (change whenever the rules do), for client caches."""
+
+    ruleset: str
+    basics: str
+    # a fresh precompiled snapshot (make snapshot) is in use instead of JSON
+    snapshot: bool = False
+
+
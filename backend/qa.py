@@ -1,10 +1,57 @@
-from typing import Any, Dict, Optional
-import json
-from google import genai
-from .models import QAResponse
-from .ruleset import get_ruleset
+import asyncio
+import logging
+from threading import Lock
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from .models import QAAnswerSource, QAResponse
+from .qa_cache import AnswerCache
+from .qa_context import get_qa_context, normalize_question
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
+# LLM backend: (question, is_zh) -> answer, or None when unavailable / failed.
+LLM = Callable[[str, bool], Optional[str]]
+AsyncLLM = Callable[[str, bool], Awaitable[Optional[str]]]
+# Streaming backend: yields answer text pieces as the model produces them.
+StreamLLM = Callable[[str, bool], AsyncGenerator[str, None]]
+
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Process-wide answer cache (opened on first use)."""
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache(
+                    settings.QA_CACHE_PATH,
+                    max_entries=settings.QA_CACHE_MAX_ENTRIES,
+                    ttl=settings.QA_CACHE_TTL_SECONDS,
+                )
+    return _answer_cache
+
+
+async def _cache_get(key: Optional[str]) -> Optional[str]:
+    # SQLite I/O (and the first call opening the file) runs off the event loop
+    if not key:
+        return None
+    return await asyncio.to_thread(lambda: get_answer_cache().get(key))
+
+
+async def _cache_put(key: str, answer: str) -> None:
+    await asyncio.to_thread(lambda: get_answer_cache().put(key, answer))
+
+
+def _cache_key(question: str, is_zh: bool) -> Optional[str]:
+    # Same core question, same answer language, same rules (ruleset and
+    # basics content hash) -> same answer. Questions that normalize to
+    # nothing ("what is it?") are not cached.
+    core = normalize_question(question)
+    return f"{get_qa_context().version}:{'zh' if is_zh else 'en'}:{core}" if core else None
+
+
 def _is_zh(text: str) -> bool:
     return any("\u4e00" <= ch <= "\u9fff" for ch in (text or ""))
 
@@ -17,53 +64,30 @@ def _get_gemini_client():
     global _gemini_client
     if _gemini_client is None and settings.GEMINI_API_KEY:
         try:
-            _gemini_client = genai.Client(api_key=settings.GEMINI_API_KEY)
-            print(f"Gemini client initialized with model: {settings.GEMINI_MODEL}")
+            # Imported on first QA call: the SDK is the slowest import of the
+            # app and most cold starts (serverless) never reach QA.
+            from google import genai
+            from google.genai import types
+
+            http_options = types.HttpOptions(base_url=settings.GEMINI_BASE_URL) if settings.GEMINI_BASE_URL else None
+            _gemini_client = genai.Client(api_key=settings.GEMINI_API_KEY, http_options=http_options)
+            logger.info("Gemini client initialized with model: %s", settings.GEMINI_MODEL)
         except Exception as e:
-            print(f"Failed to initialize Gemini: {e}")
+            logger.warning("Failed to initialize Gemini: %s", e)
             _gemini_client = False  # Mark as failed to avoid retrying
     return _gemini_client if _gemini_client is not False else None
 
 
-def _ask_gemini(question: str, ruleset: Dict[str, Any], is_zh: bool) -> Optional[str]:
-    """Use Gemini to answer questions about Sichuan Mahjong."""
-    client = _get_gemini_client()
-    if not client:
-        return None
-    
-    try:
-        # Prepare context with ruleset information
-        hands = ruleset.get("hands", [])
-        factors = (ruleset.get("multipliers", {}).get("factors", []))
-        
-        # Create a simplified context for Gemini
-        context_hands = []
-        for h in hands[:10]:  # Limit to avoid token overflow
-            context_hands.append({
-                "name": h.get("name"),
-                "description": h.get("description_one_line"),
-                "base_multiplier": h.get("scoring", {}).get("base_multiplier")
-            })
-        
-        context_factors = []
-        for f in factors[:10]:
-            context_factors.append({
-                "name": f.get("name"),
-                "description": f.get("description"),
-                "type": f.get("type")
-            })
-        
-        lang = "中文" if is_zh else "English"
-        
-        prompt = f"""You are a helpful assistant for a Sichuan Mahjong game app called "Ready, Set, Hu!".
+def _build_prompt(question: str, is_zh: bool) -> str:
+    lang = "中文" if is_zh else "English"
+    context = get_qa_context().render(question, is_zh)
 
-Please answer the following question about Sichuan Mahjong rules in {lang}.
+    return f"""You are a helpful assistant for a Sichuan Mahjong game app called "Ready, Set, Hu!".
 
-Context - Some example hands (番型):
-{json.dumps(context_hands, ensure_ascii=False, indent=2)}
+Please answer the following question about Sichuan Mahjong rules in {lang}.
 
-Context - Some example factors (加倍条件):
-{json.dumps(context_factors, ensure_ascii=False, indent=2)}
+Context - rules of this app (番型 hands, 加倍条件 factors, events, basics):
+{context}
 
 Rules:
 - Answer based on Sichuan Mahjong rules
@@ -75,26 +99,92 @@ Question: {question}
 
 Answer:"""
 
+
+def _ask_gemini(question: str, is_zh: bool) -> Optional[str]:
+    """Use Gemini to answer questions about Sichuan Mahjong."""
+    client = _get_gemini_client()
+    if not client:
+        return None
+    
+    try:
         response = client.models.generate_content(
             model=settings.GEMINI_MODEL,
-            contents=prompt
+            contents=_build_prompt(question, is_zh)
+        )
+        return response.text
+    except Exception as e:
+        logger.warning("Gemini API error: %s", e)
+        return None
+
+
+async def _ask_gemini_async(question: str, is_zh: bool) -> Optional[str]:
+    """Non-blocking variant of _ask_gemini (the client's asyncio API)."""
+    client = _get_gemini_client()
+    if not client:
+        return None
+
+    try:
+        response = await client.aio.models.generate_content(
+            model=settings.GEMINI_MODEL,
+            contents=_build_prompt(question, is_zh),
         )
         return response.text
     except Exception as e:
-        print(f"Gemini API error: {e}")
+        logger.warning("Gemini API error: %s", e)
         return None
 
 
-def get_answer(question: str) -> QAResponse:
-    """LLM-only Q&A using Gemini."""
+async def _stream_gemini(question: str, is_zh: bool) -> AsyncGenerator[str, None]:
+    """Answer text pieces from Gemini's streaming API (nothing if not configured)."""
+    client = _get_gemini_client()
+    if not client:
+        return
+    stream = await client.aio.models.generate_content_stream(
+        model=settings.GEMINI_MODEL,
+        contents=_build_prompt(question, is_zh),
+    )
+    async for chunk in stream:
+        if chunk.text:
+            yield chunk.text
+
+
+def get_answer(question: str, llm: Optional[LLM] = None) -> QAResponse:
+    """
+    Q&A: cached answer, else a direct answer from the ruleset when the
+    question just names a rule, else the LLM (Gemini unless `llm` is given).
+    Only LLM answers are cached.
+    """
     q = (question or "").strip()
     is_zh = _is_zh(q)
 
-    ruleset = get_ruleset()
-    gemini_answer = _ask_gemini(q, ruleset, is_zh)
-    if gemini_answer:
-        return QAResponse(answer=gemini_answer)
+    cache = get_answer_cache()
+    key = _cache_key(q, is_zh)
+    cached = cache.get(key) if key else None
+    if cached is not None:
+        return QAResponse(answer=cached, source=QAAnswerSource.CACHE)
+
+    direct = get_qa_context().direct_answer(q, is_zh)
+    if direct:
+        return QAResponse(answer=direct, source=QAAnswerSource.RULES)
+
+    answer = (llm or _ask_gemini)(q, is_zh)
+    if answer:
+        if key:
+            cache.put(key, answer)
+        return QAResponse(answer=answer, source=QAAnswerSource.LLM)
     
+    return _fallback_answer(q, is_zh)
+
+
+def _fallback_answer(question: str, is_zh: bool) -> QAResponse:
+    """No LLM answer: the closest matching rules, else say why."""
+    ctx = get_qa_context()
+    rule_ids = ctx.retrieve(question, limit=2)
+    if rule_ids:
+        lead = "AI 暂时无法回答，以下是相关规则：" if is_zh else "The AI assistant is unavailable; here are the closest rules:"
+        lines = [ctx.answers[rid][0 if is_zh else 1] for rid in rule_ids]
+        return QAResponse(answer="\n".join([lead, *lines]), source=QAAnswerSource.RULES)
+
     # If Gemini is not configured or failed, return a clear message.
     if not settings.GEMINI_API_KEY:
         msg = "请在 backend/.env 配置 GEMINI_API_KEY 后重试。" if is_zh else "Please set GEMINI_API_KEY in backend/.env and try again."
@@ -102,3 +192,131 @@ def get_answer(question: str) -> QAResponse:
         msg = "Gemini API 调用失败，请检查密钥或网络。" if is_zh else "Gemini API call failed. Please check API key or network."
     return QAResponse(answer=msg)
 
+
+# Async path: at most QA_MAX_CONCURRENCY upstream calls at once, each bounded
+# by QA_TIMEOUT_SECONDS (queueing included); identical in-flight questions
+# (same cache key) share one upstream call.
+_llm_slots: Optional[asyncio.Semaphore] = None
+_in_flight: Dict[str, "asyncio.Future[Optional[str]]"] = {}
+
+
+def _slots() -> asyncio.Semaphore:
+    global _llm_slots
+    if _llm_slots is None:
+        _llm_slots = asyncio.Semaphore(settings.QA_MAX_CONCURRENCY)
+    return _llm_slots
+
+
+async def _call_llm(llm: AsyncLLM, question: str, is_zh: bool, key: Optional[str]) -> Optional[str]:
+    async def limited() -> Optional[str]:
+        async with _slots():
+            return await llm(question, is_zh)
+
+    try:
+        answer = await asyncio.wait_for(limited(), timeout=settings.QA_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("LLM call timed out after %ss", settings.QA_TIMEOUT_SECONDS)
+        return None
+    except Exception as e:
+        logger.warning("LLM error: %s", e)
+        return None
+    if answer and key:
+        await _cache_put(key, answer)
+    return answer
+
+
+async def get_answer_async(question: str, llm: Optional[AsyncLLM] = None) -> QAResponse:
+    """
+    Non-blocking get_answer: same cache / direct-answer / LLM order, with
+    bounded concurrency, a per-call deadline, coalescing of identical
+    in-flight questions, and the closest rules as a fallback answer.
+    """
+    q = (question or "").strip()
+    is_zh = _is_zh(q)
+
+    key = _cache_key(q, is_zh)
+    cached = await _cache_get(key)
+    if cached is not None:
+        return QAResponse(answer=cached, source=QAAnswerSource.CACHE)
+
+    direct = get_qa_context().direct_answer(q, is_zh)
+    if direct:
+        return QAResponse(answer=direct, source=QAAnswerSource.RULES)
+
+    flight_key = key or f"raw:{q}"
+    call = _in_flight.get(flight_key)
+    if call is None:
+        call = asyncio.ensure_future(_call_llm(llm or _ask_gemini_async, q, is_zh, key))
+        _in_flight[flight_key] = call
+        call.add_done_callback(lambda _: _in_flight.pop(flight_key, None))
+    # shield: one asker disconnecting must not cancel the shared call
+    answer = await asyncio.shield(call)
+    if answer:
+        return QAResponse(answer=answer, source=QAAnswerSource.LLM)
+    return _fallback_answer(q, is_zh)
+
+
+async def stream_answer(question: str, llm: Optional[StreamLLM] = None) -> AsyncIterator[QAResponse]:
+    """
+    Streaming get_answer_async: yields answer pieces as QAResponse chunks.
+
+    Cached / direct / coalesced answers (and the rules fallback) arrive as
+    one chunk. An LLM stream holds a concurrency slot while it runs; the
+    slot and the first piece must arrive within QA_TIMEOUT_SECONDS, later
+    pieces within QA_TIMEOUT_SECONDS of each other. Only complete streams
+    are cached.
+    """
+    q = (question or "").strip()
+    is_zh = _is_zh(q)
+
+    key = _cache_key(q, is_zh)
+    cached = await _cache_get(key)
+    if cached is not None:
+        yield QAResponse(answer=cached, source=QAAnswerSource.CACHE)
+        return
+
+    direct = get_qa_context().direct_answer(q, is_zh)
+    if direct:
+        yield QAResponse(answer=direct, source=QAAnswerSource.RULES)
+        return
+
+    call = _in_flight.get(key or f"raw:{q}")
+    if call is not None:
+        answer = await asyncio.shield(call)
+        yield QAResponse(answer=answer, source=QAAnswerSource.LLM) if answer else _fallback_answer(q, is_zh)
+        return
+
+    timeout = settings.QA_TIMEOUT_SECONDS
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    parts: List[str] = []
+    complete = False
+    slots = _slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=timeout)
+    except asyncio.TimeoutError:
+        yield _fallback_answer(q, is_zh)
+        return
+    pieces = (llm or _stream_gemini)(q, is_zh)
+    try:
+        while True:
+            wait = max(0.0, deadline - loop.time()) if not parts else timeout
+            try:
+                piece = await asyncio.wait_for(pieces.__anext__(), timeout=wait)
+            except StopAsyncIteration:
+                complete = True
+                break
+            parts.append(piece)
+            yield QAResponse(answer=piece, source=QAAnswerSource.LLM)
+    except asyncio.TimeoutError:
+        logger.warning("LLM stream timed out after %ss", timeout)
+    except Exception as e:
+        logger.warning("LLM stream error: %s", e)
+    finally:
+        slots.release()
+        await pieces.aclose()
+
+    if not parts:
+        yield _fallback_answer(q, is_zh)
+    elif complete and key:
+        await _cache_put(key, "".join(parts))
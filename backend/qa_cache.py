@@ -0,0 +1,126 @@
+"""
+Persistent QA answer cache.
+
+Answers live in a small SQLite table (key, answer, expires_at, last_used)
+so they survive restarts; a bounded in-memory LRU in front serves repeat
+questions without touching the database. Entries expire after `ttl`
+seconds, and beyond `max_entries` the least recently used rows are
+evicted; hits served from memory are written back to `last_used` in one
+batch on the next put, before eviction runs. An empty path keeps the
+cache in memory only, as does a path that cannot be opened (e.g. a
+read-only filesystem). SQLite errors while running ("database is locked",
+disk full) are logged and the memory tier answers alone.
+"""
+
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS qa_answers (
+    key TEXT PRIMARY KEY,
+    answer TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+class AnswerCache:
+    def __init__(self, path: str = "", max_entries: int = 5000, ttl: float = 7 * 24 * 3600, memory_entries: int = 256):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = Lock()
+        # key -> time of memory hits not yet written to last_used
+        self._touched: Dict[str, float] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(_SCHEMA)
+                self._db.execute("DELETE FROM qa_answers WHERE expires_at <= ?", (time.time(),))
+            except (sqlite3.Error, OSError) as e:
+                logger.warning("QA cache %s unavailable (%s); caching in memory only", path, e)
+                if self._db is not None:
+                    self._db.close()
+                self._db = None
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                if hit[1] > now:
+                    self._memory.move_to_end(key)
+                    if self._db is not None:
+                        self._touched[key] = now
+                    return hit[0]
+                del self._memory[key]
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT answer, expires_at FROM qa_answers WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._db.execute("UPDATE qa_answers SET last_used = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                logger.warning("QA cache read failed (%s); serving from memory only", e)
+                return None
+            self._touched.pop(key, None)
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def put(self, key: str, answer: str) -> None:
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, answer, expires_at)
+            if self._db is None:
+                return
+            try:
+                if self._touched:
+                    self._db.executemany(
+                        "UPDATE qa_answers SET last_used = ? WHERE key = ?",
+                        [(t, k) for k, t in self._touched.items()],
+                    )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO qa_answers (key, answer, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, answer, expires_at, now),
+                )
+                (count,) = self._db.execute("SELECT COUNT(*) FROM qa_answers").fetchone()
+                if count > self.max_entries:
+                    self._db.execute(
+                        "DELETE FROM qa_answers WHERE key IN "
+                        "(SELECT key FROM qa_answers ORDER BY expires_at <= ? DESC, last_used LIMIT ?)",
+                        (now, count - self.max_entries),
+                    )
+            except sqlite3.Error as e:
+                logger.warning("QA cache write failed (%s); kept in memory only", e)
+                return
+            self._touched.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM qa_answers")
+                except sqlite3.Error as e:
+                    logger.warning("QA cache clear failed (%s)", e)
+
+    def _remember(self, key: str, answer: str, expires_at: float) -> None:
+        self._memory[key] = (answer, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > min(self.memory_entries, self.max_entries):
+            self._memory.popitem(last=False)
@@ -0,0 +1,202 @@
+"""
+Retrieval stage for QA: pick the rule snippets relevant to a question, or
+answer it directly when it only asks what a known rule is.
+
+Every hand / factor / event of the active ruleset and every basic rule is
+compiled once into a one-line context string per language, and indexed
+(BM25 over names, aliases, nlu keywords, utterance examples and
+descriptions, with the fuzzy pinyin index as a fallback). A prompt then
+carries only the top matches plus a one-line overview of all rule names,
+instead of a JSON dump of the first ten hands and factors.
+
+normalize_question reduces a question to its semantic core ("What's
+清一色?" and "清一色是什么？" both become 清一色); the core is the QA cache
+key and, when it names a rule (name, alias, keyword, pinyin id) or matches
+one of its nlu.utterance_examples, the question is answered from the
+ruleset without the LLM.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ruleset import JsonDict, get_ruleset, ruleset_version
+from .snapshot import BASICS_JSON_PATH, basics_version, read_json
+from .search import (
+    MIN_RELATIVE_SCORE,
+    NAME_WEIGHT,
+    FuzzyIndex,
+    SearchIndex,
+    lookup_keys,
+    rule_fields,
+    tokenize,
+)
+
+MAX_SNIPPETS = 6
+
+
+# Question templates that carry no rule-specific meaning, longest first.
+_FILLER_ZH = (
+    "是什么意思", "什么意思", "是怎么定义的", "怎么定义", "的要求是什么", "是什么", "什么是", "怎么算",
+    "怎么胡", "是多少倍", "多少倍", "多少番", "是啥", "请问", "介绍一下", "解释一下", "吗", "呢", "啊", "呀",
+)
+_FILLER_EN = frozenset(
+    "about define definition explain mean meaning means much many points rule rules s score scored scoring tell"
+    " whats".split()
+)
+_RUN = re.compile(r"[a-z0-9]+|([\u3400-\u4dbf\u4e00-\u9fff]+)")
+
+
+def normalize_question(text: str) -> str:
+    """
+    Semantic core of a question: NFKC, lowercase, punctuation / stop words /
+    question templates dropped, e.g. "How much is Tian Hu?" -> "tian hu".
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    parts = []
+    for match in _RUN.finditer(text):
+        run = match.group(0)
+        if match.group(1):
+            for filler in _FILLER_ZH:
+                run = run.replace(filler, "")
+            if run:
+                parts.append(run)
+        elif run not in _FILLER_EN and tokenize(run):  # tokenize drops stop words
+            parts.append(run)
+    return " ".join(parts)
+
+
+def _compact_core(text: str) -> str:
+    return normalize_question(text).replace(" ", "")
+
+
+def _text(v: Any, lang: str) -> str:
+    if isinstance(v, dict):
+        return str(v.get(lang) or v.get("zh") or v.get("en") or "")
+    return str(v or "")
+
+
+def _names(item: JsonDict, lang: str) -> str:
+    other = "en" if lang == "zh" else "zh"
+    name, alt = _text(item.get("name"), lang), _text(item.get("name"), other)
+    aliases = (item.get("aliases") or {}).get(lang) or []
+    extra = [n for n in [alt, *aliases] if n and n != name]
+    return f"{name} ({' / '.join(extra)})" if extra else name
+
+
+def _hand_line(h: JsonDict, lang: str) -> str:
+    label = _text((h.get("scoring") or {}).get("score_label"), lang)
+    label = label or f"x{(h.get('scoring') or {}).get('base_multiplier')}"
+    return f"[{h['id']}] {_names(h, lang)} {label}: {_text(h.get('description_one_line'), lang)}"
+
+
+def _factor_line(f: JsonDict, lang: str) -> str:
+    apply_cfg = f.get("apply") or {}
+    if f.get("type") == "countable":
+        effect = f"x{apply_cfg.get('multiplier_each')} " + ("每个" if lang == "zh" else "each")
+    else:
+        effect = f"x{apply_cfg.get('multiplier')}"
+    return f"[{f['id']}] {_names(f, lang)} {effect}: {_text(f.get('description'), lang)}"
+
+
+def _event_line(e: JsonDict, lang: str) -> str:
+    return f"[{e['id']}] {_names(e, lang)}: {_text(e.get('description'), lang)}"
+
+
+def _basic_line(b: JsonDict, lang: str) -> str:
+    return f"[{b['id']}] {_names(b, lang)}: {_text(b.get('description'), lang)}"
+
+
+def _answer(item: JsonDict, lang: str) -> str:
+    """Direct (no-LLM) answer: name, description and how it scores."""
+    desc = _text(item.get("description_one_line") or item.get("description"), lang)
+    scoring = item.get("scoring") or {}
+    label = _text(scoring.get("score_label"), lang)
+    if lang == "zh":
+        return f"{_names(item, lang)}：{desc}" + (f"（{label}）" if label and label not in desc else "")
+    return f"{_names(item, lang)}: {desc}" + (f" Scores {label}." if label and label not in desc else "")
+
+
+def _load_basics(path: str) -> List[JsonDict]:
+    try:
+        data = read_json("basics", path)
+    except Exception:
+        return []
+    return [b for b in data if isinstance(b, dict) and isinstance(b.get("id"), str)] if isinstance(data, list) else []
+
+
+class QAContext:
+    """Precompiled snippets (zh, en) and the search indexes over them."""
+
+    def __init__(self, ruleset: JsonDict, basics: List[JsonDict], version: str = "") -> None:
+        # content hash of the rules behind this context (QA cache key prefix)
+        self.version = version
+        sources = [
+            (ruleset.get("hands") or [], _hand_line),
+            ((ruleset.get("multipliers") or {}).get("factors") or [], _factor_line),
+            (ruleset.get("events") or [], _event_line),
+            (basics, _basic_line),
+        ]
+        self.snippets: Dict[str, Tuple[str, str]] = {}
+        self.answers: Dict[str, Tuple[str, str]] = {}
+        # compact question core -> rule id; earlier sources win (a ruleset
+        # factor over the basic rule of the same name).
+        self.direct: Dict[str, str] = {}
+        docs = []
+        for items, line in sources:
+            for item in items:
+                rid = item.get("id")
+                if not isinstance(rid, str) or not rid:
+                    continue
+                fields = rule_fields(item)
+                self.snippets[rid] = (line(item, "zh"), line(item, "en"))
+                self.answers[rid] = (_answer(item, "zh"), _answer(item, "en"))
+                docs.append((rid, fields))
+                examples = [ex.get("q") or "" for ex in (item.get("nlu") or {}).get("utterance_examples") or []]
+                names = [t for t, w in fields if w >= NAME_WEIGHT - 1 and t != rid]
+                for phrase in [rid.rsplit(".", 1)[-1], *names, *examples]:
+                    core = _compact_core(phrase)
+                    if core:
+                        self.direct.setdefault(core, rid)
+        self.index = SearchIndex(docs)
+        self.fuzzy = FuzzyIndex((rid, lookup_keys(rid, fields)) for rid, fields in docs)
+
+        def overview(items: List[JsonDict], lang: str) -> str:
+            return ", ".join(f"{_text(i.get('name'), lang)} [{i.get('id')}]" for i in items if i.get("id"))
+
+        hands, factors = sources[0][0], sources[1][0]
+        self.overview = {
+            lang: f"Hands: {overview(hands, lang)}\nFactors: {overview(factors, lang)}" for lang in ("zh", "en")
+        }
+
+    def retrieve(self, question: str, limit: int = MAX_SNIPPETS) -> List[str]:
+        """Ids of the rules most relevant to `question`, best first."""
+        hits = [rid for rid, _score in self.index.search(question, limit, MIN_RELATIVE_SCORE)]
+        if not hits:
+            hits = [rid for rid, _score in self.fuzzy.search(question, limit, prefix=False)]
+        return hits
+
+    def direct_answer(self, question: str, is_zh: bool) -> Optional[str]:
+        """Answer from the ruleset when the question just names a known rule."""
+        rid = self.direct.get(_compact_core(question))
+        return self.answers[rid][0 if is_zh else 1] if rid else None
+
+    def render(self, question: str, is_zh: bool, limit: int = MAX_SNIPPETS) -> str:
+        """Prompt context: rule overview plus the retrieved snippets, one per line."""
+        lang = 0 if is_zh else 1
+        lines = [self.snippets[rid][lang] for rid in self.retrieve(question, limit)]
+        relevant = "\n".join(lines) if lines else "(no specific rule matched)"
+        return f"{self.overview['zh' if is_zh else 'en']}\n\nRelevant rules:\n{relevant}"
+
+
+_context: Optional[Tuple[JsonDict, QAContext]] = None
+
+
+def get_qa_context() -> QAContext:
+    """QAContext of the active ruleset; rebuilt when the ruleset is reloaded."""
+    global _context
+    ruleset = get_ruleset()
+    if _context is None or _context[0] is not ruleset:
+        version = f"{ruleset_version()}-{basics_version()[:8]}"
+        _context = (ruleset, QAContext(ruleset, _load_basics(BASICS_JSON_PATH), version))
+    return _context[1]
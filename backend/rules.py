@@ -1,8 +1,10 @@
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Sequence, Set, Tuple
 from pathlib import Path
-import json
+from threading import RLock
 from .models import Rule, RuleCategory, BasicRule, BasicRuleSection
-from .ruleset import get_ruleset, RulesetError
+from .ruleset import get_ruleset
+from .snapshot import BASICS_JSON_PATH, RULESET_JSON_PATH, read_json
+from .search import MIN_RELATIVE_SCORE, FuzzyIndex, SearchIndex, lookup_keys, rule_fields
 
 # Scoring rules loaded from rules_winning.json (single source of truth)
 RULES_DB: Dict[str, Rule] = {}
@@ -11,8 +13,33 @@ RULES_DB: Dict[str, Rule] = {}
 BASIC_RULES_DB: Dict[str, Rule] = {}
 BASIC_RULES: List[BasicRule] = []
 
+# Search documents per source ("ruleset" / "basics"); each loader replaces its
+# own list and the BM25 index is rebuilt over both.
+SearchDocument = Tuple[str, Sequence[Tuple[str, int]]]
+_SEARCH_DOCS: Dict[str, List[SearchDocument]] = {"ruleset": [], "basics": []}
+SEARCH_INDEX = SearchIndex([])
+FUZZY_INDEX = FuzzyIndex([])
 
-def load_basic_rules_from_json(path: str = "backend/data/rules_basics.json") -> None:
+# Both sources load on first use (not at import, to keep cold starts cheap);
+# an explicit load_* call counts as loaded. A source is marked loaded only
+# once its globals and the search indexes are published (under _load_lock),
+# so a reader that sees both marked never sees a half-built state; a load
+# that fails is retried on the next use.
+_loaded: Set[str] = set()
+_load_lock = RLock()
+
+
+def _ensure_loaded() -> None:
+    if len(_loaded) == len(_SEARCH_DOCS):
+        return
+    with _load_lock:
+        if "ruleset" not in _loaded:
+            load_rules_from_ruleset_json(RULESET_JSON_PATH)
+        if "basics" not in _loaded:
+            load_basic_rules_from_json(BASICS_JSON_PATH)
+
+
+def load_basic_rules_from_json(path: str = BASICS_JSON_PATH) -> None:
     """
     Load non-scoring basic rules (flow / etiquette / hard rules) from JSON.
 
@@ -28,16 +55,16 @@ def load_basic_rules_from_json(path: str = "backend/data/rules_basics.json") ->
         return
 
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
+        data = read_json("basics", path)
     except Exception:
         return
 
     if not isinstance(data, list):
         return
 
-    global BASIC_RULES_DB, BASIC_RULES
-    BASIC_RULES_DB = {}
-    BASIC_RULES = []
+    rules_db: Dict[str, Rule] = {}
+    basic_rules: List[BasicRule] = []
+    docs: List[SearchDocument] = []
 
     for item in data:
         if not isinstance(item, dict):
@@ -57,7 +84,7 @@ def load_basic_rules_from_json(path: str = "backend/data/rules_basics.json") ->
             section = BasicRuleSection.WINNING_SCORING
 
         # For search: keep a lightweight Rule instance.
-        BASIC_RULES_DB[rid] = Rule(
+        rules_db[rid] = Rule(
             id=rid,
             name=name_en,
             name_cn=name_cn,
@@ -67,7 +94,7 @@ def load_basic_rules_from_json(path: str = "backend/data/rules_basics.json") ->
         )
 
         # For LearnScreen: keep full bilingual, structured basic rules.
-        BASIC_RULES.append(
+        basic_rules.append(
             BasicRule(
                 id=rid,
                 name_en=name_en,
@@ -77,11 +104,19 @@ def load_basic_rules_from_json(path: str = "backend/data/rules_basics.json") ->
                 section=section,
             )
         )
+        docs.append((rid, rule_fields(item)))
+
+    global BASIC_RULES_DB, BASIC_RULES
+    with _load_lock:
+        BASIC_RULES_DB, BASIC_RULES = rules_db, basic_rules
+        _set_search_docs("basics", docs)
+        _loaded.add("basics")
 
 
 def get_basic_rules() -> List[BasicRule]:
     """Return non-scoring basic rules loaded from rules_basics.json."""
 
+    _ensure_loaded()
     return BASIC_RULES
 
 
@@ -89,6 +124,7 @@ def get_basic_rules() -> List[BasicRule]:
 
 def get_rules() -> List[Rule]:
     """Return all currently loaded rules."""
+    _ensure_loaded()
     return list(RULES_DB.values())
 
 
@@ -96,38 +132,40 @@ def search_rules_simple(query: str, limit: int = 20) -> List[str]:
     """
     NLP helper: keyword-based search.
 
-    - Matches against id / name / name_cn / description (case-insensitive).
-    - Returns a list of rule_ids ordered by a naive relevance score.
+    - Matches query tokens against id / name / aliases / nlu keywords /
+      description (English words, Chinese characters and bigrams).
+    - Returns a list of rule_ids ordered by BM25 relevance (matches far
+      below the best one, e.g. sharing only 一 with "清一色", are dropped),
+      followed by fuzzy / prefix matches (`search_rules_fuzzy`) that BM25
+      missed.
     """
 
-    q = (query or "").strip().lower()
-    if not q:
-        return []
-
-    scored: List[Tuple[int, str]] = []
-
-    def score_collection(collection: Dict[str, Rule]) -> None:
-        for rid, rule in collection.items():
-            # Collect searchable text fields
-            parts = [
-                rid,
-                getattr(rule, "name", "") or "",
-                getattr(rule, "name_cn", "") or "",
-                getattr(rule, "description", "") or "",
-            ]
-            haystack = " ".join(str(p) for p in parts).lower()
-            if not haystack:
-                continue
-            if q in haystack:
-                score = haystack.count(q)
-                scored.append((score, rid))
-
-    # Scoring rules from rules_winning.json
-    score_collection(RULES_DB)
-    # Non-scoring basics from rules_basics.json
-    score_collection(BASIC_RULES_DB)
-    scored.sort(key=lambda item: (-item[0], item[1]))
-    return [rid for _score, rid in scored[:limit]]
+    _ensure_loaded()
+    rule_ids = [rid for rid, _score in SEARCH_INDEX.search(query, limit, MIN_RELATIVE_SCORE)]
+    if len(rule_ids) < limit:
+        # Partial / typo'd / romanized input ("pengpeng", "qing yi se").
+        seen = set(rule_ids)
+        rule_ids += [rid for rid, _score in FUZZY_INDEX.search(query, limit) if rid not in seen]
+    return rule_ids[:limit]
+
+
+def search_rules_fuzzy(query: str, limit: int = 20, prefix: bool = True) -> List[str]:
+    """
+    Typo-tolerant lookup by name / alias / keyword / romanized id (pinyin),
+    with prefix matching for search-as-you-type.
+    """
+
+    _ensure_loaded()
+    return [rid for rid, _score in FUZZY_INDEX.search(query, limit, prefix=prefix)]
+
+
+def _set_search_docs(source: str, docs: List[SearchDocument]) -> None:
+    # caller holds _load_lock
+    global SEARCH_INDEX, FUZZY_INDEX
+    _SEARCH_DOCS[source] = docs
+    all_docs = [d for source_docs in _SEARCH_DOCS.values() for d in source_docs]
+    SEARCH_INDEX = SearchIndex(all_docs)
+    FUZZY_INDEX = FuzzyIndex((rid, lookup_keys(rid, fields)) for rid, fields in all_docs)
 
 
 def _text(v: Any, lang: str) -> str:
@@ -136,7 +174,7 @@ def _text(v: Any, lang: str) -> str:
     return str(v or "")
 
 
-def load_rules_from_ruleset_json(json_path: str = "backend/data/rules_winning.json") -> None:
+def load_rules_from_ruleset_json(json_path: str = RULESET_JSON_PATH) -> None:
     """
     Load rules for UI listing from the *ruleset schema* JSON (single source of truth).
 
@@ -148,8 +186,8 @@ def load_rules_from_ruleset_json(json_path: str = "backend/data/rules_winning.js
     hands = ruleset.get("hands") or []
     factors = (ruleset.get("multipliers") or {}).get("factors") or []
 
-    global RULES_DB
-    RULES_DB = {}
+    rules_db: Dict[str, Rule] = {}
+    docs: List[SearchDocument] = []
 
     # hands -> hand_type rules (points=base_multiplier for display)
     for h in hands:
@@ -157,7 +195,7 @@ def load_rules_from_ruleset_json(json_path: str = "backend/data/rules_winning.js
         if not isinstance(hid, str) or not hid:
             continue
         base = int(((h.get("scoring") or {}).get("base_multiplier")) or 0)
-        RULES_DB[hid] = Rule(
+        rules_db[hid] = Rule(
             id=hid,
             name=_text(h.get("name"), "en") or hid,
             name_cn=_text(h.get("name"), "zh") or None,
@@ -165,6 +203,7 @@ def load_rules_from_ruleset_json(json_path: str = "backend/data/rules_winning.js
             points=base,
             category=RuleCategory.HAND_TYPE,
         )
+        docs.append((hid, rule_fields(h)))
 
     # factors -> extra rules (points = multiplier or multiplier_each, for display only)
     for f in factors:
@@ -184,7 +223,7 @@ def load_rules_from_ruleset_json(json_path: str = "backend/data/rules_winning.js
         if ftype == "countable":
             desc = f"{desc}（可重复）"
 
-        RULES_DB[fid] = Rule(
+        rules_db[fid] = Rule(
             id=fid,
             name=_text(f.get("name"), "en") or fid,
             name_cn=_text(f.get("name"), "zh") or None,
@@ -192,10 +231,10 @@ def load_rules_from_ruleset_json(json_path: str = "backend/data/rules_winning.js
             points=pts,
             category=RuleCategory.EXTRA,
         )
+        docs.append((fid, rule_fields(f)))
 
-
-# Load scoring rules from the ruleset JSON (single source of truth)
-load_rules_from_ruleset_json("backend/data/rules_winning.json")
-
-# Load non-scoring basics for search / learn UI.
-load_basic_rules_from_json("backend/data/rules_basics.json")
+    global RULES_DB
+    with _load_lock:
+        RULES_DB = rules_db
+        _set_search_docs("ruleset", docs)
+        _loaded.add("ruleset")
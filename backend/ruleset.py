@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
 import json
 
+from .snapshot import basics_version, file_hash, load_snapshot
+
 
 JsonDict = Dict[str, Any]
 FactorValue = Union[bool, int]
@@ -15,12 +18,29 @@ class RulesetError(ValueError):
     pass
 
 
+DEFAULT_RULESET_PATH = "backend/data/rules_winning.json"
+_active_ruleset_path = DEFAULT_RULESET_PATH
+
+
 @lru_cache(maxsize=1)
-def get_ruleset(path: str = "backend/data/rules_winning.json") -> JsonDict:
+def get_ruleset(path: Optional[str] = None) -> JsonDict:
     """
     Load the Sichuan ruleset JSON as the single source of truth.
 
+    Without a path, the active ruleset (see use_ruleset). A fresh
+    precompiled snapshot of the same file (backend/snapshot.py) is used
+    when available, skipping JSON parsing and validation.
     """
+    path = path or _active_ruleset_path
+    snap = load_snapshot()
+    cached = snap.get("ruleset", path) if snap is not None else None
+    if cached is not None:
+        return cached
+    return parse_ruleset_json(path)
+
+
+def parse_ruleset_json(path: str) -> JsonDict:
+    """Read and structurally validate a ruleset JSON file."""
     p = Path(path)
     if not p.exists():
         raise RulesetError(f"Ruleset JSON not found: {path}")
@@ -52,32 +72,272 @@ def _index_by_id(items: List[JsonDict]) -> Dict[str, JsonDict]:
     return out
 
 
+@dataclass(frozen=True, slots=True)
+class CompiledHand:
+    id: str
+    index: int
+    base_multiplier: int
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledFactor:
+    id: str
+    index: int
+    countable: bool
+    multiplier: int  # boolean: applied once; countable: multiplier_each per count
+
+
+# Payer policy: (actor, named payer, named payers, won-by-slot) -> paying slots.
+# Players are table slots; named payers are already resolved to slots.
+PayerPolicy = Callable[[int, Optional[int], Sequence[int], Sequence[bool]], Tuple[int, ...]]
+
+
+def _single_payer(actor: int, payer: Optional[int], payers: Sequence[int], won: Sequence[bool]) -> Tuple[int, ...]:
+    # the responsible player (e.g. the discarder of a 点杠)
+    return (payer,) if payer is not None and payer != actor else ()
+
+
+def _listed(actor: int, payer: Optional[int], payers: Sequence[int], won: Sequence[bool]) -> Tuple[int, ...]:
+    listed = [p for p in payers if p != actor]
+    if not listed and payer is not None and payer != actor:
+        listed = [payer]
+    return tuple(listed)
+
+
+def _all_others(actor: int, payer: Optional[int], payers: Sequence[int], won: Sequence[bool]) -> Tuple[int, ...]:
+    return tuple(p for p in range(len(won)) if p != actor)
+
+
+def _all_not_won(actor: int, payer: Optional[int], payers: Sequence[int], won: Sequence[bool]) -> Tuple[int, ...]:
+    # explicit selection wins; otherwise everyone still in the hand pays
+    listed = tuple(p for p in payers if p != actor)
+    return listed or tuple(p for p in range(len(won)) if not won[p] and p != actor)
+
+
+PAYER_POLICIES: Dict[str, PayerPolicy] = {
+    "single_payer": _single_payer,
+    "listed": _listed,
+    "all_others": _all_others,
+    "all_not_won": _all_not_won,
+}
+
+# transfer_fixed: amount_per_payer from the JSON;
+# transfer_hand_multiplier: the caller supplies a hand multiplier (e.g. 查大叫).
+EVENT_TYPES = ("transfer_fixed", "transfer_hand_multiplier")
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledEvent:
+    id: str
+    index: int
+    type: str
+    payer_policy: str
+    amount_per_payer: int
+    resolve_payers: PayerPolicy
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class CompiledRuleset:
+    """
+    Immutable, pre-validated view of the ruleset used on the settlement path.
+
+    Hands / factors get small integer indices (their position in the JSON);
+    the raw JSON and id indexes stay available for display-oriented callers.
+    """
+
+    raw: JsonDict
+    hands: Mapping[str, CompiledHand]
+    factors: Mapping[str, CompiledFactor]
+    factor_order: Tuple[CompiledFactor, ...]
+    hands_by_id: Mapping[str, JsonDict]
+    factors_by_id: Mapping[str, JsonDict]
+    events_by_id: Mapping[str, JsonDict]
+    events: Mapping[str, CompiledEvent]
+
+
+def compile_ruleset(ruleset: JsonDict) -> CompiledRuleset:
+    """Validate multipliers / events once at load; raises RulesetError on bad definitions."""
+    hands_raw: List[JsonDict] = ruleset.get("hands") or []
+    factors_raw: List[JsonDict] = (ruleset.get("multipliers") or {}).get("factors") or []
+    events_raw: List[JsonDict] = ruleset.get("events") or []
+    hands_by_id = _index_by_id(hands_raw)
+    factors_by_id = _index_by_id(factors_raw)
+    events_by_id = _index_by_id(events_raw)
+
+    hands: Dict[str, CompiledHand] = {}
+    for hid, hand in hands_by_id.items():
+        base_multiplier = int(((hand.get("scoring") or {}).get("base_multiplier")) or 0)
+        if base_multiplier <= 0:
+            raise RulesetError(f"Invalid base_multiplier for hand_id={hid}")
+        hands[hid] = CompiledHand(id=hid, index=len(hands), base_multiplier=base_multiplier)
+
+    factors: Dict[str, CompiledFactor] = {}
+    for fid, factor in factors_by_id.items():
+        ftype = factor.get("type")
+        apply_cfg = factor.get("apply") or {}
+        if ftype == "boolean":
+            m = int(apply_cfg.get("multiplier") or 1)
+            if m < 1:
+                raise RulesetError(f"Invalid multiplier for factor {fid}")
+        elif ftype == "countable":
+            if apply_cfg.get("mode") != "repeat":
+                raise RulesetError(f"Countable factor {fid} must use apply.mode='repeat'")
+            m = int(apply_cfg.get("multiplier_each") or 1)
+            if m < 1:
+                raise RulesetError(f"Invalid multiplier_each for factor {fid}")
+        else:
+            raise RulesetError(f"Unsupported factor type for {fid}: {ftype}")
+        factors[fid] = CompiledFactor(
+            id=fid, index=len(factors), countable=ftype == "countable", multiplier=m
+        )
+
+    events: Dict[str, CompiledEvent] = {}
+    for eid, event in events_by_id.items():
+        etype = event.get("type")
+        if etype not in EVENT_TYPES:
+            raise RulesetError(f"Unsupported event type for {eid}: {etype}")
+        policy = event.get("payer_policy")
+        if policy not in PAYER_POLICIES:
+            raise RulesetError(f"Unsupported payer_policy for {eid}: {policy}")
+        amount = event.get("amount_per_payer", 0 if etype == "transfer_hand_multiplier" else None)
+        if not isinstance(amount, int) or isinstance(amount, bool) or amount < 0:
+            raise RulesetError(f"Invalid amount_per_payer for event {eid}")
+        events[eid] = CompiledEvent(
+            id=eid,
+            index=len(events),
+            type=etype,
+            payer_policy=policy,
+            amount_per_payer=amount,
+            resolve_payers=PAYER_POLICIES[policy],
+        )
+
+    return CompiledRuleset(
+        raw=ruleset,
+        hands=MappingProxyType(hands),
+        factors=MappingProxyType(factors),
+        factor_order=tuple(factors.values()),
+        hands_by_id=MappingProxyType(hands_by_id),
+        factors_by_id=MappingProxyType(factors_by_id),
+        events_by_id=MappingProxyType(events_by_id),
+        events=MappingProxyType(events),
+    )
+
+
 @lru_cache(maxsize=1)
-def get_ruleset_indexed(
-    path: str = "backend/data/rules_winning.json",
-) -> Tuple[JsonDict, Dict[str, JsonDict], Dict[str, JsonDict], Dict[str, JsonDict]]:
-    ruleset = get_ruleset(path)
-    hands: List[JsonDict] = ruleset.get("hands") or []
-    factors: List[JsonDict] = (ruleset.get("multipliers") or {}).get("factors") or []
-    events: List[JsonDict] = ruleset.get("events") or []
-    return ruleset, _index_by_id(hands), _index_by_id(factors), _index_by_id(events)
+def get_ruleset_indexed(path: Optional[str] = None) -> CompiledRuleset:
+    return compile_ruleset(get_ruleset(path))
+
+
+@lru_cache(maxsize=1)
+def ruleset_version(path: Optional[str] = None) -> str:
+    """
+    Short content hash of the ruleset JSON file (the hash a snapshot of it
+    records), for cache keys that must not outlive a rules change (e.g.
+    cached QA answers).
+    """
+    return file_hash(path or _active_ruleset_path)[:16]
+
+
+def reload_ruleset() -> None:
+    """
+    Drop every cached view of the ruleset (snapshot, raw JSON, compiled
+    ruleset, version hashes and memoized settlements) so the next call
+    re-reads the files.
+    """
+    load_snapshot.cache_clear()
+    basics_version.cache_clear()
+    get_ruleset.cache_clear()
+    get_ruleset_indexed.cache_clear()
+    ruleset_version.cache_clear()
+    _settle.cache_clear()
+
+
+def use_ruleset(path: str) -> None:
+    """
+    Make `path` the ruleset behind every default lookup (settlement, hand
+    checking, events), e.g. to evaluate a house-rule variant JSON.
+    """
+    global _active_ruleset_path
+    _active_ruleset_path = path
+    reload_ruleset()
 
 
 @dataclass(frozen=True)
 class SettlementBreakdown:
     hand_id: str
     hand_base_multiplier: int
-    enabled_factors: List[Dict[str, Any]]  # each: {id, type, value, applied_multiplier}
+    # each: {id, type, value, applied_multiplier}. Breakdowns are memoized and
+    # shared between callers, so treat them as read-only.
+    enabled_factors: Tuple[Dict[str, Any], ...]
     extras_total: int
     total_multiplier: int
 
 
+FactorVector = Tuple[int, ...]
+
+
+def factor_vector(ruleset: CompiledRuleset, factors: Dict[str, FactorValue]) -> FactorVector:
+    """
+    Canonical, hashable form of a factor selection: one int per ruleset factor
+    (boolean -> 0/1, countable -> count), in ruleset order.
+    """
+    vector = [0] * len(ruleset.factor_order)
+    for fid, raw_value in factors.items():
+        factor = ruleset.factors.get(fid)
+        if not factor:
+            raise RulesetError(f"Unknown factor id: {fid}")
+        if factor.countable:
+            count = int(raw_value or 0)
+            if count < 0:
+                raise RulesetError(f"Invalid count for factor {fid}: {count}")
+            vector[factor.index] = count
+        else:
+            vector[factor.index] = 1 if raw_value else 0
+    return tuple(vector)
+
+
+@lru_cache(maxsize=1024)
+def _settle(ruleset: CompiledRuleset, hand: CompiledHand, vector: FactorVector) -> SettlementBreakdown:
+    # Keyed on the compiled ruleset object itself, so a reloaded ruleset never
+    # hits entries computed for the previous one.
+    enabled_factors: List[Dict[str, Any]] = []
+    extras_total = 1
+    for factor, value in zip(ruleset.factor_order, vector):
+        if not value:
+            continue
+        if factor.countable:
+            applied = factor.multiplier ** value
+            extras_total *= applied
+            enabled_factors.append(
+                {
+                    "id": factor.id,
+                    "type": "countable",
+                    "value": value,
+                    "applied_multiplier": applied,
+                    "multiplier_each": factor.multiplier,
+                }
+            )
+        else:
+            extras_total *= factor.multiplier
+            enabled_factors.append(
+                {"id": factor.id, "type": "boolean", "value": True, "applied_multiplier": factor.multiplier}
+            )
+
+    return SettlementBreakdown(
+        hand_id=hand.id,
+        hand_base_multiplier=hand.base_multiplier,
+        enabled_factors=tuple(enabled_factors),
+        extras_total=extras_total,
+        total_multiplier=hand.base_multiplier * extras_total,
+    )
+
+
 def compute_total_multiplier(
     *,
     is_win: bool,
     hand_id: Optional[str],
     factors: Optional[Dict[str, FactorValue]] = None,
-    ruleset_path: str = "backend/data/rules_winning.json",
+    ruleset_path: Optional[str] = None,
 ) -> SettlementBreakdown:
     """
     Strictly follow settlement flow from ruleset JSON:
@@ -87,79 +347,30 @@ def compute_total_multiplier(
     - apply extra multipliers:
       - boolean: multiply once if enabled
       - countable: multiply (multiplier_each ^ count)
+
+    Multipliers were validated when the ruleset was compiled; only the
+    request's ids and counts are checked here. Results are memoized on
+    (hand, canonical factor vector) until reload_ruleset() is called;
+    enabled_factors are reported in the order the caller listed them.
     """
     if not is_win:
         raise RulesetError("settlement.compute requires is_win=true (non-win settlement is not scored)")
     if not hand_id:
         raise RulesetError("hand_id is required when is_win=true")
 
-    ruleset, hands_by_id, factors_by_id, _events_by_id = get_ruleset_indexed(ruleset_path)
+    ruleset = get_ruleset_indexed(ruleset_path)
 
-    hand = hands_by_id.get(hand_id)
+    hand = ruleset.hands.get(hand_id)
     if not hand:
         raise RulesetError(f"Unknown hand_id: {hand_id}")
 
-    base_multiplier = int(((hand.get("scoring") or {}).get("base_multiplier")) or 0)
-    if base_multiplier <= 0:
-        raise RulesetError(f"Invalid base_multiplier for hand_id={hand_id}")
-
     factors = factors or {}
-    enabled_factors: List[Dict[str, Any]] = []
-    extras_total = 1
-
-    for fid, raw_value in factors.items():
-        factor = factors_by_id.get(fid)
-        if not factor:
-            raise RulesetError(f"Unknown factor id: {fid}")
-
-        ftype = factor.get("type")
-        apply_cfg = factor.get("apply") or {}
-        mode = apply_cfg.get("mode")
-
-        if ftype == "boolean":
-            enabled = bool(raw_value)
-            if enabled:
-                m = int(apply_cfg.get("multiplier") or 1)
-                if m < 1:
-                    raise RulesetError(f"Invalid multiplier for factor {fid}")
-                extras_total *= m
-                enabled_factors.append(
-                    {"id": fid, "type": "boolean", "value": True, "applied_multiplier": m}
-                )
-        elif ftype == "countable":
-            if mode != "repeat":
-                raise RulesetError(f"Countable factor {fid} must use apply.mode='repeat'")
-            try:
-                count = int(raw_value or 0)
-            except Exception:
-                raise RulesetError(f"Invalid count for factor {fid}: {raw_value}")
-            if count < 0:
-                raise RulesetError(f"Invalid count for factor {fid}: {count}")
-            each = int(apply_cfg.get("multiplier_each") or 1)
-            if each < 1:
-                raise RulesetError(f"Invalid multiplier_each for factor {fid}")
-            if count > 0:
-                applied = each ** count
-                extras_total *= applied
-                enabled_factors.append(
-                    {
-                        "id": fid,
-                        "type": "countable",
-                        "value": count,
-                        "applied_multiplier": applied,
-                        "multiplier_each": each,
-                    }
-                )
-        else:
-            raise RulesetError(f"Unsupported factor type for {fid}: {ftype}")
-
-    total = base_multiplier * extras_total
-    return SettlementBreakdown(
-        hand_id=hand_id,
-        hand_base_multiplier=base_multiplier,
-        enabled_factors=enabled_factors,
-        extras_total=extras_total,
-        total_multiplier=total,
-    )
-
-
+    breakdown = _settle(ruleset, hand, factor_vector(ruleset, factors))
+    enabled = breakdown.enabled_factors
+    if len(enabled) > 1:
+        # memoized in ruleset order; callers (and the legacy rule id tags) see request order
+        position = {fid: i for i, fid in enumerate(factors)}
+        ordered = tuple(sorted(enabled, key=lambda f: position[f["id"]]))
+        if ordered != enabled:
+            breakdown = replace(breakdown, enabled_factors=ordered)
+    return breakdown
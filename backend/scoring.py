@@ -1,12 +1,33 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
 from .models import (
+    AppliedRule,
+    AppliedRuleKind,
     Player,
     RuleBasedScoreRoundRequest,
     RuleBasedScoreRoundResponse,
     PlayerRoundScore,
+    PlayerRoundInput,
+    KongEventInput,
+    KongEventType,
+    WinType,
+    HandScoreRoundRequest,
+    HandScoreRoundResponse,
+    ScoreRoundsRequest,
+    ScoreRoundsResponse,
+    RoundEventInput,
+    CheckHandResponse,
+    WinContext,
+    HandActionType,
+    EndOfWallHand,
+    EndOfWallState,
+    FullHandSettlementRequest,
+    FullHandSettlementResponse,
+    Suit,
 )
-from .ruleset import compute_total_multiplier, RulesetError
+from .ruleset import compute_total_multiplier, CompiledEvent, RulesetError, SettlementBreakdown
 from .ruleset import get_ruleset_indexed
+from .hand_checker import check_hand, find_waits
+from .tiles import SUIT_NAMES, TileError, tile_index
 
 
 def calculate_rule_based_scores(
@@ -25,155 +46,524 @@ def calculate_rule_based_scores(
     - this function:
         1. looks up all referenced rules for each player.
         2. sums points (positive or negative) into a delta.
-        3. applies delta to that player's current score.
+        3. returns new Player entries with the delta applied (request.players
+           is left untouched).
     """
 
-    # Index players by name so we can apply transfer deltas.
-    players_by_name: Dict[str, Player] = {p.name: p for p in request.players}
-    win_deltas: Dict[str, int] = {p.name: 0 for p in request.players}
-    kong_deltas: Dict[str, int] = {p.name: 0 for p in request.players}
-    manual_deltas: Dict[str, int] = {p.name: 0 for p in request.players}
-    applied_by_player: Dict[str, List[str]] = {p.name: [] for p in request.players}
+    player_scores = score_round(
+        [p.name for p in request.players], request.player_rounds, request.include_rule_ids
+    )
+    updated_players = [
+        Player(name=p.name, score=p.score + s.delta)
+        for p, s in zip(request.players, player_scores)
+    ]
+    return RuleBasedScoreRoundResponse(players=updated_players, player_scores=player_scores)
 
-    ALL_PAY_HAND_IDS = {"hand.tianhu", "hand.dihu"}  # 天胡/地胡：其余所有玩家都赔
 
-    winners = {ri.name for ri in request.player_rounds if getattr(ri, "hand_type_id", None)}
+ALL_PAY_HAND_IDS = {"hand.tianhu", "hand.dihu"}  # 天胡/地胡：其余所有玩家都赔
 
-    ruleset, _, _, events_by_id = get_ruleset_indexed()
-    _ = ruleset  # reserved for future use
 
-    def get_event_amount(event_id: str) -> int:
-        ev = events_by_id.get(event_id) or {}
-        return int(ev.get("amount_per_payer") or 0)
+# One settlement as seen by one player, kept until the response is built:
+# (kind, rule_id, counterparties, amount_each, settlement breakdown or compiled
+# event). Records and the legacy string tags are both rendered from these, the
+# strings only on request.
+_Entry = Tuple[str, str, Tuple[str, ...], int, Union[SettlementBreakdown, CompiledEvent, None]]
+
+_WIN, _PAID_WIN, _EVENT, _PAID_EVENT, _MANUAL = "win", "paid_win", "event", "paid_event", "manual"
+
+
+def _factor_records(breakdown: SettlementBreakdown) -> List[AppliedRule]:
+    return [
+        AppliedRule(rule_id=f["id"], kind=AppliedRuleKind.FACTOR, multiplier=f["applied_multiplier"])
+        for f in breakdown.enabled_factors
+    ]
+
+
+def _records(entries: List[_Entry]) -> List[AppliedRule]:
+    """Structured applied rules: one record per transfer (amounts sum to the delta)."""
+    records: List[AppliedRule] = []
+    for kind, rule_id, counterparties, amount, detail in entries:
+        if kind == _WIN or kind == _PAID_WIN:
+            base = detail.hand_base_multiplier
+            for cp in counterparties or (None,):
+                records.append(
+                    AppliedRule(
+                        rule_id=rule_id, kind=AppliedRuleKind.HAND, counterparty=cp, amount=amount, multiplier=base
+                    )
+                )
+            records.extend(_factor_records(detail))
+        elif kind == _EVENT or kind == _PAID_EVENT:
+            for cp in counterparties:
+                records.append(AppliedRule(rule_id=rule_id, kind=AppliedRuleKind.EVENT, counterparty=cp, amount=amount))
+        else:
+            records.append(AppliedRule(rule_id=rule_id, kind=AppliedRuleKind.MANUAL, amount=amount))
+    return records
+
+
+def legacy_rule_ids(entries: List[_Entry]) -> List[str]:
+    """The pre-structured `applied_rule_ids` tags ("payers:A,B", "paid_for:X", "count:1", ...)."""
+    ids: List[str] = []
+    for kind, rule_id, counterparties, amount, detail in entries:
+        if kind == _WIN:
+            ids.append(rule_id)
+            ids.extend(f["id"] for f in detail.enabled_factors)
+            if counterparties:
+                ids.append(f"payers:{','.join(counterparties)}")
+        elif kind == _PAID_WIN:
+            ids.append(f"paid_for:{counterparties[0]}")
+            ids.append(rule_id)
+            ids.extend(f["id"] for f in detail.enabled_factors)
+        elif kind == _EVENT:
+            if detail.payer_policy == "single_payer":
+                ids.extend([rule_id, "count:1", f"payer:{counterparties[0]}"])
+            else:
+                ids.extend([rule_id, "count:1", f"payers:{','.join(counterparties)}"])
+        elif kind == _PAID_EVENT:
+            ids.extend([rule_id, f"paid_for:{counterparties[0]}", "count:1"])
+        else:
+            ids.append(f"manual_delta:{amount}")
+    return ids
 
-    for round_input in request.player_rounds:
-        if round_input.name not in players_by_name:
-            continue
 
-        actor = round_input.name
+class TableScorer:
+    """
+    Scores rounds for one table.
+
+    The player index, ruleset lookups and per-player accumulators are built
+    once and reused for every round, so replaying a long game (or a session)
+    does not rebuild them per round.
+    """
+
+    def __init__(self, player_names: List[str]) -> None:
+        self.player_names = list(player_names)
+        # name -> slot; duplicate names share the first slot
+        self.index: Dict[str, int] = {}
+        for name in self.player_names:
+            self.index.setdefault(name, len(self.index))
+        self.slot_names = list(self.index)
+        n = len(self.index)
+        self._win = [0] * n
+        self._kong = [0] * n
+        self._manual = [0] * n
+        self._entries: List[List[_Entry]] = [[] for _ in range(n)]
+        # payer x receiver matrix of fixed-point event transfers for one settlement
+        self._transfers = [0] * (n * n)
+        self._events = get_ruleset_indexed().events
+
+    def score(
+        self, player_rounds: List[PlayerRoundInput], include_rule_ids: bool = False
+    ) -> List[PlayerRoundScore]:
+        """
+        Per-player breakdown of one round, in player_names order (see
+        calculate_rule_based_scores). The legacy `applied_rule_ids` tags are
+        only rendered when include_rule_ids is set.
+        """
+        self.begin()
+        index = self.index
+        won = [False] * len(index)
+        for ri in player_rounds:
+            if getattr(ri, "hand_type_id", None) and ri.name in index:
+                won[index[ri.name]] = True
+        for round_input in player_rounds:
+            self.apply(round_input, won)
+        return self.collect(include_rule_ids)
+
+    def begin(self) -> None:
+        """Reset the accumulators; apply() calls until collect() form one settlement."""
+        n = len(self.index)
+        win_deltas, manual_deltas = self._win, self._manual
+        for i in range(n):
+            win_deltas[i] = manual_deltas[i] = 0
+        self._transfers[:] = [0] * (n * n)
+        self._entries = [[] for _ in range(n)]
+        # resolved per settlement so a long-lived scorer (a session) follows
+        # reload_ruleset / use_ruleset like the win multipliers do
+        self._events = get_ruleset_indexed().events
+
+    def apply(self, round_input: PlayerRoundInput, won: List[bool]) -> None:
+        """
+        Settle one player's input. `won` marks players out of the hand: they do
+        not pay all_not_won events.
+        """
+        actor = self.index.get(round_input.name)
+        if actor is None:
+            return
 
         is_win = (round_input.win_type is not None and round_input.win_type != "none") or bool(
             round_input.hand_type_id
         )
         if is_win:
-            # Determine payer(s) for win settlement.
-            winner = actor
-            explicit_multi_payers = list(getattr(round_input, "payer_names", []) or [])
-            payer_names = list(explicit_multi_payers)
-            payer_single = getattr(round_input, "payer_name", None)
-            if not payer_names and payer_single:
-                payer_names = [payer_single]
-            # Validate and normalize payer list
-            payer_names = [p for p in payer_names if p in players_by_name and p != winner]
-
-            # Special settlement: 天胡/地胡 => all other active players pay
-            hand_id = getattr(round_input, "hand_type_id", None)
-            if hand_id in ALL_PAY_HAND_IDS:
-                payer_names = [p.name for p in request.players if p.name != winner]
-
-            # Start with explicit factor values (supports boolean + countable).
-            factors: Dict[str, object] = dict(getattr(round_input, "factor_values", {}) or {})
-            # Backward-compatible: treat legacy selected ids as boolean=true unless already specified.
-            for fid in (round_input.extra_rule_ids or []):
-                factors.setdefault(fid, True)
-            for fid in (round_input.special_rule_ids or []):
-                factors.setdefault(fid, True)
-            for fid in (round_input.penalty_rule_ids or []):
-                factors.setdefault(fid, True)
-
-            # UX rule: selecting explicit multi-payer (自摸) implies 自摸 ×2.
-            if explicit_multi_payers and hand_id not in ALL_PAY_HAND_IDS:
-                factors.setdefault("factor.zimo", True)
-            if hand_id in ALL_PAY_HAND_IDS:
-                # Ensure not treated as 自摸 even if frontend sends it.
-                factors["factor.zimo"] = False
-
-            try:
-                breakdown = compute_total_multiplier(
-                    is_win=True,
-                    hand_id=hand_id,
-                    factors=factors,
-                )
-            except RulesetError:
-                breakdown = None
-
-            if breakdown:
-                amount = breakdown.total_multiplier
-                applied_ids = [breakdown.hand_id] + [f["id"] for f in breakdown.enabled_factors]
-
-                if payer_names:
-                    # Transfer settlement: winner +M*len(payers), each payer -M
-                    win_deltas[winner] += amount * len(payer_names)
-                    applied_by_player[winner].extend(applied_ids + [f"payers:{','.join(payer_names)}"])
-                    for payer in payer_names:
-                        win_deltas[payer] -= amount
-                        applied_by_player[payer].extend([f"paid_for:{winner}"] + applied_ids)
-                else:
-                    # Fallback: apply to self only (legacy behaviour)
-                    win_deltas[winner] += amount
-                    applied_by_player[winner].extend(applied_ids)
-
-        # ---- Kong events (fixed-point transfers, independent from win multipliers) ----
-        kong_events = list(getattr(round_input, "kong_events", []) or [])
-        for ev in kong_events:
-            etype = getattr(ev, "type", None)
-            payer_name = getattr(ev, "payer_name", None)
-            payer_names = list(getattr(ev, "payer_names", []) or [])
-
-            if etype == "dian_gang":
-                per = get_event_amount("event.dian_gang") or 2
-                if isinstance(payer_name, str) and payer_name in players_by_name and payer_name != actor:
-                    kong_deltas[actor] += per
-                    kong_deltas[payer_name] -= per
-                    applied_by_player[actor].extend([f"event.dian_gang", "count:1", f"payer:{payer_name}"])
-                    applied_by_player[payer_name].extend([f"event.dian_gang", f"paid_for:{actor}", "count:1"])
-            elif etype == "bu_gang":
-                per = get_event_amount("event.bu_gang") or 1
-                payers = [p for p in payer_names if p in players_by_name and p != actor]
-                if not payers:
-                    payers = [p.name for p in request.players if p.name not in winners and p.name != actor]
-                if payers:
-                    kong_deltas[actor] += per * len(payers)
-                    applied_by_player[actor].extend([f"event.bu_gang", "count:1", f"payers:{','.join(payers)}"])
-                    for payer in payers:
-                        kong_deltas[payer] -= per
-                        applied_by_player[payer].extend([f"event.bu_gang", f"paid_for:{actor}", "count:1"])
-            elif etype == "an_gang":
-                per = get_event_amount("event.an_gang") or 2
-                payers = [p for p in payer_names if p in players_by_name and p != actor]
-                if not payers:
-                    payers = [p.name for p in request.players if p.name not in winners and p.name != actor]
-                if payers:
-                    kong_deltas[actor] += per * len(payers)
-                    applied_by_player[actor].extend([f"event.an_gang", "count:1", f"payers:{','.join(payers)}"])
-                    for payer in payers:
-                        kong_deltas[payer] -= per
-                        applied_by_player[payer].extend([f"event.an_gang", f"paid_for:{actor}", "count:1"])
+            self._settle_win(round_input, actor)
+
+        # ---- Events (fixed-point transfers, independent from win multipliers) ----
+        for event_id, payer_name, payer_names, multiplier in _round_events(round_input):
+            self._apply_event(actor, event_id, payer_name, payer_names, won, multiplier)
 
         # ---- Manual adjustment ----
         manual_delta = int(getattr(round_input, "manual_delta", 0) or 0)
         if manual_delta != 0:
-            manual_deltas[actor] += manual_delta
-            applied_by_player[actor].append(f"manual_delta:{manual_delta}")
-
-    # Apply deltas and return per-player breakdown in stable order
-    player_scores: List[PlayerRoundScore] = []
-    updated_players: List[Player] = []
-    for p in request.players:
-        player = players_by_name[p.name]
-        total_delta = win_deltas[p.name] + kong_deltas[p.name] + manual_deltas[p.name]
-        player.score += total_delta
-        updated_players.append(player)
-        player_scores.append(
-            PlayerRoundScore(
-                name=p.name,
-                win_score=win_deltas[p.name],
-                kong_score=kong_deltas[p.name],
-                manual_score=manual_deltas[p.name],
-                delta=total_delta,
-                applied_rule_ids=applied_by_player[p.name],
+            self._manual[actor] += manual_delta
+            self._entries[actor].append((_MANUAL, "manual_delta", (), manual_delta, None))
+
+    def collect(self, include_rule_ids: bool = False) -> List[PlayerRoundScore]:
+        index = self.index
+        n = len(index)
+        win_deltas, kong_deltas, manual_deltas = self._win, self._kong, self._manual
+        entries = self._entries
+        transfers = self._transfers
+        for i in range(n):
+            row = i * n
+            kong_deltas[i] = sum(transfers[i::n]) - sum(transfers[row : row + n])
+
+        # Per-player breakdown in stable order
+        player_scores: List[PlayerRoundScore] = []
+        for name in self.player_names:
+            i = index[name]
+            player_scores.append(
+                PlayerRoundScore(
+                    name=name,
+                    win_score=win_deltas[i],
+                    kong_score=kong_deltas[i],
+                    manual_score=manual_deltas[i],
+                    delta=win_deltas[i] + kong_deltas[i] + manual_deltas[i],
+                    applied_rules=_records(entries[i]),
+                    applied_rule_ids=legacy_rule_ids(entries[i]) if include_rule_ids else [],
+                )
+            )
+        return player_scores
+
+    def _apply_event(
+        self,
+        actor: int,
+        event_id: str,
+        payer_name: Optional[str],
+        payer_names: List[str],
+        won: List[bool],
+        multiplier: Optional[int] = None,
+    ) -> None:
+        event = self._events.get(event_id)
+        if event is None:
+            return
+        if event.type == "transfer_fixed":
+            per = event.amount_per_payer
+        elif multiplier:
+            per = int(multiplier)
+        else:
+            return
+        index = self.index
+        payer = index.get(payer_name) if isinstance(payer_name, str) else None
+        listed = [index[p] for p in payer_names if p in index]
+        slots = event.resolve_payers(actor, payer, listed, won)
+        if not slots:
+            return
+
+        n = len(index)
+        names = self.slot_names
+        actor_name = names[actor]
+        for p in slots:
+            self._transfers[p * n + actor] += per
+            self._entries[p].append((_PAID_EVENT, event_id, (actor_name,), -per, event))
+        self._entries[actor].append((_EVENT, event_id, tuple(names[p] for p in slots), per, event))
+
+    def _settle_win(self, round_input: PlayerRoundInput, winner: int) -> None:
+        index = self.index
+        win_deltas, entries = self._win, self._entries
+        winner_name = round_input.name
+
+        # Determine payer(s) for win settlement.
+        explicit_multi_payers = list(getattr(round_input, "payer_names", []) or [])
+        payer_names = list(explicit_multi_payers)
+        payer_single = getattr(round_input, "payer_name", None)
+        if not payer_names and payer_single:
+            payer_names = [payer_single]
+        # Validate and normalize payer list
+        payer_names = [p for p in payer_names if p in index and p != winner_name]
+
+        # Special settlement: 天胡/地胡 => all other active players pay
+        hand_id = getattr(round_input, "hand_type_id", None)
+        if hand_id in ALL_PAY_HAND_IDS:
+            payer_names = [p for p in self.player_names if p != winner_name]
+
+        # Start with explicit factor values (supports boolean + countable).
+        factors: Dict[str, object] = dict(getattr(round_input, "factor_values", {}) or {})
+        # Backward-compatible: treat legacy selected ids as boolean=true unless already specified.
+        for fid in (round_input.extra_rule_ids or []):
+            factors.setdefault(fid, True)
+        for fid in (round_input.special_rule_ids or []):
+            factors.setdefault(fid, True)
+        for fid in (round_input.penalty_rule_ids or []):
+            factors.setdefault(fid, True)
+
+        # UX rule: selecting explicit multi-payer (自摸) implies 自摸 ×2.
+        if explicit_multi_payers and hand_id not in ALL_PAY_HAND_IDS:
+            factors.setdefault("factor.zimo", True)
+        if hand_id in ALL_PAY_HAND_IDS:
+            # Ensure not treated as 自摸 even if frontend sends it.
+            factors["factor.zimo"] = False
+
+        try:
+            breakdown = compute_total_multiplier(
+                is_win=True,
+                hand_id=hand_id,
+                factors=factors,
+            )
+        except RulesetError:
+            return
+
+        amount = breakdown.total_multiplier
+        if payer_names:
+            # Transfer settlement: winner +M*len(payers), each payer -M
+            win_deltas[winner] += amount * len(payer_names)
+            entries[winner].append((_WIN, breakdown.hand_id, tuple(payer_names), amount, breakdown))
+            for payer in payer_names:
+                win_deltas[index[payer]] -= amount
+                entries[index[payer]].append((_PAID_WIN, breakdown.hand_id, (winner_name,), -amount, breakdown))
+        else:
+            # Fallback: apply to self only (legacy behaviour)
+            win_deltas[winner] += amount
+            entries[winner].append((_WIN, breakdown.hand_id, (), amount, breakdown))
+
+
+_RoundEvent = Tuple[str, Optional[str], List[str], Optional[int]]
+
+
+def _round_events(round_input: PlayerRoundInput) -> List[_RoundEvent]:
+    """(event_id, payer_name, payer_names, multiplier) for a player's kong_events + generic events."""
+    out: List[_RoundEvent] = []
+    for ev in getattr(round_input, "kong_events", []) or []:
+        out.append((f"event.{KongEventType(ev.type).value}", ev.payer_name, list(ev.payer_names or []), None))
+    for ev in getattr(round_input, "events", []) or []:
+        out.append((ev.event_id, ev.payer_name, list(ev.payer_names or []), ev.multiplier))
+    return out
+
+
+def score_round(
+    player_names: List[str],
+    player_rounds: List[PlayerRoundInput],
+    include_rule_ids: bool = False,
+) -> List[PlayerRoundScore]:
+    """Per-player breakdown of one round, in player_names order (see calculate_rule_based_scores)."""
+    return TableScorer(player_names).score(player_rounds, include_rule_ids)
+
+
+def score_rounds(request: ScoreRoundsRequest) -> ScoreRoundsResponse:
+    """
+    Replay an ordered list of rounds for one table.
+
+    One TableScorer (player index + ruleset lookups) serves every round;
+    each round's deltas roll into the running totals.
+    """
+    scorer = TableScorer([p.name for p in request.players])
+    totals = [p.score for p in request.players]
+    rounds: List[List[PlayerRoundScore]] = []
+    for player_rounds in request.rounds:
+        scores = scorer.score(player_rounds, request.include_rule_ids)
+        for i, s in enumerate(scores):
+            totals[i] += s.delta
+        rounds.append(scores)
+    return ScoreRoundsResponse(
+        players=[Player(name=p.name, score=t) for p, t in zip(request.players, totals)],
+        rounds=rounds,
+    )
+
+
+def _win_factors(hand: CheckHandResponse, ctx: WinContext) -> Dict[str, Union[bool, int]]:
+    """Tile-derived factors of a detected hand plus the win-context flags."""
+    factors: Dict[str, Union[bool, int]] = dict(hand.factor_values)
+    # Explicit false keeps the multi-payer => 自摸 default from kicking in.
+    factors["factor.zimo"] = ctx.zimo
+    for fid, enabled in (
+        ("factor.gangshangkaihua", ctx.gangshangkaihua),
+        ("factor.qiangganghu", ctx.qiangganghu),
+        ("factor.haidilaoyue", ctx.haidilaoyue),
+    ):
+        if enabled:
+            factors[fid] = True
+    return factors
+
+
+def score_round_from_hand(request: HandScoreRoundRequest) -> HandScoreRoundResponse:
+    """
+    Tiles in, settlement out.
+
+    1. detect the winner's hand type + tile-derived factors (check_hand),
+    2. add win-context factors (自摸 / 杠上开花 / 抢杠胡 / 海底捞月),
+    3. settle the round with calculate_rule_based_scores (kongs included).
+    If the tiles do not win, only the kongs / other_rounds are settled.
+    """
+    hand = check_hand(request.tiles, request.melds, [k.tile for k in request.kongs])
+    ctx = request.context
+
+    winner = PlayerRoundInput(
+        name=request.winner_name,
+        kong_events=[
+            KongEventInput(type=k.type, payer_name=k.payer_name, payer_names=k.payer_names)
+            for k in request.kongs
+        ],
+    )
+    if hand.is_win and hand.hand_type_id:
+        factors = _win_factors(hand, ctx)
+
+        payer_names = list(request.payer_names)
+        if ctx.zimo and not payer_names and not request.payer_name:
+            payer_names = [p.name for p in request.players if p.name != request.winner_name]
+
+        winner.win_type = WinType.ZIMO if ctx.zimo else WinType.DIANPAO
+        winner.hand_type_id = hand.hand_type_id
+        winner.factor_values = factors
+        winner.payer_name = request.payer_name
+        winner.payer_names = payer_names
+
+    scored = calculate_rule_based_scores(
+        RuleBasedScoreRoundRequest(
+            players=request.players,
+            player_rounds=[winner, *request.other_rounds],
+            include_rule_ids=request.include_rule_ids,
+        )
+    )
+    return HandScoreRoundResponse(
+        players=scored.players,
+        player_scores=scored.player_scores,
+        hand=hand,
+    )
+
+
+class HandSettlementError(ValueError):
+    pass
+
+
+def _end_of_wall_state(hand: EndOfWallHand, kongs: List[str]) -> EndOfWallState:
+    """
+    花猪 / 听牌 check of a hand left standing when the wall runs out. A hand
+    holding all three suits, or any tile of its 定缺 suit, is 花猪 and not ready.
+    """
+    try:
+        suits = {tile_index(t) // 9 for t in [*hand.tiles, *(t for m in hand.melds for t in m), *kongs]}
+    except TileError as e:
+        raise HandSettlementError(f"{hand.name}: {e}") from e
+    void = list(Suit).index(hand.void_suit) if hand.void_suit is not None else -1
+    if len(suits) == len(SUIT_NAMES) or void in suits:
+        return EndOfWallState(name=hand.name, is_huazhu=True, is_ready=False)
+
+    waits = find_waits(hand.tiles)
+    best = 0
+    for wait in waits.waits:
+        if tile_index(wait.tile) // 9 == void:
+            continue
+        result = check_hand([*hand.tiles, wait.tile], hand.melds, kongs)
+        if result.is_win:
+            # a shape the ruleset cannot price (no hand type) does not count as ready
+            best = max(best, result.total_multiplier or 0)
+    return EndOfWallState(name=hand.name, is_huazhu=False, is_ready=best > 0, best_multiplier=best)
+
+
+def settle_full_hand(request: FullHandSettlementRequest) -> FullHandSettlementResponse:
+    """
+    血战到底: settle a whole hand in one pass.
+
+    Actions run in order against one TableScorer settlement, with the set of
+    players who already won growing as wins come in (they stop paying
+    自摸 / 补杠 / 暗杠). At the end of the wall the remaining hands are
+    checked: 查花猪 (event.cha_huazhu) first, then 查大叫 (event.cha_dajiao,
+    each ready hand's best multiplier over its waits). Both are ruleset
+    events, so their amounts / presence follow rules_winning.json.
+    """
+    names = [p.name for p in request.players]
+    scorer = TableScorer(names)
+    index = scorer.index
+    won = [False] * len(index)
+    kongs: List[List[str]] = [[] for _ in range(len(index))]
+    wins: List[CheckHandResponse] = []
+
+    scorer.begin()
+    for step, action in enumerate(request.actions, start=1):
+        slot = index.get(action.player_name)
+        if slot is None:
+            raise HandSettlementError(f"Action {step}: unknown player {action.player_name}")
+        if won[slot]:
+            raise HandSettlementError(f"Action {step}: {action.player_name} has already won this hand")
+        if len(index) - sum(won) <= 1:
+            raise HandSettlementError(f"Action {step}: the hand is already over")
+
+        if action.type == HandActionType.KONG:
+            if action.kong is None:
+                raise HandSettlementError(f"Action {step}: a kong action needs `kong`")
+            kong = action.kong
+            kongs[slot].append(kong.tile)
+            scorer.apply(
+                PlayerRoundInput(
+                    name=action.player_name,
+                    kong_events=[
+                        KongEventInput(type=kong.type, payer_name=kong.payer_name, payer_names=kong.payer_names)
+                    ],
+                ),
+                won,
             )
+            continue
+
+        hand = check_hand(action.tiles, action.melds, kongs[slot])
+        if not (hand.is_win and hand.hand_type_id):
+            raise HandSettlementError(f"Action {step}: {action.player_name} does not hold a winning hand ({hand.message})")
+
+        ctx = action.context
+        winner = PlayerRoundInput(
+            name=action.player_name,
+            win_type=WinType.ZIMO if ctx.zimo else WinType.DIANPAO,
+            hand_type_id=hand.hand_type_id,
+            factor_values=_win_factors(hand, ctx),
         )
+        if ctx.zimo:
+            winner.payer_names = [n for n, i in index.items() if i != slot and not won[i]]
+        else:
+            payer = index.get(action.payer_name) if action.payer_name else None
+            if payer is None or payer == slot or won[payer]:
+                raise HandSettlementError(
+                    f"Action {step}: a discard win needs payer_name of another player still in the hand"
+                )
+            winner.payer_name = action.payer_name
+        scorer.apply(winner, won)
+        won[slot] = True
+        wins.append(hand)
 
-    return RuleBasedScoreRoundResponse(players=updated_players, player_scores=player_scores)
+    end_states: List[EndOfWallState] = []
+    if request.end_hands:
+        for hand in request.end_hands:
+            slot = index.get(hand.name)
+            if slot is None or won[slot]:
+                raise HandSettlementError(f"End of wall: {hand.name} is not a player still in the hand")
+            end_states.append(_end_of_wall_state(hand, kongs[slot]))
+
+        huazhu = [st.name for st in end_states if st.is_huazhu]
+        for st in end_states:
+            if st.is_huazhu:
+                continue
+            for pig in huazhu:
+                scorer.apply(
+                    PlayerRoundInput(name=st.name, events=[RoundEventInput(event_id="event.cha_huazhu", payer_name=pig)]),
+                    won,
+                )
+        not_ready = [st.name for st in end_states if not st.is_ready]
+        if not_ready:
+            for st in end_states:
+                if st.is_ready:
+                    scorer.apply(
+                        PlayerRoundInput(
+                            name=st.name,
+                            events=[
+                                RoundEventInput(
+                                    event_id="event.cha_dajiao",
+                                    payer_names=not_ready,
+                                    multiplier=st.best_multiplier,
+                                )
+                            ],
+                        ),
+                        won,
+                    )
 
+    player_scores = scorer.collect(request.include_rule_ids)
+    return FullHandSettlementResponse(
+        players=[Player(name=p.name, score=p.score + s.delta) for p, s in zip(request.players, player_scores)],
+        player_scores=player_scores,
+        wins=wins,
+        end_states=end_states,
+    )
@@ -0,0 +1,214 @@
+"""
+Rule search indexes: an inverted index with BM25 ranking for free text, and
+a trigram index (FuzzyIndex, below) for typo-tolerant / prefix lookup.
+
+Text is tokenized into lowercase English words plus, for every run of CJK
+characters, its unigrams and bigrams (so 清一色 indexes 清/一/色/清一/一色 and
+both "一色" and "清一色" match). Each document is a set of weighted fields:
+a field with weight w contributes its tokens w times, which lets names,
+aliases and keywords outrank a passing mention in a description.
+
+The index is built once per load; a query only touches the postings of its
+own terms, so latency stays flat as rules are added.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+# BM25 parameters (the usual defaults).
+K1 = 1.2
+B = 0.75
+
+# Field weights: names / aliases identify a rule, keywords describe it,
+# descriptions and example questions only mention things in passing.
+NAME_WEIGHT = 3
+KEYWORD_WEIGHT = 2
+TEXT_WEIGHT = 1
+
+# Drop matches scoring below this fraction of the best one: they only share a
+# single character (一, 色) or a filler word with the query.
+MIN_RELATIVE_SCORE = 0.3
+
+_WORD = re.compile(r"[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff]+")
+_STOPWORDS = frozenset(
+    "a an and are can do does for how i in is it me of on or the to what when which who why with".split()
+)
+
+
+def _is_cjk(run: str) -> bool:
+    return "\u3400" <= run[0] <= "\u9fff"
+
+
+def tokenize(text: str) -> List[str]:
+    """English word tokens plus CJK unigrams and bigrams, in text order."""
+    tokens: List[str] = []
+    for run in _WORD.findall((text or "").lower()):
+        if not _is_cjk(run):
+            if run not in _STOPWORDS:
+                tokens.append(run)
+            continue
+        tokens.extend(run)
+        tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _texts(v: Any) -> List[str]:
+    if isinstance(v, dict):
+        return [t for lang_v in v.values() for t in _texts(lang_v)]
+    if isinstance(v, list):
+        return [t for x in v for t in _texts(x)]
+    return [str(v)] if v else []
+
+
+def rule_fields(item: Dict[str, Any]) -> List[Tuple[str, int]]:
+    """Weighted searchable text of one raw JSON rule (hand / factor / event / basic)."""
+    nlu = item.get("nlu") or {}
+    fields = [(item.get("id") or "", NAME_WEIGHT)]
+    fields += [(t, NAME_WEIGHT) for t in _texts(item.get("name")) + _texts(item.get("aliases"))]
+    fields += [(t, KEYWORD_WEIGHT) for t in _texts(nlu.get("keywords"))]
+    desc = item.get("description_one_line") or item.get("description")
+    fields += [(t, TEXT_WEIGHT) for t in _texts(desc)]
+    fields += [(t, TEXT_WEIGHT) for t in _texts([ex.get("q") for ex in nlu.get("utterance_examples") or []])]
+    return fields
+
+
+def lookup_keys(doc_id: str, fields: Sequence[Tuple[str, int]]) -> List[str]:
+    """
+    FuzzyIndex keys of a rule: its id without the namespace (ids are pinyin,
+    e.g. "hand.pengpenghu") plus names / aliases / keywords.
+    """
+    return [doc_id.rsplit(".", 1)[-1]] + [t for t, w in fields if w > TEXT_WEIGHT and t != doc_id]
+
+
+class SearchIndex:
+    """
+    Immutable BM25 index over `(doc_id, [(text, weight), ...])` documents.
+
+    Postings are `term -> ((doc, tf), ...)` with doc as a position in
+    `doc_ids`; idf is precomputed per term.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[str, Sequence[Tuple[str, int]]]]) -> None:
+        self.doc_ids: List[str] = []
+        self._lengths: List[int] = []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        for doc_id, fields in documents:
+            counts: Counter = Counter()
+            for text, weight in fields:
+                for token in tokenize(text):
+                    counts[token] += weight
+            doc = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self._lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        n_docs = len(self.doc_ids)
+        self._avg_length = (sum(self._lengths) / n_docs) if n_docs else 0.0
+        self._postings = {term: tuple(p) for term, p in postings.items()}
+        self._idf = {
+            term: math.log(1.0 + (n_docs - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self._postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def score(self, query: str) -> Dict[int, float]:
+        """BM25 score per matching document position."""
+        scores: Dict[int, float] = {}
+        avg = self._avg_length or 1.0
+        for term, qtf in Counter(tokenize(query)).items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term] * qtf
+            for doc, tf in postings:
+                norm = K1 * (1.0 - B + B * self._lengths[doc] / avg)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (K1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query: str, limit: int = 20, min_relative: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        Top `limit` (doc_id, score) pairs, best first (ties by id), leaving out
+        those scoring below `min_relative` x the best score.
+        """
+        ranked = sorted(
+            ((self.doc_ids[doc], s) for doc, s in self.score(query).items()), key=lambda item: (-item[1], item[0])
+        )
+        if ranked and min_relative > 0:
+            cutoff = min_relative * ranked[0][1]
+            ranked = [item for item in ranked if item[1] >= cutoff]
+        return ranked[:limit]
+
+
+def _compact(text: str) -> str:
+    return "".join(_WORD.findall((text or "").lower()))
+
+
+def _trigrams(text: str) -> frozenset:
+    return frozenset(text[i : i + 3] for i in range(len(text) - 2))
+
+
+class FuzzyIndex:
+    """
+    Trigram index over short lookup keys (names, aliases, romanized ids) for
+    typo-tolerant and search-as-you-type matching.
+
+    Keys are compacted (lowercase, spaces and punctuation dropped, so
+    "qing yi se" == "qingyise") and also indexed from every word start
+    ("Missing Suit (Que Men)" yields "quemen"). Keys are padded with two
+    leading blanks and one trailing blank before taking trigrams, so even a
+    one-character query has a trigram to look up. A query scores a key by
+    trigram Jaccard similarity, or higher when it is a prefix of the key.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[str, Sequence[str]]]) -> None:
+        self.doc_ids: List[str] = []
+        self._keys: List[Tuple[int, str, int]] = []  # (doc, key, trigram count)
+        postings: Dict[str, List[int]] = {}
+        for doc_id, names in documents:
+            doc = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            keys = set()
+            for name in names:
+                words = _WORD.findall((name or "").lower())
+                keys.update("".join(words[i:]) for i in range(len(words)))
+            for key in sorted(keys):
+                grams = _trigrams(f"  {key} ")
+                for gram in grams:
+                    postings.setdefault(gram, []).append(len(self._keys))
+                self._keys.append((doc, key, len(grams)))
+        self._postings = {gram: tuple(p) for gram, p in postings.items()}
+
+    def search(
+        self, query: str, limit: int = 20, prefix: bool = True, threshold: float = 0.3
+    ) -> List[Tuple[str, float]]:
+        """
+        Top `limit` (doc_id, score) pairs with score in (0, 1]; 1.0 is an
+        exact key match. With `prefix`, a query that starts a key scores at
+        least 0.5 (more the more of the key it covers).
+        """
+        q = _compact(query)
+        if not q:
+            return []
+        grams = _trigrams(f"  {q} ")
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for key in self._postings.get(gram, ()):
+                shared[key] = shared.get(key, 0) + 1
+
+        best: Dict[int, float] = {}
+        for key, n in shared.items():
+            doc, text, size = self._keys[key]
+            if prefix and text.startswith(q):
+                score = 0.5 + 0.5 * len(q) / len(text)
+            else:
+                score = n / (len(grams) + size - n)
+            if score >= threshold and score > best.get(doc, 0.0):
+                best[doc] = score
+
+        ranked = sorted(((self.doc_ids[d], s) for d, s in best.items()), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
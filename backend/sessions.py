@@ -0,0 +1,109 @@
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import List, Tuple
+from uuid import uuid4
+
+from .models import Player, PlayerRoundInput, PlayerRoundScore
+from .scoring import TableScorer
+
+
+class SessionError(ValueError):
+    pass
+
+
+class SessionNotFoundError(SessionError):
+    pass
+
+
+@dataclass
+class Session:
+    """
+    One table's multi-round ledger.
+
+    Rounds are kept as compact per-player delta rows (same order as `names`);
+    `totals` is the running scoreboard, updated in O(players) per append/undo.
+    """
+
+    id: str
+    names: Tuple[str, ...]
+    totals: array
+    scorer: TableScorer
+    rounds: List[array] = field(default_factory=list)
+
+    def standings(self) -> List[Player]:
+        return [Player(name=n, score=s) for n, s in zip(self.names, self.totals)]
+
+
+class SessionStore:
+    """
+    In-memory session registry (per process; the oldest sessions are evicted
+    beyond `max_sessions`). Each operation holds the store lock, so concurrent
+    requests on the same session apply rounds one at a time.
+
+    Nothing is persisted: sessions are lost on restart and are not shared
+    between worker processes or serverless instances, so a session id only
+    works against the process that created it. Rounds are scored with the
+    ruleset active when they are appended.
+    """
+
+    def __init__(self, max_sessions: int = 1024) -> None:
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = Lock()
+        self.max_sessions = max_sessions
+
+    def create(self, players: List[Player]) -> Session:
+        names = tuple(p.name for p in players)
+        if not names:
+            raise SessionError("A session needs at least one player")
+        if len(set(names)) != len(names):
+            raise SessionError("Player names must be unique within a session")
+
+        session = Session(
+            id=uuid4().hex,
+            names=names,
+            totals=array("q", (p.score for p in players)),
+            scorer=TableScorer(list(names)),
+        )
+        with self._lock:
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Session:
+        with self._lock:
+            return self._get(session_id)
+
+    def _get(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(f"Unknown session: {session_id}")
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def append_round(
+        self, session_id: str, player_rounds: List[PlayerRoundInput], include_rule_ids: bool = False
+    ) -> Tuple[Session, List[PlayerRoundScore]]:
+        with self._lock:
+            session = self._get(session_id)
+            scores = session.scorer.score(player_rounds, include_rule_ids)
+            row = array("q", (s.delta for s in scores))
+            session.rounds.append(row)
+            for i, delta in enumerate(row):
+                session.totals[i] += delta
+            return session, scores
+
+    def undo_last_round(self, session_id: str) -> Session:
+        with self._lock:
+            session = self._get(session_id)
+            if not session.rounds:
+                raise SessionError("No rounds to undo")
+            row = session.rounds.pop()
+            for i, delta in enumerate(row):
+                session.totals[i] -= delta
+            return session
+
+
+SESSIONS = SessionStore()
@@ -0,0 +1,448 @@
+"""
+Monte Carlo self-play for 血战到底.
+
+Bots play full hands on shuffled 108-tile walls (定缺, draws, discards,
+碰 / 杠 claims, 一炮多响) and every hand is settled with the regular scoring
+engine (settle_full_hand), so a house-rule variant of rules_winning.json can
+be evaluated by pointing the workers at it:
+
+    python -m backend.simulator --games 100000 --workers 8 --rules my_rules.json
+
+Games are split into fixed-size chunks, each with its own RNG seeded from
+(seed, chunk index), so results do not depend on the number of workers.
+"""
+
+import argparse
+import json
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .hand_checker import MAX_MELDS, qidui_shanten, standard_shanten
+from .models import (
+    EndOfWallHand,
+    FullHandSettlementRequest,
+    HandAction,
+    HandActionType,
+    KongEventType,
+    KongInput,
+    Player,
+    Suit,
+    WinContext,
+)
+from .ruleset import use_ruleset
+from .scoring import settle_full_hand
+from .tiles import ALL_TILES, MAX_COPIES, NUM_TILE_KINDS, SUIT_NAMES, TILE_IDS, pack_suits
+
+NUM_SEATS = 4
+HAND_SIZE = 3 * MAX_MELDS + 1
+WALL = tuple(t.index for t in ALL_TILES for _ in range(MAX_COPIES))  # 108 tiles
+
+CLAIM_PUNG = "pung"
+CLAIM_KONG = "kong"
+
+POLICY_RANDOM = "random"    # random 定缺, random legal discard, never claims
+POLICY_GREEDY = "greedy"    # fewest-tiles 定缺, min-shanten discard, claims 碰/杠 that help
+POLICY_VOID = "void"        # greedy + shanten-based 定缺, prefers tiles opponents are void in
+POLICIES = (POLICY_RANDOM, POLICY_GREEDY, POLICY_VOID)
+
+
+def _shanten(counts: Sequence[int], n_tiles: int) -> int:
+    keys = pack_suits(counts)
+    best = standard_shanten(keys, n_tiles)
+    if n_tiles >= HAND_SIZE:
+        best = min(best, qidui_shanten(keys))
+    return best
+
+
+@dataclass
+class _Seat:
+    name: str
+    policy: str
+    counts: List[int] = field(default_factory=lambda: [0] * NUM_TILE_KINDS)
+    pungs: List[int] = field(default_factory=list)
+    kongs: List[int] = field(default_factory=list)
+    void: int = 0
+    won: bool = False
+
+    @property
+    def n_concealed(self) -> int:
+        return sum(self.counts)
+
+    def holds_void(self) -> bool:
+        start = 9 * self.void
+        return any(self.counts[start : start + 9])
+
+    def can_win(self) -> bool:
+        """Complete hand with no tile of the void suit (缺一门)."""
+        if self.holds_void():
+            return False
+        return _shanten(self.counts, self.n_concealed) < 0
+
+    def can_win_with(self, tile: int) -> bool:
+        if self.won or tile // 9 == self.void or self.counts[tile] >= MAX_COPIES:
+            return False
+        self.counts[tile] += 1
+        win = self.can_win()
+        self.counts[tile] -= 1
+        return win
+
+    def tiles(self) -> List[str]:
+        return [TILE_IDS[i] for i, n in enumerate(self.counts) for _ in range(n)]
+
+    def melds(self) -> List[List[str]]:
+        return [[TILE_IDS[t]] * 3 for t in self.pungs]
+
+
+def _neighbours(counts: Sequence[int], tile: int) -> int:
+    """Same-suit tiles within two ranks: a cheap 'how connected is this tile' score."""
+    suit, rank = divmod(tile, 9)
+    lo, hi = max(0, rank - 2), min(8, rank + 2)
+    return sum(counts[9 * suit + r] for r in range(lo, hi + 1)) - 1
+
+
+class _Bot:
+    """Decisions for one seat; the engine enforces legality (void suit first)."""
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+
+    def choose_void(self, seat: _Seat) -> int:
+        if seat.policy == POLICY_RANDOM:
+            return self.rng.randrange(len(SUIT_NAMES))
+        sizes = [sum(seat.counts[9 * s : 9 * s + 9]) for s in range(len(SUIT_NAMES))]
+        if seat.policy == POLICY_GREEDY:
+            return min(range(len(SUIT_NAMES)), key=lambda s: sizes[s])
+        # void-aware: drop the suit whose removal leaves the best two-suit hand
+        n = seat.n_concealed
+
+        def without(suit: int) -> Tuple[int, int]:
+            rest = list(seat.counts)
+            rest[9 * suit : 9 * suit + 9] = [0] * 9
+            return (_shanten(rest, n) + sizes[suit], sizes[suit])
+
+        return min(range(len(SUIT_NAMES)), key=without)
+
+    def discard(self, seat: _Seat, opponent_voids: Sequence[int]) -> int:
+        held = [i for i, c in enumerate(seat.counts) if c]
+        start = 9 * seat.void
+        legal = [i for i in held if start <= i < start + 9] or held
+        if seat.policy == POLICY_RANDOM:
+            return self.rng.choice([i for i in legal for _ in range(seat.counts[i])])
+
+        n = seat.n_concealed - 1
+        scored = []
+        for i in legal:
+            seat.counts[i] -= 1
+            sh = _shanten(seat.counts, n)
+            seat.counts[i] += 1
+            safe = seat.policy == POLICY_VOID and i // 9 in opponent_voids
+            scored.append((sh, not safe, _neighbours(seat.counts, i), self.rng.random(), i))
+        return min(scored)[-1]
+
+    def claim(self, seat: _Seat, tile: int) -> Optional[str]:
+        """碰 / 点杠 on another player's discard (None = pass)."""
+        if seat.policy == POLICY_RANDOM or seat.won or tile // 9 == seat.void:
+            return None
+        held = seat.counts[tile]
+        if held == 3:
+            return CLAIM_KONG
+        if held == 2 and not seat.holds_void():
+            n = seat.n_concealed
+            now = _shanten(seat.counts, n)
+            seat.counts[tile] -= 2
+            after = min(
+                (self._after_discard(seat, i, n - 3) for i, c in enumerate(seat.counts) if c),
+                default=now,
+            )
+            seat.counts[tile] += 2
+            if after < now:
+                return CLAIM_PUNG
+        return None
+
+    @staticmethod
+    def _after_discard(seat: _Seat, tile: int, n_tiles: int) -> int:
+        seat.counts[tile] -= 1
+        sh = _shanten(seat.counts, n_tiles)
+        seat.counts[tile] += 1
+        return sh
+
+    def self_kong(self, seat: _Seat, drawn: int) -> Optional[Tuple[int, KongEventType]]:
+        """暗杠 / 补杠 after a draw."""
+        if seat.policy == POLICY_RANDOM:
+            return None
+        if drawn in seat.pungs:
+            return drawn, KongEventType.BU_GANG
+        for i, c in enumerate(seat.counts):
+            if c == MAX_COPIES and i // 9 != seat.void:
+                return i, KongEventType.AN_GANG
+        return None
+
+
+@dataclass
+class GameRecord:
+    request: FullHandSettlementRequest
+    policies: Tuple[str, ...]
+    exhausted: bool
+
+
+def play_game(rng: random.Random, policies: Sequence[str], dealer: int = 0) -> GameRecord:
+    """One 血战到底 hand; returns the settlement request describing it."""
+    wall = list(WALL)
+    rng.shuffle(wall)
+
+    bot = _Bot(rng)
+    seats = [_Seat(name=f"P{i + 1}", policy=policies[i]) for i in range(NUM_SEATS)]
+    for seat in seats:
+        for _ in range(HAND_SIZE):
+            seat.counts[wall.pop()] += 1
+    for seat in seats:
+        seat.void = bot.choose_void(seat)
+
+    actions: List[HandAction] = []
+    winners = 0
+
+    def next_active(i: int) -> int:
+        for step in range(1, NUM_SEATS + 1):
+            j = (i + step) % NUM_SEATS
+            if not seats[j].won:
+                return j
+        return i
+
+    def win(seat: _Seat, zimo: bool, payer: Optional[_Seat] = None, **flags: bool) -> None:
+        nonlocal winners
+        actions.append(
+            HandAction(
+                type=HandActionType.WIN,
+                player_name=seat.name,
+                tiles=seat.tiles(),
+                melds=seat.melds(),
+                context=WinContext(zimo=zimo, **flags),
+                payer_name=payer.name if payer else None,
+            )
+        )
+        seat.won = True
+        winners += 1
+
+    def kong(seat: _Seat, tile: int, kind: KongEventType, payer: Optional[_Seat] = None) -> None:
+        seat.kongs.append(tile)
+        actions.append(
+            HandAction(
+                type=HandActionType.KONG,
+                player_name=seat.name,
+                kong=KongInput(tile=TILE_IDS[tile], type=kind, payer_name=payer.name if payer else None),
+            )
+        )
+
+    cur = dealer
+    draw = True
+    replacement = False
+    while winners < NUM_SEATS - 1:
+        seat = seats[cur]
+        if draw:
+            if not wall:
+                break
+            drawn = wall.pop()
+            seat.counts[drawn] += 1
+            if seat.can_win():
+                win(seat, True, gangshangkaihua=replacement, haidilaoyue=not wall)
+                cur, draw, replacement = next_active(cur), True, False
+                continue
+            k = bot.self_kong(seat, drawn)
+            if k is not None:
+                tile, kind = k
+                if kind == KongEventType.BU_GANG:
+                    seat.pungs.remove(tile)
+                    seat.counts[tile] -= 1
+                else:
+                    seat.counts[tile] -= MAX_COPIES
+                kong(seat, tile, kind)
+                draw, replacement = True, True
+                continue
+        replacement = False
+
+        voids = [s.void for s in seats if s is not seat and not s.won]
+        tile = bot.discard(seat, voids)
+        seat.counts[tile] -= 1
+
+        order = [(cur + step) % NUM_SEATS for step in range(1, NUM_SEATS)]
+        rons = [j for j in order if seats[j].can_win_with(tile)]
+        if rons:
+            for j in rons:
+                if winners == NUM_SEATS - 1:
+                    break
+                seats[j].counts[tile] += 1
+                win(seats[j], False, seat)
+            cur, draw = next_active(rons[-1]), True
+            continue
+
+        for j in order:
+            claim = bot.claim(seats[j], tile)
+            if claim is None:
+                continue
+            claimer = seats[j]
+            if claim == CLAIM_KONG:
+                claimer.counts[tile] = 0
+                kong(claimer, tile, KongEventType.DIAN_GANG, seat)
+                cur, draw, replacement = j, True, True
+            else:
+                claimer.counts[tile] -= 2
+                claimer.pungs.append(tile)
+                cur, draw = j, False
+            break
+        else:
+            cur, draw = next_active(cur), True
+
+    exhausted = winners < NUM_SEATS - 1
+    end_hands = (
+        [
+            EndOfWallHand(name=s.name, tiles=s.tiles(), melds=s.melds(), void_suit=list(Suit)[s.void])
+            for s in seats
+            if not s.won
+        ]
+        if exhausted
+        else []
+    )
+    request = FullHandSettlementRequest(
+        players=[Player(name=s.name, score=0) for s in seats],
+        actions=actions,
+        end_hands=end_hands,
+    )
+    return GameRecord(request=request, policies=tuple(policies), exhausted=exhausted)
+
+
+@dataclass
+class SimulationStats:
+    games: int = 0
+    exhausted: int = 0
+    hands: Counter = field(default_factory=Counter)        # hand_type_id -> wins
+    factors: Counter = field(default_factory=Counter)      # factor id -> wins it appeared in
+    huazhu: int = 0
+    ready_at_end: int = 0
+    # per seat (policy, position)
+    seat_games: Counter = field(default_factory=Counter)
+    seat_wins: Counter = field(default_factory=Counter)
+    seat_score: Counter = field(default_factory=Counter)
+    seat_score_sq: Counter = field(default_factory=Counter)
+
+    def add(self, record: GameRecord) -> None:
+        result = settle_full_hand(record.request)
+        self.games += 1
+        self.exhausted += record.exhausted
+        for hand in result.wins:
+            self.hands[hand.hand_type_id] += 1
+            self.factors.update(fid for fid, v in hand.factor_values.items() if v)
+        for state in result.end_states:
+            self.huazhu += state.is_huazhu
+            self.ready_at_end += state.is_ready
+
+        winners = {a.player_name for a in record.request.actions if a.type == HandActionType.WIN}
+        for i, score in enumerate(result.player_scores):
+            key = f"{i + 1}:{record.policies[i]}"
+            self.seat_games[key] += 1
+            self.seat_wins[key] += score.name in winners
+            self.seat_score[key] += score.delta
+            self.seat_score_sq[key] += score.delta * score.delta
+
+    def merge(self, other: "SimulationStats") -> None:
+        self.games += other.games
+        self.exhausted += other.exhausted
+        self.huazhu += other.huazhu
+        self.ready_at_end += other.ready_at_end
+        for name in ("hands", "factors", "seat_games", "seat_wins", "seat_score", "seat_score_sq"):
+            getattr(self, name).update(getattr(other, name))
+
+    def summary(self) -> Dict:
+        wins = sum(self.hands.values())
+        seats = {}
+        for key, games in sorted(self.seat_games.items()):
+            mean = self.seat_score[key] / games
+            var = max(0.0, self.seat_score_sq[key] / games - mean * mean)
+            seats[key] = {
+                "games": games,
+                "win_rate": self.seat_wins[key] / games,
+                "expected_score": mean,
+                "stderr": (var / games) ** 0.5,
+            }
+        return {
+            "games": self.games,
+            "exhausted_rate": self.exhausted / self.games if self.games else 0.0,
+            "wins": wins,
+            "hand_frequency": {h: n / wins for h, n in self.hands.most_common()} if wins else {},
+            "factor_frequency": {f: n / wins for f, n in self.factors.most_common()} if wins else {},
+            "huazhu": self.huazhu,
+            "ready_at_end": self.ready_at_end,
+            "seats": seats,
+        }
+
+
+def run_chunk(seed: int, chunk: int, games: int, policies: Sequence[str]) -> SimulationStats:
+    rng = random.Random(f"{seed}:{chunk}")
+    stats = SimulationStats()
+    for g in range(games):
+        stats.add(play_game(rng, policies, dealer=(chunk + g) % NUM_SEATS))
+    return stats
+
+
+def _init_worker(rules_path: Optional[str]) -> None:
+    if rules_path:
+        use_ruleset(rules_path)
+
+
+def simulate(
+    games: int,
+    policies: Sequence[str] = (POLICY_VOID, POLICY_GREEDY, POLICY_GREEDY, POLICY_RANDOM),
+    seed: int = 0,
+    workers: int = 1,
+    chunk_size: int = 250,
+    rules_path: Optional[str] = None,
+) -> SimulationStats:
+    """Play `games` hands (split into seeded chunks, optionally over a process pool) and aggregate."""
+    if len(policies) != NUM_SEATS or any(p not in POLICIES for p in policies):
+        raise ValueError(f"policies must be {NUM_SEATS} of {', '.join(POLICIES)}")
+    sizes = [min(chunk_size, games - start) for start in range(0, games, chunk_size)]
+
+    total = SimulationStats()
+    if workers <= 1:
+        _init_worker(rules_path)
+        for chunk, size in enumerate(sizes):
+            total.merge(run_chunk(seed, chunk, size, policies))
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules_path,)) as pool:
+        futures = [pool.submit(run_chunk, seed, chunk, size, tuple(policies)) for chunk, size in enumerate(sizes)]
+        for future in futures:
+            total.merge(future.result())
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Monte Carlo self-play for Sichuan 血战到底")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=250)
+    parser.add_argument(
+        "--policies",
+        default="void,greedy,greedy,random",
+        help=f"comma-separated bot per seat ({', '.join(POLICIES)})",
+    )
+    parser.add_argument("--rules", default=None, help="ruleset JSON to evaluate (default: rules_winning.json)")
+    args = parser.parse_args(argv)
+
+    stats = simulate(
+        args.games,
+        policies=[p.strip() for p in args.policies.split(",")],
+        seed=args.seed,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        rules_path=args.rules,
+    )
+    print(json.dumps(stats.summary(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Precompiled snapshot of the rule JSON files.
+
+`python -m backend.snapshot` (make snapshot) parses and validates
+rules_winning.json and rules_basics.json once and writes them, with the
+SHA-256 of each source file, to a marshal file. At startup the snapshot
+is used instead of json.loads + validation when every source file still
+hashes to the recorded value; a missing, stale or unreadable snapshot (or
+one written by another Python version) falls back to the JSON files.
+
+The same file hashes version the rules for caches (see
+ruleset.ruleset_version and basics_version), whether or not a snapshot is
+in use.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import marshal
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = "backend/data/rules.snapshot"
+RULESET_JSON_PATH = "backend/data/rules_winning.json"
+BASICS_JSON_PATH = "backend/data/rules_basics.json"
+FORMAT_VERSION = 1
+_MAGIC = "ready-set-hu/rules-snapshot"
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 (hex) of a file's bytes; empty string if it cannot be read."""
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return ""
+
+
+@lru_cache(maxsize=1)
+def basics_version(path: str = BASICS_JSON_PATH) -> str:
+    """Short content hash of the basic rules JSON (cleared by ruleset.reload_ruleset)."""
+    return file_hash(path)[:16]
+
+
+def _same_file(a: str, b: str) -> bool:
+    return Path(a).resolve() == Path(b).resolve()
+
+
+class Snapshot:
+    """Loaded snapshot: per source kind, its path, hash and parsed data."""
+
+    def __init__(self, sources: Dict[str, Dict[str, Any]]) -> None:
+        self.sources = sources
+
+    def get(self, kind: str, path: str) -> Optional[Any]:
+        """Parsed data of `kind` ("ruleset" / "basics") if it was built from `path`."""
+        source = self.sources.get(kind)
+        if source is None or not _same_file(source["path"], path):
+            return None
+        return source["data"]
+
+
+@lru_cache(maxsize=1)
+def load_snapshot(path: str = SNAPSHOT_PATH) -> Optional[Snapshot]:
+    """The snapshot at `path`, or None if missing / unreadable / stale."""
+    p = Path(path)
+    if not p.exists():
+        return None
+    try:
+        raw = marshal.loads(p.read_bytes())
+        if raw.get("magic") != _MAGIC or raw.get("format") != FORMAT_VERSION:
+            raise ValueError("unknown snapshot format")
+        if tuple(raw.get("python") or ()) != tuple(sys.version_info[:2]):
+            raise ValueError("built by another Python version")
+        sources = raw["sources"]
+    except Exception as e:
+        logger.info("Ignoring rules snapshot %s (%s); using JSON", path, e)
+        return None
+
+    for source in sources.values():
+        if file_hash(source["path"]) != source["sha256"]:
+            logger.info("Rules snapshot %s is stale (%s changed); using JSON", path, source["path"])
+            return None
+    return Snapshot(sources)
+
+
+def read_json(kind: str, path: str) -> Any:
+    """Parsed JSON of `path`: from a fresh snapshot when it holds that file, else json.loads."""
+    snap = load_snapshot()
+    data = snap.get(kind, path) if snap is not None else None
+    if data is not None:
+        return data
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def build_snapshot(
+    out: str = SNAPSHOT_PATH, ruleset_path: str = RULESET_JSON_PATH, basics_path: str = BASICS_JSON_PATH
+) -> Dict[str, str]:
+    """Parse + validate both JSON files and write the snapshot; returns {kind: sha256}."""
+    from .ruleset import parse_ruleset_json
+
+    basics: List[Any] = json.loads(Path(basics_path).read_text(encoding="utf-8"))
+    if not isinstance(basics, list):
+        raise ValueError(f"{basics_path} must contain a list of rules")
+    sources = {
+        "ruleset": {"path": ruleset_path, "sha256": file_hash(ruleset_path), "data": parse_ruleset_json(ruleset_path)},
+        "basics": {"path": basics_path, "sha256": file_hash(basics_path), "data": basics},
+    }
+    payload = {"magic": _MAGIC, "format": FORMAT_VERSION, "python": tuple(sys.version_info[:2]), "sources": sources}
+    tmp = Path(f"{out}.tmp")
+    tmp.write_bytes(marshal.dumps(payload))
+    tmp.replace(out)  # readers never see a half-written snapshot
+    load_snapshot.cache_clear()
+    basics_version.cache_clear()
+    return {kind: source["sha256"] for kind, source in sources.items()}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build / check the precompiled rules snapshot")
+    parser.add_argument("--out", default=SNAPSHOT_PATH)
+    parser.add_argument("--rules", default=RULESET_JSON_PATH, help="ruleset JSON")
+    parser.add_argument("--basics", default=BASICS_JSON_PATH, help="basic rules JSON")
+    parser.add_argument("--check", action="store_true", help="only report whether the snapshot is fresh")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        fresh = load_snapshot(args.out) is not None
+        print(f"{args.out}: {'fresh' if fresh else 'missing or stale'}")
+        sys.exit(0 if fresh else 1)
+
+    hashes = build_snapshot(args.out, args.rules, args.basics)
+    print(f"Wrote {args.out}")
+    for kind, digest in hashes.items():
+        print(f"  {kind}: {digest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from typing import List
+from array import array
+from typing import Dict, Iterable, List, Sequence, Tuple
 from .models import Tile, Suit
 
 def generate_tiles() -> List[Tile]:
@@ -11,6 +12,7 @@ def generate_tiles() -> List[Tile]:
     for i in range(1, 10):
         tiles.append(Tile(
             id=f"{i}wan",
+            index=len(tiles),
             suit=Suit.MAN,
             rank=i,
             name_cn=f"{i}万",
@@ -22,6 +24,7 @@ def generate_tiles() -> List[Tile]:
     for i in range(1, 10):
         tiles.append(Tile(
             id=f"{i}tong",
+            index=len(tiles),
             suit=Suit.PIN,
             rank=i,
             name_cn=f"{i}筒",
@@ -33,6 +36,7 @@ def generate_tiles() -> List[Tile]:
     for i in range(1, 10):
         tiles.append(Tile(
             id=f"{i}tiao",
+            index=len(tiles),
             suit=Suit.SOU,
             rank=i,
             name_cn=f"{i}条",
@@ -44,3 +48,58 @@ def generate_tiles() -> List[Tile]:
 
 ALL_TILES = generate_tiles()
 
+# --- Compact integer encoding ---
+#
+# Tile index 0..26 follows ALL_TILES: 0-8 = 1-9wan, 9-17 = 1-9tong, 18-26 = 1-9tiao.
+# A hand is a 27-slot count array; internal checker / scoring code runs on
+# these and only the API boundary deals with tile id strings.
+
+NUM_TILE_KINDS = 27
+SUIT_NAMES = ("wan", "tong", "tiao")  # suit index = tile index // 9
+MAX_COPIES = 4
+TILE_IDS: Tuple[str, ...] = tuple(t.id for t in ALL_TILES)
+TILE_INDEX: Dict[str, int] = {tid: i for i, tid in enumerate(TILE_IDS)}
+
+# Packed suit vector: 9 ranks x 3 bits, rank 1 in the lowest bits.
+SUIT_BITS = 3
+SUIT_DIGIT_MASK = (1 << SUIT_BITS) - 1
+
+
+class TileError(ValueError):
+    pass
+
+
+def tile_index(tile: str) -> int:
+    idx = TILE_INDEX.get(tile)
+    if idx is None:
+        raise TileError(f"Unknown tile id: {tile}")
+    return idx
+
+
+def encode_tiles(tiles: Iterable[str]) -> array:
+    """Tile ids -> 27-slot count array. Raises TileError on unknown ids or >4 copies."""
+    counts = array("B", bytes(NUM_TILE_KINDS))
+    index = TILE_INDEX
+    for tile in tiles:
+        idx = index.get(tile)
+        if idx is None:
+            raise TileError(f"Unknown tile id: {tile}")
+        if counts[idx] == MAX_COPIES:
+            raise TileError(f"More than {MAX_COPIES} copies of {tile}")
+        counts[idx] += 1
+    return counts
+
+
+def decode_counts(counts: Sequence[int]) -> List[str]:
+    """27-slot count array -> sorted tile ids."""
+    return [TILE_IDS[i] for i, n in enumerate(counts) for _ in range(n)]
+
+
+def pack_suits(counts: Sequence[int]) -> List[int]:
+    """27-slot count array -> one packed 9-digit vector per suit."""
+    keys = [0, 0, 0]
+    for i, n in enumerate(counts):
+        if n:
+            suit, rank = divmod(i, 9)
+            keys[suit] += n << (SUIT_BITS * rank)
+    return keys
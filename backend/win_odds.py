@@ -0,0 +1,296 @@
+"""
+Win-probability estimate for a live hand (自摸 within the player's next N draws).
+
+Each draw is a uniform pick from the unseen tiles (4 copies minus the hand,
+exposed sets and visible discards); a draw that does not help is discarded,
+so the pool shrinks by one per draw and a ready hand gets the exact
+hypergeometric odds (the only case reported as exact). Hands up to
+EXACT_SHANTEN from ready are solved with a DP over (hand, tiles kept so far,
+draws left): a draw either completes the hand, lowers shanten (best
+discard) or is thrown back. Kept draws leave the pool, but which tiles were
+thrown back is not tracked (they are spread over the pool as a whole), so
+away from ready the result is a close approximation rather than exact.
+Further from ready, or while 定缺 tiles are still held, a chain over
+shanten levels is used instead: PATH_SAMPLES paths to a win are sampled
+(seeded, so estimates are repeatable), each step drawn in proportion to
+its useful tiles, and the chance of taking every step in time (per-draw
+odds = useful tiles / unseen tiles left) is averaged over the paths.
+
+Transitions depend only on the hand, so they are memoized across requests;
+whole estimates are memoized per hand state (hand, exposed sets, pool, draws).
+"""
+
+import random
+from array import array
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .hand_checker import _INVALID_TILES, MAX_MELDS, detect_shapes, qidui_shanten, standard_shanten
+from .models import Suit, WaitOdds, WinProbabilityResponse
+from .ruleset import RulesetError, compute_total_multiplier
+from .tiles import (
+    MAX_COPIES,
+    NUM_TILE_KINDS,
+    SUIT_BITS,
+    TILE_IDS,
+    TileError,
+    decode_counts,
+    encode_tiles,
+    pack_suits,
+)
+
+EXACT_SHANTEN = 2
+PATH_SAMPLES = 32
+_PATH_SEED = 0
+ZIMO = "factor.zimo"
+_WIN = b""  # transition target marking a completed hand
+
+
+def _shanten(counts: bytes, void: int) -> int:
+    """Shanten ignoring 定缺 tiles (they must be discarded, so they never help)."""
+    n_tiles = sum(counts)
+    if void >= 0:
+        counts = counts[: 9 * void] + bytes(9) + counts[9 * void + 9 :]
+    keys = pack_suits(counts)
+    best = standard_shanten(keys, n_tiles)
+    if n_tiles >= 3 * MAX_MELDS + 1:
+        best = min(best, qidui_shanten(keys))
+    return best
+
+
+def _add(counts: bytes, tile: int, delta: int) -> bytes:
+    out = bytearray(counts)
+    out[tile] += delta
+    return bytes(out)
+
+
+@lru_cache(maxsize=16384)
+def _transitions(counts: bytes, void: int) -> Tuple[int, Tuple[Tuple[int, bytes], ...]]:
+    """
+    (shanten, ((draw, next hand or _WIN), ...)) for a 3n+1 hand; only draws
+    that win or lower shanten are listed, every other draw is thrown back.
+    While 定缺 tiles are held, a draw that keeps shanten also counts (a 定缺
+    tile goes out instead), and no draw wins yet.
+    """
+    current = _shanten(counts, void)
+    keys = pack_suits(counts)
+    void_tiles = [i for i in range(9 * void, 9 * void + 9) if counts[i]] if void >= 0 else []
+    limit = current + 1 if void_tiles else current
+
+    moves: List[Tuple[int, bytes]] = []
+    for draw in range(NUM_TILE_KINDS):
+        suit, rank = divmod(draw, 9)
+        if suit == void or counts[draw] >= MAX_COPIES:
+            continue
+        near = (keys[suit] >> (SUIT_BITS * max(0, rank - 2))) & ((1 << (SUIT_BITS * 5)) - 1)
+        if not near:
+            continue  # nothing within two ranks: cannot form a block or pair
+        drawn = _add(counts, draw, 1)
+        if current == 0 and not void_tiles:
+            if _shanten(drawn, void) < 0:
+                moves.append((draw, _WIN))
+            continue
+
+        candidates = void_tiles[:1] or [i for i in range(NUM_TILE_KINDS) if drawn[i] and i != draw]
+        best: Optional[Tuple[int, bytes]] = None
+        for tile in candidates:
+            after = _add(drawn, tile, -1)
+            sh = _shanten(after, void)
+            if best is None or sh < best[0]:
+                best = (sh, after)
+        if best is not None and best[0] < limit:
+            moves.append((draw, best[1]))
+    return current, tuple(moves)
+
+
+@lru_cache(maxsize=16384)
+def _zimo_multiplier(counts: bytes, exposed: bytes, n_exposed: int) -> int:
+    """Best settlement multiplier of a completed hand won by 自摸."""
+    shapes, factors = detect_shapes(counts, exposed, n_exposed)
+    best = 0
+    for hand_id, _ in shapes:
+        try:
+            total = compute_total_multiplier(is_win=True, hand_id=hand_id, factors={**factors, ZIMO: True})
+        except RulesetError:
+            continue
+        best = max(best, total.total_multiplier)
+    return best
+
+
+def _fallback_multiplier() -> int:
+    # Lower bound used by the level-chain estimate: plain 平胡 by 自摸.
+    try:
+        return compute_total_multiplier(is_win=True, hand_id="hand.pinghu", factors={ZIMO: True}).total_multiplier
+    except RulesetError:
+        return 1
+
+
+def _void_count(counts: bytes, void: int) -> int:
+    return sum(counts[9 * void : 9 * void + 9]) if void >= 0 else 0
+
+
+def _sample_path(hand: bytes, void: int, pool: bytes, rng: random.Random) -> List[int]:
+    """
+    Useful draws (pool copies of every tile that takes the next step) at each
+    step of one path to a win; each step follows a useful draw picked in
+    proportion to its copies. A dead end (no useful copy left) ends with 0.
+    """
+    useful: List[int] = []
+    while hand != _WIN:
+        _, moves = _transitions(hand, void)
+        moves = [(pool[t], target) for t, target in moves if pool[t]]
+        n = sum(copies for copies, _ in moves)
+        useful.append(n)
+        if not n:
+            break
+        pick = rng.randrange(n)
+        for copies, target in moves:
+            if pick < copies:
+                hand = target
+                break
+            pick -= copies
+    return useful
+
+
+def _level_chain(useful: List[int], unseen: int, left: int) -> float:
+    """
+    P(taking every step within `left` draws); at step i each draw succeeds
+    with useful[i] / (tiles still unseen at that draw).
+    """
+    levels = len(useful)
+    dist = [0.0] * (levels + 1)  # dist[i]: probability of standing at step i
+    dist[0] = 1.0
+    for k in range(min(left, unseen)):
+        remaining = unseen - k
+        nxt = [0.0] * (levels + 1)
+        nxt[levels] = dist[levels]
+        for i in range(levels):
+            odds = min(1.0, useful[i] / remaining)
+            nxt[i] += dist[i] * (1.0 - odds)
+            nxt[i + 1] += dist[i] * odds
+        dist = nxt
+    return dist[levels]
+
+
+@lru_cache(maxsize=4096)
+def _estimate(
+    counts: bytes, exposed: bytes, n_exposed: int, pool: bytes, draws: int, void: int, payers: int
+) -> Tuple[float, float, bool]:
+    """(win probability, expected 自摸 payout, exact) for one hand state."""
+    total = sum(pool)
+    memo: Dict[Tuple[bytes, bytes, int], Tuple[float, float]] = {}
+    exact = True
+
+    def solve(hand: bytes, kept: bytes, left: int) -> Tuple[float, float]:
+        # kept: per tile, copies drawn and kept on this path (no longer in the pool)
+        nonlocal exact
+        key = (hand, kept, left)
+        if key in memo:
+            return memo[key]
+        shanten, moves = _transitions(hand, void)
+        if shanten > 0:
+            exact = False
+        unseen = total - (draws - left)
+        held_void = _void_count(hand, void)
+        # each 定缺 tile costs a draw before the hand can win
+        needed = max(shanten + 1, held_void + 1)
+        if left < needed or unseen <= 0:
+            result = (0.0, 0.0)
+        elif shanten > EXACT_SHANTEN or held_void:
+            exact = False
+            rng = random.Random(_PATH_SEED)
+            paths = [_sample_path(hand, void, pool, rng) for _ in range(PATH_SAMPLES)]
+            prob = sum(_level_chain(useful, unseen, left) for useful in paths) / PATH_SAMPLES
+            result = (prob, prob * _fallback_multiplier() * payers)
+        else:
+            prob = value = 0.0
+            hit = 0.0
+            for tile, target in moves:
+                p = (pool[tile] - kept[tile]) / unseen
+                if p <= 0:
+                    continue
+                hit += p
+                if target == _WIN:
+                    prob += p
+                    value += p * _zimo_multiplier(_add(hand, tile, 1), exposed, n_exposed) * payers
+                else:
+                    sub_prob, sub_value = solve(target, _add(kept, tile, 1), left - 1)
+                    prob += p * sub_prob
+                    value += p * sub_value
+            if hit < 1.0:
+                stay_prob, stay_value = solve(hand, kept, left - 1)
+                prob += (1.0 - hit) * stay_prob
+                value += (1.0 - hit) * stay_value
+            result = (prob, value)
+        memo[key] = result
+        return result
+
+    prob, value = solve(counts, bytes(len(pool)), draws)
+    return prob, value, exact
+
+
+def estimate_win_probability(
+    tiles: List[str],
+    melds: Optional[List[List[str]]] = None,
+    kongs: Optional[List[str]] = None,
+    visible_tiles: Optional[List[str]] = None,
+    wall_remaining: int = 0,
+    draws: Optional[int] = None,
+    players_in_hand: int = 4,
+    void_suit: Optional[Suit] = None,
+) -> WinProbabilityResponse:
+    """
+    Probability of 自摸 within `draws` own draws (default: this player's share
+    of the remaining wall) and the expected payout (multiplier x payers).
+    Wins on other players' discards are not counted.
+    """
+    melds = melds or []
+    kongs = kongs or []
+    n_exposed = len(melds) + len(kongs)
+    if len(tiles) % 3 != 1 or len(tiles) + 3 * n_exposed > 3 * MAX_MELDS + 1:
+        return WinProbabilityResponse(
+            message="Invalid tile count. Use the 13 tiles left after discarding (3n+1 with melds exposed)."
+        )
+    if not 2 <= players_in_hand <= 4 or wall_remaining < 0:
+        return WinProbabilityResponse(message="Need 2-4 players in the hand and a non-negative wall.")
+
+    try:
+        counts = encode_tiles(tiles)
+        exposed = encode_tiles([t for m in melds for t in m] + [t for t in kongs for _ in range(MAX_COPIES)])
+        seen = encode_tiles(visible_tiles or [])
+        encode_tiles(list(tiles) + decode_counts(exposed))  # at most 4 copies overall
+    except TileError:
+        return WinProbabilityResponse(message=_INVALID_TILES)
+
+    pool = array("B", (max(0, MAX_COPIES - counts[i] - exposed[i] - seen[i]) for i in range(NUM_TILE_KINDS)))
+    if draws is None:
+        draws = -(-wall_remaining // players_in_hand)
+    draws = max(0, min(draws, wall_remaining, sum(pool)))
+    void = list(Suit).index(void_suit) if void_suit is not None else -1
+    payers = players_in_hand - 1
+
+    hand = counts.tobytes()
+    shanten, moves = _transitions(hand, void)
+    prob, value, exact = _estimate(hand, exposed.tobytes(), n_exposed, pool.tobytes(), draws, void, payers)
+
+    waits = []
+    if shanten == 0:
+        waits = [
+            WaitOdds(
+                tile=TILE_IDS[t],
+                remaining=pool[t],
+                total_multiplier=_zimo_multiplier(_add(hand, t, 1), exposed.tobytes(), n_exposed),
+            )
+            for t, target in moves
+            if target == _WIN
+        ]
+
+    return WinProbabilityResponse(
+        message=f"{prob:.1%} to win by self-draw within {draws} draw(s){'' if exact else ' (estimate)'}.",
+        shanten=shanten,
+        draws=draws,
+        win_probability=prob,
+        expected_score=value,
+        exact=exact,
+        waits=waits,
+    )
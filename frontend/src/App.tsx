@@ -5,7 +5,7 @@ import { LearnScreen } from './screens/LearnScreen';
 import { QAScreen } from './screens/QAScreen';
 import { ScoreboardScreen } from './screens/ScoreboardScreen';
 import { OnboardingScreen } from './screens/OnboardingScreen';
-import { askQA } from './api/client';
+import { streamQA } from './api/client';
 import { Search, X } from 'lucide-react';
 import './styles/App.css';
 
@@ -31,8 +31,11 @@ function AppContent() {
     setShowAnswer(true);
     setAnswer(null);
     try {
-      const result = await askQA(question);
-      setAnswer(result.answer);
+      // Show the answer as it streams in; "Thinking..." only until the first piece.
+      await streamQA(question, (chunk) => {
+        setLoading(false);
+        setAnswer((prev) => (prev ?? '') + chunk.answer);
+      });
     } catch (err) {
       setAnswer("Sorry, I couldn't get an answer right now. Please try again.");
     }
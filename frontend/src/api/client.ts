@@ -10,6 +10,7 @@ const api = axios.create({
 
 export interface Tile {
   id: string;
+  index: number; // compact encoding 0..26 (wan 0-8, tong 9-17, tiao 18-26)
   suit: string;
   rank: number;
   name_cn: string;
@@ -50,7 +51,12 @@ export interface CheckHandResponse {
   detail?: {
     melds: string[][];
     pair: string[];
+    pairs?: string[][]; // seven pairs only
   };
+  // Best-scoring interpretation (can prefill PlayerRoundInput)
+  hand_type_id?: string | null;
+  factor_values?: Record<string, boolean | number>;
+  total_multiplier?: number | null;
 }
 
 export interface Player {
@@ -96,6 +102,17 @@ export const searchRules = async (query: string): Promise<string[]> => {
   return response.data.rule_ids;
 };
 
+export const suggestRules = async (query: string, limit = 10): Promise<string[]> => {
+  if (!query.trim()) {
+    return [];
+  }
+
+  const response = await api.get<{ rule_ids: string[] }>('/rules/suggest', {
+    params: { q: query, limit },
+  });
+  return response.data.rule_ids;
+};
+
 export const getBasicRules = async (): Promise<BasicRule[]> => {
   const response = await api.get<BasicRule[]>('/rules/basics');
   return response.data;
@@ -106,6 +123,47 @@ export const checkHand = async (tiles: string[]): Promise<CheckHandResponse> =>
   return response.data;
 };
 
+export interface WaitTile {
+  tile: string;
+  remaining: number;
+  decompositions: {
+    melds: string[][];
+    pair: string[];
+    pairs?: string[][];
+  }[];
+}
+
+export interface WaitsResponse {
+  is_ready: boolean;
+  message: string;
+  waits: WaitTile[];
+  remaining_total: number;
+}
+
+export const findWaits = async (
+  tiles: string[],
+  visibleTiles: string[] = []
+): Promise<WaitsResponse> => {
+  const response = await api.post<WaitsResponse>('/waits', {
+    tiles,
+    visible_tiles: visibleTiles,
+  });
+  return response.data;
+};
+
+// -1 = complete, 0 = ready, k = k tiles from ready
+export interface ShantenResponse {
+  message: string;
+  shanten?: number | null;
+  standard?: number | null;
+  qidui?: number | null;
+}
+
+export const getShanten = async (tiles: string[]): Promise<ShantenResponse> => {
+  const response = await api.post<ShantenResponse>('/shanten', { tiles });
+  return response.data;
+};
+
 // -------- Rule-based scoring types & API --------
 
 export type WinType = 'none' | 'zimo' | 'dianpao';
@@ -118,6 +176,13 @@ export interface KongEventInput {
   payer_names?: string[]; // for bu_gang / an_gang (multi-select)
 }
 
+export interface RoundEventInput {
+  event_id: string;
+  payer_name?: string | null;
+  payer_names?: string[];
+  multiplier?: number | null;
+}
+
 export interface PlayerRoundInput {
   name: string;
   // Deprecated: kept for backward compatibility. Scoring is driven by hand_type_id + payer_name.
@@ -131,6 +196,8 @@ export interface PlayerRoundInput {
   factor_values?: Record<string, boolean | number>;
   // Kong events (fixed points, independent from win multipliers)
   kong_events?: KongEventInput[];
+  // Other ruleset events (by id), settled like kongs
+  events?: RoundEventInput[];
   // Manual adjustment
   manual_delta?: number;
   extra_rule_ids: string[];
@@ -138,18 +205,31 @@ export interface PlayerRoundInput {
   penalty_rule_ids: string[];
 }
 
+export type AppliedRuleKind = 'hand' | 'factor' | 'event' | 'manual';
+
+export interface AppliedRule {
+  rule_id: string;
+  kind: AppliedRuleKind;
+  counterparty: string | null;
+  amount: number;
+  multiplier: number;
+}
+
 export interface PlayerRoundScore {
   name: string;
   win_score: number;
   kong_score: number;
   manual_score: number;
   delta: number;
+  applied_rules: AppliedRule[];
+  // Legacy tags, only filled when the request sets include_rule_ids
   applied_rule_ids: string[];
 }
 
 export interface RuleBasedScoreRoundRequest {
   players: Player[];
   player_rounds: PlayerRoundInput[];
+  include_rule_ids?: boolean;
 }
 
 export interface RuleBasedScoreRoundResponse {
@@ -167,8 +247,189 @@ export const scoreRoundRuleBased = async (
   return response.data;
 };
 
-export const askQA = async (question: string): Promise<{ answer: string }> => {
-  const response = await api.post<{ answer: string }>('/qa', { question });
+export interface ScoreRoundsRequest {
+  players: Player[];
+  rounds: PlayerRoundInput[][];
+  include_rule_ids?: boolean;
+}
+
+export interface ScoreRoundsResponse {
+  players: Player[];
+  rounds: PlayerRoundScore[][];
+}
+
+export const scoreRounds = async (
+  payload: ScoreRoundsRequest
+): Promise<ScoreRoundsResponse> => {
+  const response = await api.post<ScoreRoundsResponse>('/score_rounds', payload);
+  return response.data;
+};
+
+// -------- Hand-to-score pipeline (tiles in, settlement out) --------
+
+export interface WaitOdds {
+  tile: string;
+  remaining: number;
+  total_multiplier: number;
+}
+
+export interface WinProbabilityResponse {
+  message: string;
+  shanten: number | null;
+  draws: number;
+  win_probability: number;
+  expected_score: number;
+  exact: boolean;
+  waits: WaitOdds[];
+}
+
+export const getWinProbability = async (payload: {
+  tiles: string[];
+  melds?: string[][];
+  kongs?: string[];
+  visible_tiles?: string[];
+  wall_remaining: number;
+  draws?: number | null;
+  players_in_hand?: number;
+  void_suit?: 'Wan' | 'Tong' | 'Tiao' | null;
+}): Promise<WinProbabilityResponse> => {
+  const response = await api.post<WinProbabilityResponse>('/win_probability', payload);
   return response.data;
 };
 
+export interface WinContext {
+  zimo?: boolean;
+  gangshangkaihua?: boolean;
+  qiangganghu?: boolean;
+  haidilaoyue?: boolean;
+}
+
+export interface KongInput {
+  tile: string;
+  type: KongEventType;
+  payer_name?: string | null;
+  payer_names?: string[];
+}
+
+export interface HandScoreRoundRequest {
+  players: Player[];
+  winner_name: string;
+  tiles: string[];
+  melds?: string[][];
+  kongs?: KongInput[];
+  context?: WinContext;
+  payer_name?: string | null;
+  payer_names?: string[];
+  other_rounds?: PlayerRoundInput[];
+  include_rule_ids?: boolean;
+}
+
+export interface HandScoreRoundResponse extends RuleBasedScoreRoundResponse {
+  hand: CheckHandResponse;
+}
+
+export const scoreRoundFromHand = async (
+  payload: HandScoreRoundRequest
+): Promise<HandScoreRoundResponse> => {
+  const response = await api.post<HandScoreRoundResponse>(
+    '/score_round_from_hand',
+    payload
+  );
+  return response.data;
+};
+
+// 血战到底 whole-hand settlement
+export type HandActionType = 'win' | 'kong';
+
+export interface HandAction {
+  type: HandActionType;
+  player_name: string;
+  tiles?: string[];
+  melds?: string[][];
+  context?: WinContext;
+  payer_name?: string | null;
+  kong?: KongInput | null;
+}
+
+export interface EndOfWallHand {
+  name: string;
+  tiles: string[];
+  melds?: string[][];
+  void_suit?: 'Wan' | 'Tong' | 'Tiao' | null;
+}
+
+export interface FullHandSettlementRequest {
+  players: Player[];
+  actions: HandAction[];
+  end_hands?: EndOfWallHand[];
+  include_rule_ids?: boolean;
+}
+
+export interface EndOfWallState {
+  name: string;
+  is_huazhu: boolean;
+  is_ready: boolean;
+  best_multiplier: number;
+}
+
+export interface FullHandSettlementResponse extends RuleBasedScoreRoundResponse {
+  wins: CheckHandResponse[];
+  end_states: EndOfWallState[];
+}
+
+export const settleFullHand = async (
+  payload: FullHandSettlementRequest
+): Promise<FullHandSettlementResponse> => {
+  const response = await api.post<FullHandSettlementResponse>('/settle_full_hand', payload);
+  return response.data;
+};
+
+export interface QAResponse {
+  answer: string;
+  // 'llm' | 'cache' | 'rules'; null when no answer could be produced
+  source?: 'llm' | 'cache' | 'rules' | null;
+}
+
+export const askQA = async (question: string): Promise<QAResponse> => {
+  const response = await api.post<QAResponse>('/qa', { question });
+  return response.data;
+};
+
+// Streams /qa/stream (server-sent events): onChunk gets each answer piece
+// as it arrives; resolves with the full answer text.
+export const streamQA = async (
+  question: string,
+  onChunk: (chunk: QAResponse) => void
+): Promise<string> => {
+  const response = await fetch('/api/qa/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ question }),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`QA stream failed: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let answer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let end;
+    while ((end = buffer.indexOf('\n\n')) >= 0) {
+      const event = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      if (event.startsWith('event: done')) return answer;
+      const data = event.split('\n').find((line) => line.startsWith('data: '));
+      if (!data) continue;
+      const chunk = JSON.parse(data.slice(6)) as QAResponse;
+      answer += chunk.answer;
+      onChunk(chunk);
+    }
+  }
+  return answer;
+};
+
@@ -0,0 +1,308 @@
+"""
+Table-driven hand checker against plain backtracking references.
+
+The references below are the straightforward algorithms the tables replace;
+hands are random draws from a full wall (fixed seeds) plus hands built from
+random melds, so both winning and non-winning shapes are covered.
+"""
+
+import random
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import pytest
+
+from backend.hand_checker import advise_discard, check_hand, check_hands, find_waits, shanten
+from backend.models import Suit
+from backend.tiles import MAX_COPIES, NUM_TILE_KINDS, TILE_IDS, encode_tiles
+
+WALL = [i for i in range(NUM_TILE_KINDS) for _ in range(MAX_COPIES)]
+
+
+def _tiles(counts: List[int]) -> List[str]:
+    return [TILE_IDS[i] for i, n in enumerate(counts) for _ in range(n)]
+
+
+def _random_hand(rng: random.Random, size: int) -> List[int]:
+    counts = [0] * NUM_TILE_KINDS
+    for i in rng.sample(WALL, size):
+        counts[i] += 1
+    return counts
+
+
+def _built_hand(rng: random.Random, melds: int = 4) -> List[int]:
+    """melds random pungs / chows plus a pair, at most 4 copies of a tile."""
+    while True:
+        counts = [0] * NUM_TILE_KINDS
+        for _ in range(melds):
+            i = rng.randrange(NUM_TILE_KINDS)
+            if rng.random() < 0.5 and i % 9 <= 6:
+                for j in (i, i + 1, i + 2):
+                    counts[j] += 1
+            else:
+                counts[i] += 3
+        counts[rng.randrange(NUM_TILE_KINDS)] += 2
+        if max(counts) <= MAX_COPIES:
+            return counts
+
+
+def _standard_win(counts: List[int], pair_left: bool = True) -> bool:
+    i = next((i for i, n in enumerate(counts) if n), None)
+    if i is None:
+        return not pair_left
+    if pair_left and counts[i] >= 2:
+        counts[i] -= 2
+        ok = _standard_win(counts, False)
+        counts[i] += 2
+        if ok:
+            return True
+    if counts[i] >= 3:
+        counts[i] -= 3
+        ok = _standard_win(counts, pair_left)
+        counts[i] += 3
+        if ok:
+            return True
+    if i % 9 <= 6 and counts[i + 1] and counts[i + 2]:
+        for j in (i, i + 1, i + 2):
+            counts[j] -= 1
+        ok = _standard_win(counts, pair_left)
+        for j in (i, i + 1, i + 2):
+            counts[j] += 1
+        if ok:
+            return True
+    return False
+
+
+def reference_is_win(counts: List[int]) -> bool:
+    """4 melds + pair by backtracking, or seven pairs (four of a kind = two pairs)."""
+    if sum(counts) % 3 != 2:
+        return False
+    if sum(counts) == 14 and all(n % 2 == 0 for n in counts):
+        return True
+    return _standard_win(list(counts))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_check_hand_matches_backtracking_on_random_hands(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        counts = _random_hand(rng, 14)
+        assert check_hand(_tiles(counts)).is_win == reference_is_win(counts), _tiles(counts)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_check_hand_matches_backtracking_on_built_hands(seed):
+    rng = random.Random(100 + seed)
+    for _ in range(300):
+        counts = _built_hand(rng)
+        assert reference_is_win(counts)
+        result = check_hand(_tiles(counts))
+        assert result.is_win, _tiles(counts)
+        assert result.hand_type_id is not None
+        # break the hand by swapping one tile for another kind
+        i = rng.choice([i for i, n in enumerate(counts) if n])
+        j = rng.choice([j for j in range(NUM_TILE_KINDS) if j != i and counts[j] < MAX_COPIES])
+        counts[i] -= 1
+        counts[j] += 1
+        assert check_hand(_tiles(counts)).is_win == reference_is_win(counts), _tiles(counts)
+
+
+def test_check_hand_with_exposed_melds():
+    # 2 concealed melds + pair, two exposed pungs
+    tiles = ["1wan", "2wan", "3wan", "4tong", "5tong", "6tong", "9tiao", "9tiao"]
+    result = check_hand(tiles, melds=[["7wan"] * 3, ["2tiao"] * 3])
+    assert result.is_win
+    assert not check_hand(tiles[:-1] + ["8tiao"], melds=[["7wan"] * 3, ["2tiao"] * 3]).is_win
+
+
+def test_check_hand_rejects_bad_input():
+    assert not check_hand(["1wan"] * 13).is_win  # wrong count
+    assert not check_hand(["1wan"] * 5 + ["2wan"] * 9).is_win  # five copies
+    assert not check_hand(["1wan", "1wan", "1zzz"] + ["2wan"] * 11).is_win  # unknown tile
+    assert encode_tiles([]).tolist() == [0] * NUM_TILE_KINDS
+
+
+# --- Waits (听牌) ---
+
+
+def reference_waits(counts: List[int]) -> List[str]:
+    waits = []
+    for i in range(NUM_TILE_KINDS):
+        if counts[i] >= MAX_COPIES:
+            continue
+        counts[i] += 1
+        if reference_is_win(counts):
+            waits.append(TILE_IDS[i])
+        counts[i] -= 1
+    return waits
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_find_waits_matches_backtracking(seed):
+    rng = random.Random(200 + seed)
+    for n in range(300):
+        if n % 2:
+            counts = _random_hand(rng, 13)
+        else:
+            # a built hand minus one tile is usually ready
+            counts = _built_hand(rng)
+            counts[rng.choice([i for i, c in enumerate(counts) if c])] -= 1
+        result = find_waits(_tiles(counts))
+        expected = reference_waits(counts)
+        assert [w.tile for w in result.waits] == expected, _tiles(counts)
+        assert result.is_ready == bool(expected)
+
+
+def test_find_waits_counts_remaining_copies():
+    tiles = ["1wan", "2wan", "3wan", "4wan", "5wan", "6wan", "7wan", "8wan", "9wan", "2tong", "3tong", "7tiao", "7tiao"]
+    result = find_waits(tiles, visible_tiles=["1tong", "4tong", "4tong"])
+    assert {w.tile: w.remaining for w in result.waits} == {"1tong": 3, "4tong": 2}
+    assert result.remaining_total == 5
+
+
+def test_find_waits_seven_pairs():
+    tiles = ["1wan", "1wan", "3wan", "3wan", "5tong", "5tong", "6tong", "6tong", "8tiao", "8tiao", "9tiao", "9tiao", "2wan"]
+    assert [w.tile for w in find_waits(tiles).waits] == ["2wan"]
+
+
+# --- Shanten ---
+
+
+@lru_cache(maxsize=None)
+def _blocks(counts: Tuple[int, ...], i: int, need: int, melds: int, partials: int, pair: int) -> int:
+    while i < NUM_TILE_KINDS and not counts[i]:
+        i += 1
+    if i == NUM_TILE_KINDS:
+        return 2 * need - 2 * melds - min(partials, need - melds) - pair
+    rank = i % 9
+    shapes = [((i, i, i), 1, 0, 0), ((i, i), 0, 0, 1), ((i, i), 0, 1, 0)]
+    if rank <= 6:
+        shapes += [((i, i + 1, i + 2), 1, 0, 0), ((i, i + 2), 0, 1, 0)]
+    if rank <= 7:
+        shapes.append(((i, i + 1), 0, 1, 0))
+    # leaving one copy unused is always an option
+    rest = list(counts)
+    rest[i] -= 1
+    best = _blocks(tuple(rest), i, need, melds, partials, pair)
+    for tiles, dm, dp, dpair in shapes:
+        if (dpair and pair) or melds + dm > need:
+            continue
+        rest = list(counts)
+        for t in tiles:
+            rest[t] -= 1
+        if min(rest) < 0:
+            continue
+        best = min(best, _blocks(tuple(rest), i, need, melds + dm, partials + dp, pair + dpair))
+    return best
+
+
+def reference_standard_shanten(counts: List[int], n_tiles: int) -> int:
+    """Classic recursive count: 2*need - 2*melds - partial melds - pair, melds + partials <= need."""
+    return _blocks(tuple(counts), 0, n_tiles // 3, 0, 0, 0)
+
+
+def reference_shanten(counts: List[int], n_tiles: int) -> int:
+    best = reference_standard_shanten(counts, n_tiles)
+    if n_tiles >= 13:
+        best = min(best, 6 - min(sum(n // 2 for n in counts), 7))
+    return best
+
+
+@pytest.mark.parametrize("size", [13, 14, 10, 7])
+def test_shanten_matches_recursive_reference(size):
+    rng = random.Random(300 + size)
+    for n in range(150):
+        if n % 2:
+            counts = _random_hand(rng, size)
+        else:
+            # near-complete: a built hand trimmed to `size` tiles
+            counts = _built_hand(rng, size // 3)
+            while sum(counts) > size:
+                counts[rng.choice([i for i, c in enumerate(counts) if c])] -= 1
+        result = shanten(_tiles(counts))
+        assert result.standard == reference_standard_shanten(counts, size), _tiles(counts)
+        assert result.shanten == reference_shanten(counts, size), _tiles(counts)
+
+
+def test_shanten_conventions():
+    ready = ["1wan", "2wan", "3wan", "4wan", "5wan", "6wan", "7wan", "8wan", "9wan", "2tong", "3tong", "7tiao", "7tiao"]
+    assert shanten(ready).shanten == 0
+    assert shanten(ready + ["1tong"]).shanten == -1
+    assert shanten(["1wan"] * 3).shanten is None  # 3n tiles are not a hand
+
+
+# --- Discard advice ---
+
+
+def reference_discards(counts: List[int], seen: List[int], void: int = -1) -> Dict[str, Tuple[int, int]]:
+    """tile -> (shanten after discarding it, ukeire); the void suit never helps."""
+
+    def sh(c: List[int]) -> int:
+        usable = [0 if i // 9 == void else n for i, n in enumerate(c)]
+        return reference_shanten(usable, sum(c))
+
+    options = {}
+    for i in range(NUM_TILE_KINDS):
+        if not counts[i]:
+            continue
+        after = list(counts)
+        after[i] -= 1
+        result = sh(after)
+        ukeire = 0
+        for d in range(NUM_TILE_KINDS):
+            if d // 9 == void or after[d] >= MAX_COPIES:
+                continue
+            after[d] += 1
+            if sh(after) < result:
+                ukeire += max(0, MAX_COPIES - counts[d] - seen[d])
+            after[d] -= 1
+        options[TILE_IDS[i]] = (result, ukeire)
+    return options
+
+
+@pytest.mark.parametrize("void_suit", [None, Suit.MAN, Suit.SOU])
+def test_advise_discard_matches_reference(void_suit):
+    rng = random.Random(400)
+    void = list(Suit).index(void_suit) if void_suit is not None else -1
+    for _ in range(12):
+        counts = _random_hand(rng, 14)
+        seen = _random_hand(rng, 6)
+        seen = [min(s, MAX_COPIES - c) for s, c in zip(seen, counts)]
+        result = advise_discard(_tiles(counts), _tiles(seen), void_suit)
+        expected = reference_discards(counts, seen, void)
+        assert {o.tile: (o.shanten, o.ukeire) for o in result.options} == expected, _tiles(counts)
+
+        # void tiles first, then fewest shanten, then most effective draws
+        keys = [(not o.is_void, o.shanten, -o.ukeire) for o in result.options]
+        assert keys == sorted(keys)
+        assert all(o.is_void == (TILE_IDS.index(o.tile) // 9 == void) for o in result.options)
+        for o in result.options:
+            assert all(TILE_IDS.index(t) // 9 != void for t in o.effective_tiles)
+
+
+def test_void_tiles_do_not_count_towards_shanten():
+    # 3tiao / 4tiao would be a partial meld, but 条 is the void suit
+    tiles = ["1wan", "2wan", "3wan", "4wan", "5wan", "6wan", "1tong", "2tong", "3tong", "5tong", "5tong", "3tiao", "4tiao", "7tiao"]
+    plain = advise_discard(tiles)
+    void = advise_discard(tiles, void_suit=Suit.SOU)
+    assert plain.shanten == 0
+    assert void.shanten == 1
+    assert void.options[0].is_void
+
+
+# --- Batch ---
+
+
+def test_check_hands_matches_check_hand_and_copies_duplicates():
+    rng = random.Random(500)
+    hands = [_tiles(_built_hand(rng)) for _ in range(20)] + [_tiles(_random_hand(rng, 14)) for _ in range(20)]
+    hands += hands[:10] + [["1wan"] * 3, ["1wan", "9zzz"]]
+    results = check_hands(hands)
+    assert [r.model_dump() for r in results] == [check_hand(h).model_dump() for h in hands]
+
+    first, repeat = results[0], results[40]
+    assert first == repeat and first is not repeat
+    before = first.model_dump()
+    repeat.message = "edited"
+    repeat.factor_values["factor.gen"] = 9
+    assert first.model_dump() == before
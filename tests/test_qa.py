@@ -0,0 +1,115 @@
+"""
+QA answering with fake LLMs: cache / direct-answer order, coalescing of
+identical in-flight questions, the concurrency limit and the deadline.
+"""
+
+import asyncio
+
+import pytest
+
+from backend import qa
+from backend.config import settings
+from backend.models import QAAnswerSource
+from backend.qa_cache import AnswerCache
+
+QUESTION = "If two players win on the same discard, who pays?"
+
+
+@pytest.fixture(autouse=True)
+def fresh_qa(monkeypatch):
+    monkeypatch.setattr(qa, "_answer_cache", AnswerCache(""))
+    monkeypatch.setattr(qa, "_llm_slots", None)
+    monkeypatch.setattr(qa, "_in_flight", {})
+    monkeypatch.setattr(settings, "QA_TIMEOUT_SECONDS", 5.0)
+    monkeypatch.setattr(settings, "QA_MAX_CONCURRENCY", 8)
+
+
+class FakeLLM:
+    """Async LLM that answers after `delay` seconds and records its calls."""
+
+    def __init__(self, delay: float = 0.05, answer: str = "fake answer") -> None:
+        self.delay = delay
+        self.answer = answer
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, question: str, is_zh: bool):
+        self.calls.append(question)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        if isinstance(self.answer, Exception):
+            raise self.answer
+        return f"{self.answer}: {question}" if self.answer else None
+
+
+def _ask_all(questions, llm):
+    async def run():
+        return await asyncio.gather(*(qa.get_answer_async(q, llm) for q in questions))
+
+    return asyncio.run(run())
+
+
+def test_sync_answers_are_cached():
+    calls = []
+
+    def llm(question, is_zh):
+        calls.append(question)
+        return "answer"
+
+    first = qa.get_answer(QUESTION, llm)
+    second = qa.get_answer(QUESTION + "  ", llm)
+    assert (first.source, second.source) == (QAAnswerSource.LLM, QAAnswerSource.CACHE)
+    assert second.answer == "answer"
+    assert len(calls) == 1
+
+
+def test_rule_names_are_answered_from_the_ruleset():
+    llm = FakeLLM()
+    (out,) = _ask_all(["清一色"], llm)
+    assert out.source == QAAnswerSource.RULES
+    assert llm.calls == []
+
+
+def test_identical_questions_share_one_call():
+    llm = FakeLLM()
+    answers = _ask_all([QUESTION] * 5, llm)
+    assert len(llm.calls) == 1
+    assert {(a.answer, a.source) for a in answers} == {(f"fake answer: {QUESTION}", QAAnswerSource.LLM)}
+    assert qa._in_flight == {}
+
+    (again,) = _ask_all([QUESTION], llm)
+    assert again.source == QAAnswerSource.CACHE
+    assert len(llm.calls) == 1
+
+
+def test_concurrency_limit():
+    settings.QA_MAX_CONCURRENCY = 2
+    llm = FakeLLM()
+    answers = _ask_all([f"{QUESTION} ({i} players)" for i in range(6)], llm)
+    assert len(llm.calls) == 6
+    assert llm.max_running == 2
+    assert all(a.source == QAAnswerSource.LLM for a in answers)
+
+
+@pytest.mark.parametrize(
+    "llm",
+    [
+        FakeLLM(delay=1.0),
+        FakeLLM(answer=RuntimeError("upstream down")),
+        FakeLLM(answer=None),
+    ],
+    ids=["timeout", "error", "no-answer"],
+)
+def test_failed_calls_fall_back_and_are_not_cached(llm):
+    settings.QA_TIMEOUT_SECONDS = 0.1
+    answers = _ask_all([QUESTION] * 3, llm)
+    assert len(llm.calls) == 1
+    assert all(a.source != QAAnswerSource.LLM for a in answers)
+    assert len({a.answer for a in answers}) == 1
+    assert qa._in_flight == {}
+    assert qa.get_answer_cache().get(qa._cache_key(QUESTION, False)) is None
@@ -0,0 +1,105 @@
+"""
+QA answer cache: the in-memory LRU, SQLite persistence, expiry,
+least-recently-used eviction and falling back to memory on SQLite errors.
+"""
+
+import logging
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from backend import qa_cache
+from backend.qa_cache import AnswerCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(t=1000.0)
+    monkeypatch.setattr(qa_cache, "time", SimpleNamespace(time=lambda: now.t))
+    return now
+
+
+class LockedDB:
+    """Stands in for a connection whose every statement fails."""
+
+    def execute(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+    executemany = execute
+
+
+def test_memory_only_cache(clock):
+    cache = AnswerCache("", ttl=10, memory_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")  # evicts b, the least recently used
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("A", None, "C")
+    clock.t += 10
+    assert cache.get("a") is None
+    cache.put("d", "D")
+    cache.clear()
+    assert cache.get("d") is None
+
+
+def test_answers_survive_a_restart(tmp_path, clock):
+    path = str(tmp_path / "qa.sqlite3")
+    AnswerCache(path, ttl=10).put("q", "answer")
+    assert AnswerCache(path, ttl=10).get("q") == "answer"
+    clock.t += 10
+    assert AnswerCache(path, ttl=10).get("q") is None
+
+
+def test_eviction_keeps_answers_hit_from_memory(tmp_path, clock):
+    path = str(tmp_path / "qa.sqlite3")
+    cache = AnswerCache(path, max_entries=2)
+    cache.put("a", "A")
+    clock.t += 1
+    cache.put("b", "B")
+    clock.t += 1
+    assert cache.get("a") == "A"  # served from memory
+    clock.t += 1
+    cache.put("c", "C")  # over max_entries: b is now the least recently used row
+
+    reopened = AnswerCache(path)
+    assert (reopened.get("a"), reopened.get("b"), reopened.get("c")) == ("A", None, "C")
+
+
+def test_eviction_prefers_expired_rows(tmp_path, clock):
+    path = str(tmp_path / "qa.sqlite3")
+    cache = AnswerCache(path, max_entries=2, ttl=10)
+    cache.put("old", "O")
+    clock.t += 5
+    cache.put("b", "B")
+    cache.ttl = 100
+    clock.t += 6  # "old" has expired, "b" is still live
+    cache.put("c", "C")
+    db = sqlite3.connect(path)
+    try:
+        assert sorted(k for (k,) in db.execute("SELECT key FROM qa_answers")) == ["b", "c"]
+    finally:
+        db.close()
+
+
+def test_unopenable_path_falls_back_to_memory(tmp_path, caplog):
+    with caplog.at_level(logging.WARNING, logger="backend.qa_cache"):
+        cache = AnswerCache(str(tmp_path / "missing" / "qa.sqlite3"))
+    assert "caching in memory only" in caplog.text
+    cache.put("q", "A")
+    assert cache.get("q") == "A"
+
+
+def test_sqlite_errors_fall_back_to_memory(tmp_path, caplog):
+    cache = AnswerCache(str(tmp_path / "qa.sqlite3"))
+    cache.put("q", "A")
+    cache._db = LockedDB()
+    with caplog.at_level(logging.WARNING, logger="backend.qa_cache"):
+        cache.put("r", "R")
+        assert cache.get("q") == "A"
+        assert cache.get("r") == "R"
+        assert cache.get("missing") is None
+        cache.clear()
+    assert "write failed" in caplog.text
+    assert "read failed" in caplog.text
+    assert "clear failed" in caplog.text
@@ -0,0 +1,493 @@
+"""
+Settlement: the tiles-to-score pipeline, the compiled ruleset, batch replay,
+structured applied rules, ruleset events and 血战到底 whole-hand settlement.
+"""
+
+import copy
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from backend.models import (
+    AppliedRule,
+    AppliedRuleKind,
+    EndOfWallHand,
+    FullHandSettlementRequest,
+    HandAction,
+    HandScoreRoundRequest,
+    KongEventInput,
+    KongInput,
+    Player,
+    PlayerRoundInput,
+    RoundEventInput,
+    RuleBasedScoreRoundRequest,
+    ScoreRoundsRequest,
+    Suit,
+    WinContext,
+)
+from backend.ruleset import (
+    DEFAULT_RULESET_PATH,
+    RulesetError,
+    _settle,
+    compile_ruleset,
+    compute_total_multiplier,
+    get_ruleset,
+    get_ruleset_indexed,
+    reload_ruleset,
+    use_ruleset,
+)
+from backend.scoring import (
+    HandSettlementError,
+    calculate_rule_based_scores,
+    score_round_from_hand,
+    score_rounds,
+    settle_full_hand,
+)
+
+NAMES = ["A", "B", "C", "D"]
+# Rounds scored by the code before the compiled ruleset / TableScorer rewrite.
+BASELINE = Path(__file__).parent / "data" / "scoring_baseline.json"
+
+
+def _players() -> List[Player]:
+    return [Player(name=n, score=0) for n in NAMES]
+
+
+def _deltas(scores) -> Dict[str, int]:
+    return {s.name: s.delta for s in scores}
+
+
+def _baseline_cases() -> List[dict]:
+    return json.loads(BASELINE.read_text(encoding="utf-8"))
+
+
+# --- tiles in, settlement out ---
+
+
+def test_hand_pipeline_discard_win():
+    out = score_round_from_hand(
+        HandScoreRoundRequest(
+            players=_players(),
+            winner_name="A",
+            tiles="1wan 2wan 3wan 4wan 5wan 6wan 7wan 8wan 9wan 1tong 2tong 3tong 5tiao 5tiao".split(),
+            payer_name="B",
+        )
+    )
+    assert out.hand.hand_type_id == "hand.pinghu"
+    assert _deltas(out.player_scores) == {"A": 1, "B": -1, "C": 0, "D": 0}
+    assert [p.score for p in out.players] == [1, -1, 0, 0]
+
+
+def test_hand_pipeline_zimo_defaults_payers_and_counts_kongs():
+    # 清一色 ×4, one 根 from the 暗杠 ×2, 自摸 ×2 => 16 from each other player
+    out = score_round_from_hand(
+        HandScoreRoundRequest(
+            players=_players(),
+            winner_name="A",
+            tiles="1wan 1wan 1wan 2wan 2wan 3wan 4wan 5wan 6wan 7wan 8wan".split(),
+            kongs=[KongInput(tile="9wan", type="an_gang")],
+            context=WinContext(zimo=True),
+            include_rule_ids=True,
+        )
+    )
+    a = out.player_scores[0]
+    assert (a.win_score, a.kong_score, a.delta) == (48, 6, 54)
+    assert _deltas(out.player_scores) == {"A": 54, "B": -18, "C": -18, "D": -18}
+    assert a.applied_rule_ids[:5] == [
+        "hand.pinghu",
+        "factor.qingyise",
+        "factor.gen",
+        "factor.zimo",
+        "payers:B,C,D",
+    ]
+
+
+def test_hand_pipeline_context_flags_multiply():
+    out = score_round_from_hand(
+        HandScoreRoundRequest(
+            players=_players(),
+            winner_name="C",
+            tiles="1wan 1wan 1wan 5tong 5tong 5tong 7tiao 7tiao 7tiao 2wan 2wan 2wan 9tong 9tong".split(),
+            context=WinContext(gangshangkaihua=True, haidilaoyue=True),
+            payer_name="D",
+        )
+    )
+    # 大对子 ×2, 杠上开花 ×2, 海底捞月 ×2
+    assert out.hand.hand_type_id == "hand.pengpenghu"
+    assert _deltas(out.player_scores) == {"A": 0, "B": 0, "C": 8, "D": -8}
+
+
+def test_hand_pipeline_non_winning_tiles_settle_only_kongs():
+    out = score_round_from_hand(
+        HandScoreRoundRequest(
+            players=_players(),
+            winner_name="A",
+            tiles="1wan 2wan 4wan 4wan 5wan 6wan 7wan 8wan 9wan 1tong 2tong 3tong 5tiao 5tiao".split(),
+            kongs=[KongInput(tile="9tiao", type="dian_gang", payer_name="C")],
+            payer_name="B",
+        )
+    )
+    assert not out.hand.is_win
+    assert _deltas(out.player_scores) == {"A": 2, "B": 0, "C": -2, "D": 0}
+    assert out.player_scores[0].win_score == 0
+
+
+# --- compiled ruleset ---
+
+
+@pytest.mark.parametrize(
+    "hand_id, factors, total",
+    [
+        ("hand.pinghu", {}, 1),
+        ("hand.pinghu", {"factor.zimo": True}, 2),
+        ("hand.pinghu", {"factor.zimo": False}, 1),
+        ("hand.pinghu", {"factor.qingyise": True}, 4),
+        ("hand.qidui", {"factor.gen": 2}, 16),
+        ("hand.pengpenghu", {"factor.qingyise": True, "factor.zimo": True, "factor.gen": 1}, 32),
+        ("hand.tianhu", {}, 32),
+    ],
+)
+def test_total_multiplier(hand_id, factors, total):
+    breakdown = compute_total_multiplier(is_win=True, hand_id=hand_id, factors=factors)
+    assert breakdown.total_multiplier == total
+    assert breakdown.hand_base_multiplier * breakdown.extras_total == total
+
+
+def test_total_multiplier_gen_breakdown():
+    breakdown = compute_total_multiplier(is_win=True, hand_id="hand.pinghu", factors={"factor.gen": 3})
+    assert breakdown.enabled_factors == (
+        {"id": "factor.gen", "type": "countable", "value": 3, "applied_multiplier": 8, "multiplier_each": 2},
+    )
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(is_win=False, hand_id="hand.pinghu"),
+        dict(is_win=True, hand_id=None),
+        dict(is_win=True, hand_id="hand.bogus"),
+        dict(is_win=True, hand_id="hand.pinghu", factors={"factor.bogus": True}),
+        dict(is_win=True, hand_id="hand.pinghu", factors={"factor.gen": -1}),
+    ],
+)
+def test_total_multiplier_rejects_bad_requests(kwargs):
+    with pytest.raises(RulesetError):
+        compute_total_multiplier(**kwargs)
+
+
+def test_compiled_ruleset_is_read_only():
+    ruleset = get_ruleset_indexed()
+    assert ruleset.hands["hand.qidui"].base_multiplier == 4
+    assert [f.id for f in ruleset.factor_order][:2] == ["factor.gen", "factor.zimo"]
+    with pytest.raises(TypeError):
+        ruleset.hands["hand.new"] = ruleset.hands["hand.qidui"]
+
+
+@pytest.mark.parametrize(
+    "path, value",
+    [
+        (("hands", 0, "scoring", "base_multiplier"), 0),
+        (("multipliers", "factors", 1, "apply", "multiplier"), -1),
+        (("multipliers", "factors", 0, "apply", "mode"), "once"),
+        (("multipliers", "factors", 1, "type"), "range"),
+        (("events", 0, "payer_policy"), "everyone"),
+        (("events", 0, "amount_per_payer"), -2),
+    ],
+)
+def test_compile_rejects_bad_definitions(path, value):
+    raw = copy.deepcopy(get_ruleset())
+    node = raw
+    for key in path[:-1]:
+        node = node[key]
+    node[path[-1]] = value
+    with pytest.raises(RulesetError):
+        compile_ruleset(raw)
+
+
+# --- batch replay ---
+
+
+def test_score_rounds_matches_round_by_round():
+    rounds = [
+        [PlayerRoundInput(**r) for r in case["request"]["player_rounds"]] for case in _baseline_cases()
+    ]
+    start = [Player(name=n, score=i) for i, n in enumerate(NAMES)]
+    replay = score_rounds(ScoreRoundsRequest(players=start, rounds=rounds, include_rule_ids=True))
+
+    players = start
+    assert len(replay.rounds) == len(rounds)
+    for player_rounds, replayed in zip(rounds, replay.rounds):
+        one = calculate_rule_based_scores(
+            RuleBasedScoreRoundRequest(players=players, player_rounds=player_rounds, include_rule_ids=True)
+        )
+        assert replayed == one.player_scores
+        players = one.players
+    assert replay.players == players
+
+
+def test_score_rounds_empty_round_scores_nothing():
+    replay = score_rounds(ScoreRoundsRequest(players=_players(), rounds=[[]]))
+    assert [s.delta for s in replay.rounds[0]] == [0, 0, 0, 0]
+    assert replay.players == _players()
+
+
+# --- structured applied rules ---
+
+
+@pytest.mark.parametrize("case", _baseline_cases())
+def test_applied_rule_amounts_sum_to_delta(case):
+    request = RuleBasedScoreRoundRequest(**case["request"])
+    for score in calculate_rule_based_scores(request).player_scores:
+        assert sum(r.amount for r in score.applied_rules) == score.delta
+        assert all(r.amount == 0 for r in score.applied_rules if r.kind == AppliedRuleKind.FACTOR)
+        assert score.applied_rule_ids == []
+
+
+def test_applied_rules_of_a_discard_win():
+    request = RuleBasedScoreRoundRequest(
+        players=_players(),
+        player_rounds=[
+            PlayerRoundInput(
+                name="A",
+                hand_type_id="hand.pengpenghu",
+                payer_name="C",
+                factor_values={"factor.qingyise": True, "factor.gen": 1},
+                manual_delta=-1,
+            )
+        ],
+    )
+    a, _, c, _ = calculate_rule_based_scores(request).player_scores
+    assert a.applied_rules == [
+        AppliedRule(rule_id="hand.pengpenghu", kind=AppliedRuleKind.HAND, counterparty="C", amount=16, multiplier=2),
+        AppliedRule(rule_id="factor.qingyise", kind=AppliedRuleKind.FACTOR, multiplier=4),
+        AppliedRule(rule_id="factor.gen", kind=AppliedRuleKind.FACTOR, multiplier=2),
+        AppliedRule(rule_id="manual_delta", kind=AppliedRuleKind.MANUAL, amount=-1),
+    ]
+    assert c.applied_rules[0] == AppliedRule(
+        rule_id="hand.pengpenghu", kind=AppliedRuleKind.HAND, counterparty="A", amount=-16, multiplier=2
+    )
+
+
+def test_legacy_rule_ids_follow_request_factor_order():
+    def tags(factor_values):
+        request = RuleBasedScoreRoundRequest(
+            players=_players(),
+            player_rounds=[
+                PlayerRoundInput(name="B", hand_type_id="hand.pinghu", payer_name="A", factor_values=factor_values)
+            ],
+            include_rule_ids=True,
+        )
+        return calculate_rule_based_scores(request).player_scores[1].applied_rule_ids
+
+    assert tags({"factor.zimo": True, "factor.gen": 1}) == ["hand.pinghu", "factor.zimo", "factor.gen", "payers:A"]
+    assert tags({"factor.gen": 1, "factor.zimo": True}) == ["hand.pinghu", "factor.gen", "factor.zimo", "payers:A"]
+
+
+# --- ruleset events ---
+
+
+def _round(*player_rounds: PlayerRoundInput) -> Dict[str, int]:
+    request = RuleBasedScoreRoundRequest(players=_players(), player_rounds=list(player_rounds))
+    return _deltas(calculate_rule_based_scores(request).player_scores)
+
+
+@pytest.mark.parametrize(
+    "kong, deltas",
+    [
+        (KongEventInput(type="dian_gang", payer_name="C"), {"A": 2, "B": 0, "C": -2, "D": 0}),
+        (KongEventInput(type="dian_gang"), {"A": 0, "B": 0, "C": 0, "D": 0}),
+        (KongEventInput(type="bu_gang"), {"A": 3, "B": -1, "C": -1, "D": -1}),
+        (KongEventInput(type="an_gang"), {"A": 6, "B": -2, "C": -2, "D": -2}),
+        (KongEventInput(type="an_gang", payer_names=["B", "D"]), {"A": 4, "B": -2, "C": 0, "D": -2}),
+    ],
+)
+def test_kong_events(kong, deltas):
+    assert _round(PlayerRoundInput(name="A", kong_events=[kong])) == deltas
+
+
+def test_kong_events_skip_players_who_won():
+    # D won this round (by C's discard), so A's 暗杠 is paid by B and C only
+    deltas = _round(
+        PlayerRoundInput(name="A", kong_events=[KongEventInput(type="an_gang")]),
+        PlayerRoundInput(name="D", hand_type_id="hand.pinghu", payer_name="C"),
+    )
+    assert deltas == {"A": 4, "B": -2, "C": -3, "D": 1}
+
+
+def test_generic_events_follow_the_ruleset():
+    deltas = _round(
+        PlayerRoundInput(
+            name="B",
+            events=[
+                RoundEventInput(event_id="event.cha_huazhu", payer_name="A"),
+                RoundEventInput(event_id="event.cha_dajiao", payer_names=["C", "D"], multiplier=4),
+                # transfer_hand_multiplier without a multiplier, and an unknown id: ignored
+                RoundEventInput(event_id="event.cha_dajiao", payer_names=["C"]),
+                RoundEventInput(event_id="event.bogus", payer_name="A"),
+            ],
+        )
+    )
+    assert deltas == {"A": -16, "B": 24, "C": -4, "D": -4}
+
+
+# --- 血战到底 whole-hand settlement ---
+
+PINGHU = "1wan 2wan 3wan 4wan 5wan 6wan 7wan 8wan 9wan 1tong 2tong 3tong 5tiao 5tiao".split()
+# 九莲宝灯 shape: waits on every wan; the best is 1wan (清一色 ×4, 根 ×2)
+READY_QINGYISE = "1wan 1wan 1wan 2wan 3wan 4wan 5wan 6wan 7wan 8wan 9wan 9wan 9wan".split()
+NOT_READY = "1wan 3wan 5wan 7wan 9wan 2tong 4tong 6tong 8tong 1tong 3tong 5tong 7tong".split()
+THREE_SUITS = "1wan 3wan 5wan 7wan 9wan 2tong 4tong 6tong 8tong 1tiao 3tiao 5tiao 7tiao".split()
+SEVEN_PAIRS_READY = "1wan 1wan 3wan 3wan 5wan 5wan 7wan 7wan 2tong 2tong 4tong 4tong 6tong".split()
+
+
+def _settle_hand(actions: List[HandAction], end_hands: List[EndOfWallHand] = ()):
+    return settle_full_hand(
+        FullHandSettlementRequest(players=_players(), actions=actions, end_hands=list(end_hands))
+    )
+
+
+def test_full_hand_winners_stop_paying():
+    out = _settle_hand(
+        [
+            HandAction(type="win", player_name="B", tiles=PINGHU, payer_name="A"),
+            HandAction(type="kong", player_name="C", kong=KongInput(tile="9tiao", type="an_gang")),
+            HandAction(type="win", player_name="D", tiles=PINGHU, context=WinContext(zimo=True)),
+        ]
+    )
+    # B: 平胡 from A. C's 暗杠: A, D pay 2. D's 自摸 (×2): A, C pay 2.
+    assert _deltas(out.player_scores) == {"A": -5, "B": 1, "C": 2, "D": 2}
+    assert [w.hand_type_id for w in out.wins] == ["hand.pinghu", "hand.pinghu"]
+    assert out.end_states == []
+
+
+def test_full_hand_cha_huazhu_and_cha_dajiao():
+    out = _settle_hand(
+        [HandAction(type="win", player_name="B", tiles=PINGHU, payer_name="A")],
+        [
+            EndOfWallHand(name="A", tiles=READY_QINGYISE),
+            EndOfWallHand(name="C", tiles=NOT_READY),
+            EndOfWallHand(name="D", tiles=THREE_SUITS),
+        ],
+    )
+    states = {st.name: st for st in out.end_states}
+    assert (states["A"].is_ready, states["A"].best_multiplier) == (True, 8)
+    assert (states["C"].is_huazhu, states["C"].is_ready) == (False, False)
+    assert states["D"].is_huazhu
+    # 查花猪: D pays A and C 16 each. 查大叫: C and D pay A 8 each. B has won and is out of both.
+    assert _deltas(out.player_scores) == {"A": 31, "B": 1, "C": 8, "D": -40}
+
+
+def test_full_hand_void_suit_makes_huazhu():
+    out = _settle_hand(
+        [],
+        [
+            EndOfWallHand(name="A", tiles=READY_QINGYISE, void_suit=Suit.SOU),
+            EndOfWallHand(name="B", tiles=NOT_READY, void_suit=Suit.PIN),
+        ],
+    )
+    states = {st.name: st for st in out.end_states}
+    assert states["A"].is_ready and not states["A"].is_huazhu
+    assert states["B"].is_huazhu and not states["B"].is_ready
+    assert _deltas(out.player_scores) == {"A": 24, "B": -24, "C": 0, "D": 0}
+
+
+def test_full_hand_unpriced_waits_are_not_ready(tmp_path):
+    # 七对 is ready on 6tong, but a ruleset without hand.qidui cannot price it
+    raw = copy.deepcopy(get_ruleset())
+    raw["hands"] = [h for h in raw["hands"] if h["id"] != "hand.qidui"]
+    variant = tmp_path / "no_qidui.json"
+    variant.write_text(json.dumps(raw), encoding="utf-8")
+
+    end_hands = [EndOfWallHand(name="A", tiles=SEVEN_PAIRS_READY), EndOfWallHand(name="B", tiles=NOT_READY)]
+    assert _settle_hand([], end_hands).end_states[0].best_multiplier == 4
+    use_ruleset(str(variant))
+    try:
+        out = _settle_hand([], end_hands)
+    finally:
+        use_ruleset(DEFAULT_RULESET_PATH)
+    assert not out.end_states[0].is_ready
+    assert _deltas(out.player_scores) == {"A": 0, "B": 0, "C": 0, "D": 0}
+
+
+@pytest.mark.parametrize(
+    "actions, end_hands",
+    [
+        ([HandAction(type="win", player_name="E", tiles=PINGHU, payer_name="A")], []),
+        ([HandAction(type="win", player_name="B", tiles=NOT_READY + ["9tong"], payer_name="A")], []),
+        ([HandAction(type="win", player_name="B", tiles=PINGHU)], []),
+        ([HandAction(type="win", player_name="B", tiles=PINGHU, payer_name="B")], []),
+        (
+            [
+                HandAction(type="win", player_name="B", tiles=PINGHU, payer_name="A"),
+                HandAction(type="win", player_name="C", tiles=PINGHU, payer_name="B"),
+            ],
+            [],
+        ),
+        ([HandAction(type="kong", player_name="A")], []),
+        (
+            [HandAction(type="win", player_name="B", tiles=PINGHU, payer_name="A")],
+            [EndOfWallHand(name="B", tiles=NOT_READY)],
+        ),
+    ],
+)
+def test_full_hand_rejects_invalid_hands(actions, end_hands):
+    with pytest.raises(HandSettlementError):
+        _settle_hand(actions, end_hands)
+
+
+# --- memoized settlement ---
+
+
+def test_settlement_memo_is_shared_across_factor_order():
+    reload_ruleset()
+    first = compute_total_multiplier(
+        is_win=True, hand_id="hand.qidui", factors={"factor.zimo": True, "factor.gen": 1}
+    )
+    second = compute_total_multiplier(
+        is_win=True, hand_id="hand.qidui", factors={"factor.gen": 1, "factor.zimo": True}
+    )
+    info = _settle.cache_info()
+    assert (info.misses, info.hits) == (1, 1)
+    assert first.total_multiplier == second.total_multiplier == 16
+    # each caller sees its own factor order
+    assert [f["id"] for f in first.enabled_factors] == ["factor.zimo", "factor.gen"]
+    assert [f["id"] for f in second.enabled_factors] == ["factor.gen", "factor.zimo"]
+
+
+def test_settlement_memo_is_dropped_on_ruleset_change(tmp_path):
+    raw = copy.deepcopy(get_ruleset())
+    for factor in raw["multipliers"]["factors"]:
+        if factor["id"] == "factor.zimo":
+            factor["apply"]["multiplier"] = 3
+    variant = tmp_path / "variant.json"
+    variant.write_text(json.dumps(raw), encoding="utf-8")
+
+    factors = {"factor.zimo": True}
+    assert compute_total_multiplier(is_win=True, hand_id="hand.pinghu", factors=factors).total_multiplier == 2
+    use_ruleset(str(variant))
+    try:
+        assert _settle.cache_info().currsize == 0
+        assert compute_total_multiplier(is_win=True, hand_id="hand.pinghu", factors=factors).total_multiplier == 3
+    finally:
+        use_ruleset(DEFAULT_RULESET_PATH)
+    assert compute_total_multiplier(is_win=True, hand_id="hand.pinghu", factors=factors).total_multiplier == 2
+
+
+@pytest.mark.parametrize("case", _baseline_cases())
+def test_settlement_matches_baseline(case):
+    request = RuleBasedScoreRoundRequest(**case["request"], include_rule_ids=True)
+    scores = calculate_rule_based_scores(request).player_scores
+    got = [
+        {
+            "name": s.name,
+            "win_score": s.win_score,
+            "kong_score": s.kong_score,
+            "manual_score": s.manual_score,
+            "delta": s.delta,
+            "applied_rule_ids": s.applied_rule_ids,
+        }
+        for s in scores
+    ]
+    assert got == case["expected"]
@@ -0,0 +1,123 @@
+"""
+Rule search: the BM25 index (with its relative-score cutoff), the trigram
+fuzzy index, and the rule lookups built on them.
+"""
+
+import math
+
+import pytest
+
+from backend.rules import search_rules_fuzzy, search_rules_simple
+from backend.search import B, K1, FuzzyIndex, SearchIndex, tokenize
+
+DOCS = [
+    ("a", [("self draw win", 1)]),
+    ("b", [("draw", 3), ("a tile from the wall", 1)]),
+    ("c", [("kong", 1)]),
+]
+
+
+def _bm25(query: str) -> dict:
+    """Plain BM25 over DOCS, term by term."""
+    docs = {}
+    for doc_id, fields in DOCS:
+        tf = {}
+        for text, weight in fields:
+            for token in tokenize(text):
+                tf[token] = tf.get(token, 0) + weight
+        docs[doc_id] = tf
+    avg = sum(sum(tf.values()) for tf in docs.values()) / len(docs)
+    scores = {}
+    for term in set(tokenize(query)):
+        having = [d for d, tf in docs.items() if term in tf]
+        idf = math.log(1 + (len(docs) - len(having) + 0.5) / (len(having) + 0.5))
+        for d in having:
+            tf = docs[d][term]
+            length = sum(docs[d].values())
+            score = idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg))
+            scores[d] = scores.get(d, 0.0) + score
+    return scores
+
+
+def test_tokenize_mixes_words_and_cjk_bigrams():
+    assert tokenize("清一色 Self-Draw, the 2nd") == ["清", "一", "色", "清一", "一色", "self", "draw", "2nd"]
+
+
+@pytest.mark.parametrize("query", ["draw", "self draw", "kong draw wall", "nothing"])
+def test_bm25_scores(query):
+    index = SearchIndex(DOCS)
+    expected = _bm25(query)
+    got = dict(index.search(query))
+    assert got.keys() == expected.keys()
+    for doc_id, score in expected.items():
+        assert got[doc_id] == pytest.approx(score)
+
+
+def test_search_orders_by_score_then_id_and_limits():
+    index = SearchIndex([("y", [("pung", 1)]), ("x", [("pung", 1)]), ("z", [("kong", 1)])])
+    # the rarer term scores higher; equal scores fall back to id order
+    assert [d for d, _ in index.search("pung kong")] == ["z", "x", "y"]
+    assert [d for d, _ in index.search("pung")] == ["x", "y"]
+    assert [d for d, _ in index.search("pung", limit=1)] == ["x"]
+
+
+def test_relative_cutoff_drops_weak_matches():
+    index = SearchIndex(DOCS)
+    scores = dict(index.search("self draw"))
+    ratio = scores["b"] / scores["a"]
+    assert 0 < ratio < 1
+    assert [d for d, _ in index.search("self draw", min_relative=ratio - 1e-9)] == ["a", "b"]
+    assert [d for d, _ in index.search("self draw", min_relative=ratio + 1e-9)] == ["a"]
+
+
+def test_single_cjk_overlap_is_dropped():
+    # "清一色" shares 一 with other rules; only the rule itself is relevant
+    assert search_rules_simple("清一色") == ["factor.qingyise"]
+    assert search_rules_simple("清一色", limit=1) == ["factor.qingyise"]
+
+
+# --- fuzzy / pinyin lookup ---
+
+FUZZY = FuzzyIndex(
+    [
+        ("hand.pengpenghu", ["Peng Peng Hu", "All Pungs"]),
+        ("factor.qingyise", ["Qing Yi Se", "Pure One Suit"]),
+        ("basic.quemen", ["Missing Suit (Que Men)"]),
+    ]
+)
+
+
+def test_fuzzy_exact_and_compacted_keys():
+    assert FUZZY.search("qingyise") == [("factor.qingyise", 1.0)]
+    assert FUZZY.search("Qing-Yi Se") == [("factor.qingyise", 1.0)]
+    # keys are also indexed from every word start
+    assert FUZZY.search("quemen") == [("basic.quemen", 1.0)]
+
+
+def test_fuzzy_prefix_matching():
+    ((doc, score),) = FUZZY.search("pengpeng")
+    assert doc == "hand.pengpenghu"
+    assert score == pytest.approx(0.5 + 0.5 * 8 / 10)
+    assert FUZZY.search("pengpeng", prefix=False)[0][1] < score
+    assert FUZZY.search("p", prefix=True)[0][0] == "hand.pengpenghu"
+
+
+def test_fuzzy_tolerates_typos_and_rejects_noise():
+    assert FUZZY.search("qingyse", prefix=False)[0][0] == "factor.qingyise"
+    assert FUZZY.search("allpungz")[0][0] == "hand.pengpenghu"
+    assert FUZZY.search("xyz") == []
+    assert FUZZY.search("  ,. ") == []
+
+
+@pytest.mark.parametrize(
+    "query, rule_id",
+    [
+        ("pengpeng", "hand.pengpenghu"),
+        ("qing yi se", "factor.qingyise"),
+        ("qdui", "hand.qidui"),
+        ("gangshang", "factor.gangshangkaihua"),
+    ],
+)
+def test_rule_lookup_by_pinyin(query, rule_id):
+    assert search_rules_fuzzy(query)[0] == rule_id
+    assert search_rules_simple(query)[0] == rule_id
@@ -0,0 +1,118 @@
+"""
+Rules snapshot: building it, using it while fresh, and falling back to the
+JSON files once a source changes (or the snapshot is unreadable).
+All files are copies under tmp_path.
+"""
+
+import json
+import marshal
+import shutil
+
+import pytest
+
+from backend import snapshot
+from backend.ruleset import (
+    DEFAULT_RULESET_PATH,
+    compute_total_multiplier,
+    get_ruleset,
+    parse_ruleset_json,
+    reload_ruleset,
+    ruleset_version,
+    use_ruleset,
+)
+from backend.snapshot import BASICS_JSON_PATH, RULESET_JSON_PATH, build_snapshot, load_snapshot, read_json
+
+
+@pytest.fixture
+def sources(tmp_path):
+    rules = tmp_path / "rules_winning.json"
+    basics = tmp_path / "rules_basics.json"
+    shutil.copy(RULESET_JSON_PATH, rules)
+    shutil.copy(BASICS_JSON_PATH, basics)
+    return rules, basics, tmp_path / "rules.snapshot"
+
+
+@pytest.fixture
+def active_snapshot(sources, monkeypatch):
+    """Make the tmp snapshot the one every default lookup loads."""
+    rules, basics, out = sources
+    build_snapshot(str(out), str(rules), str(basics))
+    monkeypatch.setattr(load_snapshot.__wrapped__, "__defaults__", (str(out),))
+    use_ruleset(str(rules))
+    yield sources
+    monkeypatch.undo()
+    use_ruleset(DEFAULT_RULESET_PATH)
+
+
+def _set_qidui_base(path, value):
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    for hand in raw["hands"]:
+        if hand["id"] == "hand.qidui":
+            hand["scoring"]["base_multiplier"] = value
+    path.write_text(json.dumps(raw, ensure_ascii=False), encoding="utf-8")
+
+
+def test_build_and_load(sources):
+    rules, basics, out = sources
+    hashes = build_snapshot(str(out), str(rules), str(basics))
+    assert hashes == {"ruleset": snapshot.file_hash(str(rules)), "basics": snapshot.file_hash(str(basics))}
+
+    snap = load_snapshot(str(out))
+    assert snap.get("ruleset", str(rules)) == parse_ruleset_json(str(rules))
+    assert snap.get("basics", str(basics)) == json.loads(basics.read_text(encoding="utf-8"))
+    # only the files it was built from
+    assert snap.get("ruleset", RULESET_JSON_PATH) is None
+    load_snapshot.cache_clear()
+
+
+def test_stale_snapshot_is_ignored(sources, caplog):
+    rules, basics, out = sources
+    build_snapshot(str(out), str(rules), str(basics))
+    basics.write_text(basics.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+    load_snapshot.cache_clear()
+    with caplog.at_level("INFO", logger="backend.snapshot"):
+        assert load_snapshot(str(out)) is None
+    assert "stale" in caplog.text
+    load_snapshot.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b"not a snapshot",
+        marshal.dumps({"magic": "something else", "format": 1}),
+        marshal.dumps({"magic": snapshot._MAGIC, "format": snapshot.FORMAT_VERSION, "python": (2, 7), "sources": {}}),
+    ],
+    ids=["garbage", "magic", "python-version"],
+)
+def test_unreadable_snapshot_is_ignored(tmp_path, payload):
+    out = tmp_path / "rules.snapshot"
+    out.write_bytes(payload)
+    assert load_snapshot(str(out)) is None
+    assert load_snapshot(str(tmp_path / "missing.snapshot")) is None
+    load_snapshot.cache_clear()
+
+
+def test_rules_come_from_a_fresh_snapshot(active_snapshot):
+    rules, basics, out = active_snapshot
+    snap = load_snapshot()
+    assert get_ruleset() is snap.get("ruleset", str(rules))
+    assert read_json("basics", str(basics)) is snap.get("basics", str(basics))
+    assert compute_total_multiplier(is_win=True, hand_id="hand.qidui").total_multiplier == 4
+
+
+def test_changed_rules_fall_back_to_json(active_snapshot):
+    rules, basics, out = active_snapshot
+    version = ruleset_version()
+    _set_qidui_base(rules, 8)
+    reload_ruleset()
+
+    assert load_snapshot() is None
+    assert ruleset_version() != version
+    assert compute_total_multiplier(is_win=True, hand_id="hand.qidui").total_multiplier == 8
+    assert read_json("basics", str(basics)) == json.loads(basics.read_text(encoding="utf-8"))
+
+    # rebuilding makes the snapshot fresh again
+    build_snapshot(str(out), str(rules), str(basics))
+    reload_ruleset()
+    assert get_ruleset() is load_snapshot().get("ruleset", str(rules))
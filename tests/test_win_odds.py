@@ -0,0 +1,102 @@
+"""
+Win-probability estimates: exact hypergeometric odds for ready hands, and
+the DP / level-chain estimates against a Monte Carlo run of the same draw
+model (draw from the unseen tiles, keep a draw that lowers shanten).
+"""
+
+import random
+from math import comb
+from typing import List
+
+import pytest
+
+from backend import win_odds
+from backend.models import Suit
+from backend.tiles import MAX_COPIES, NUM_TILE_KINDS, encode_tiles
+from backend.win_odds import estimate_win_probability
+
+# waits on 1wan / 4wan
+READY = "2wan 3wan 5wan 6wan 7wan 1tong 1tong 1tong 4tiao 5tiao 6tiao 9tiao 9tiao".split()
+
+# (tiles, shanten) drawn from a shuffled wall
+HANDS = [
+    ("1wan 4wan 5wan 1tong 1tong 7tong 8tong 9tong 2tiao 3tiao 5tiao 6tiao 7tiao", 1),
+    ("3wan 5wan 6wan 6wan 7wan 9wan 4tong 5tong 6tong 2tiao 7tiao 7tiao 8tiao", 2),
+    ("1wan 8wan 9wan 3tong 6tong 8tong 2tiao 3tiao 5tiao 6tiao 7tiao 8tiao 9tiao", 3),
+]
+
+
+def monte_carlo(tiles: List[str], draws: int, void: int = -1, runs: int = 2000, seed: int = 1) -> float:
+    start = encode_tiles(tiles).tobytes()
+    wall = [t for t in range(NUM_TILE_KINDS) for _ in range(MAX_COPIES - start[t])]
+    rng = random.Random(seed)
+    wins = 0
+    for _ in range(runs):
+        rng.shuffle(wall)
+        hand = start
+        for tile in wall[:draws]:
+            target = dict(win_odds._transitions(hand, void)[1]).get(tile)
+            if target == win_odds._WIN:
+                wins += 1
+                break
+            if target is not None:
+                hand = target
+    return wins / runs
+
+
+def test_ready_hand_is_exact_hypergeometric():
+    out = estimate_win_probability(READY, visible_tiles=["1wan", "4wan", "4wan"], wall_remaining=40, draws=10)
+    unseen = 108 - 13 - 3
+    outs = 3 + 2
+    assert out.exact and out.shanten == 0
+    assert out.win_probability == pytest.approx(1 - comb(unseen - outs, 10) / comb(unseen, 10))
+    assert {(w.tile, w.remaining, w.total_multiplier) for w in out.waits} == {("1wan", 3, 2), ("4wan", 2, 2)}
+    # 自摸 doubles 平胡 and each of the 3 other players pays
+    assert out.expected_score == pytest.approx(out.win_probability * 2 * 3)
+
+
+def test_default_draws_are_a_share_of_the_wall():
+    assert estimate_win_probability(READY, wall_remaining=41).draws == 11
+    assert estimate_win_probability(READY, wall_remaining=41, players_in_hand=2).draws == 21
+    assert estimate_win_probability(READY, wall_remaining=0).win_probability == 0.0
+
+
+@pytest.mark.parametrize("tiles, shanten", HANDS)
+def test_estimate_agrees_with_monte_carlo(tiles, shanten):
+    tiles = tiles.split()
+    out = estimate_win_probability(tiles, wall_remaining=60, draws=15)
+    assert out.shanten == shanten
+    assert not out.exact
+    assert out.win_probability == pytest.approx(monte_carlo(tiles, 15), rel=0.2)
+
+
+def test_chain_estimate_is_repeatable():
+    tiles = HANDS[-1][0].split()
+    first = estimate_win_probability(tiles, wall_remaining=60, draws=15)
+    win_odds._estimate.cache_clear()
+    assert estimate_win_probability(tiles, wall_remaining=60, draws=15) == first
+
+
+def test_void_tiles_cost_draws():
+    tiles = "2wan 3wan 5wan 6wan 7wan 1tong 1tong 1tong 4tong 5tong 6tong 9tong 9tiao".split()
+    voided = estimate_win_probability(tiles, wall_remaining=60, draws=15, void_suit=Suit.SOU)
+    assert not voided.exact
+    assert voided.win_probability == pytest.approx(monte_carlo(tiles, 15, void=2), rel=0.2)
+    # the 定缺 tile still has to be shed: a single draw cannot win
+    assert estimate_win_probability(tiles, wall_remaining=60, draws=1, void_suit=Suit.SOU).win_probability == 0.0
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(tiles=READY[:-1], wall_remaining=40),
+        dict(tiles=READY, wall_remaining=40, players_in_hand=5),
+        dict(tiles=READY, wall_remaining=40, players_in_hand=1),
+        dict(tiles=READY, wall_remaining=-1),
+        dict(tiles=READY[:-1] + ["0wan"], wall_remaining=40),
+        dict(tiles=READY, melds=[["1tong", "1tong", "1tong"]], wall_remaining=40),
+    ],
+)
+def test_invalid_requests(kwargs):
+    out = estimate_win_probability(**kwargs)
+    assert out.shanten is None and out.win_probability == 0.0